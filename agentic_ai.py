@@ -1,18 +1,87 @@
 # File: agentic_ai.py (Corrected for older google-generativeai versions)
+# google.generativeai and the calendar stack are imported inside the functions that
+# use them, so importing this module (and starting app.py) stays cheap.
 
-import google.generativeai as genai
 import streamlit as st
+import contextvars
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Import the functions the AI can call
-from calendar_functions import schedule_event, list_today_events
+from response_cache import ResponseCache, content_hash
+from resilient_client import get_client
+import tracing
 
-# Import the necessary components from the library to build the schema correctly
-# 'Part' has been removed from this import statement.
-from google.generativeai.types import FunctionDeclaration, Tool
+TRANSCRIPTION_MODEL = 'models/gemini-1.5-flash-latest'
+# Transcripts are cached by a hash of the audio bytes, so Streamlit reruns with the
+# same file still in the uploader cost no upload and no model call.
+TRANSCRIPT_CACHE_ENTRIES = 64
+TRANSCRIPT_CACHE_DIR = '.focusflow_cache/transcripts'  # None keeps the cache in memory only
+
+_transcript_cache = ResponseCache(TRANSCRIPT_CACHE_ENTRIES, disk_dir=TRANSCRIPT_CACHE_DIR)
+
+# The agent keeps answering function calls until the model replies with text, at
+# most this many model round trips per user request.
+AGENT_MAX_ITERATIONS = 5
+# Function calls returned together in one response are independent, so they run in parallel.
+TOOL_WORKERS = 4
+
+# The user the current request runs for; calendar tools act on that user's calendar.
+_tool_user_id = contextvars.ContextVar('focusflow_tool_user_id', default=None)
+
+def _calendar_function(name):
+    """A tool that imports calendar_functions (and the Google API client) on first call."""
+    def call(**args):
+        import calendar_functions
+        user_id = _tool_user_id.get()
+        if user_id is not None:
+            args['user_id'] = user_id
+        return getattr(calendar_functions, name)(**args)
+    call.__name__ = name
+    return call
+
+# The functions the AI can call
+AVAILABLE_FUNCTIONS = {
+    "schedule_event": _calendar_function("schedule_event"),
+    "list_today_events": _calendar_function("list_today_events"),
+}
+
+def _transcribe_uncached(uploaded_file):
+    import google.generativeai as genai
+    try:
+        genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
+    except Exception as e:
+        st.error(f"API Key Error: {e}")
+        return None
+    def upload():
+        uploaded_file.seek(0)
+        return genai.upload_file(uploaded_file, mime_type=uploaded_file.type)
+
+    gemini = get_client('gemini')
+    with tracing.span('agentic_ai.upload_audio', bytes=uploaded_file.size):
+        audio_file = gemini.call(upload)
+    transcribe_model = genai.GenerativeModel(TRANSCRIPTION_MODEL)
+    with tracing.span('agentic_ai.transcribe'):
+        response = gemini.call(transcribe_model.generate_content, ["Please transcribe this audio.", audio_file])
+    if response and response.text:
+        return response.text
+    return None
+
+def transcribe_audio(uploaded_file):
+    """
+    Transcribes an uploaded audio file with Gemini. Returns (audio_hash, text), where
+    text is None if the audio could not be understood. Failures are not cached.
+    """
+    audio_hash = content_hash(uploaded_file.getvalue())
+    text = _transcript_cache.get_or_compute(audio_hash, lambda: _transcribe_uncached(uploaded_file))
+    return audio_hash, text
 
 def get_gemini_model_with_function_calling():
     """Initializes the Gemini model with our defined tools (functions)."""
+    import google.generativeai as genai
+    # Import the necessary components from the library to build the schema correctly
+    # 'Part' has been removed from this import statement.
+    from google.generativeai.types import FunctionDeclaration, Tool
     
     # This schema definition is correct and does not need to change.
     schedule_event_func = FunctionDeclaration(
@@ -54,57 +123,146 @@ def get_gemini_model_with_function_calling():
     )
     return model
 
-def process_user_request(model, user_prompt, chat_history):
+def _prompt_tokens(response):
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'prompt_token_count', 0) or 0
+
+def _response_parts(response):
+    return response.candidates[0].content.parts
+
+def _function_calls(response):
+    return [part.function_call for part in _response_parts(response) if part.function_call.name]
+
+def _response_text(response):
+    return ''.join(part.text for part in _response_parts(response) if not part.function_call.name and part.text)
+
+def _run_function_call(function_call, user_id=None):
+    """Runs one tool call; errors become the function's result so the model can react to them."""
+    started = time.perf_counter()
+    token = _tool_user_id.set(user_id)
+    function_name = function_call.name
+    function_to_call = AVAILABLE_FUNCTIONS.get(function_name)
+    if function_to_call is None:
+        result = f"Error: unknown function {function_name}"
+    else:
+        try:
+            args = {key: value for key, value in function_call.args.items()}
+            with tracing.span(f"tool.{function_name}"):
+                result = function_to_call(**args)
+        except Exception as e:
+            result = f"Error while running {function_name}: {e}"
+    _tool_user_id.reset(token)
+    return {'name': function_name, 'result': result, 'seconds': time.perf_counter() - started}
+
+def run_function_calls(function_calls, max_workers=TOOL_WORKERS, user_id=None):
     """
-    Sends the user prompt to Gemini, checks if a function call is needed,
-    executes the function, and returns the final response.
+    Runs the function calls of one model response concurrently; results keep the call
+    order. Calendar tools act on user_id's calendar (the default user when None).
     """
-    if model is None:
-        return "Error: The AI model is not initialized. Please check your API key.", []
+    if len(function_calls) == 1:
+        return [_run_function_call(function_calls[0], user_id)]
+    # Each worker runs in a copy of the caller's context, so tool spans join the caller's trace.
+    contexts = [contextvars.copy_context() for _ in function_calls]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(function_calls))) as pool:
+        return list(pool.map(lambda context, call: context.run(_run_function_call, call, user_id), contexts, function_calls))
 
-    chat = model.start_chat(history=chat_history)
-    
-    try:
-        response = chat.send_message(user_prompt)
-        first_part = response.candidates[0].content.parts[0]
-        
-        if first_part.function_call.name:
-            function_call = first_part.function_call
-            function_name = function_call.name
-            args = {key: value for key, value in function_call.args.items()}
-            
-            available_functions = {
-                "schedule_event": schedule_event,
-                "list_today_events": list_today_events,
-            }
-            function_to_call = available_functions[function_name]
-            
-            function_response_str = function_to_call(**args)
-            
-            # +++ THIS IS THE CORRECTED BLOCK +++
-            # Construct the function response dictionary
-            function_response_content = {
-                "function_response": {
-                    "name": function_name,
-                    "response": {
-                        "result": function_response_str
-                    }
-                }
-            }
-            # Send the dictionary directly back to the model without using 'Part'
-            response = chat.send_message(content=function_response_content)
-            # +++ END OF CORRECTION +++
-
-            final_text = response.candidates[0].content.parts[0].text
-            return final_text, chat.history
+def _chunks(response, stream):
+    # A streamed response yields partial responses; a regular one is a single chunk.
+    return response if stream else [response]
+
+def _run_agent(model, user_prompt, chat_history, stream, user_id=None):
+    """
+    The agent loop, as a generator of reply text. Every function call in a response
+    is executed (in parallel) and all results go back in one message; this repeats
+    until the model answers with text or AGENT_MAX_ITERATIONS is reached. With
+    stream=True text is yielded chunk by chunk as it arrives; function-call parts
+    are collected from the chunks instead of being shown.
+
+    The new turns are recorded into chat_history (a HistoryManager) at the end, with
+    prompt tokens, time to first token, total latency and a per-step breakdown in
+    chat_history.last_request.
+    """
+    started = time.perf_counter()
+    sent_history = chat_history.history()
+    chat = model.start_chat(history=sent_history)
+    prompt_tokens = 0
+    first_token_seconds = None
+    steps = []
 
+    @tracing.traced('agentic_ai.model_step')
+    def send(message):
+        """Sends one message and yields its text; returns the function calls it asked for."""
+        nonlocal prompt_tokens, first_token_seconds
+        step_started = time.perf_counter()
+        # Retried on throttling / 5xx; a failed send leaves the chat history untouched.
+        gemini = get_client('gemini')
+        response = gemini.call(chat.send_message, message, stream=True) if stream else gemini.call(chat.send_message, message)
+        function_calls = []
+        step_tokens = 0
+        for chunk in _chunks(response, stream):
+            step_tokens = max(step_tokens, _prompt_tokens(chunk))
+            function_calls.extend(_function_calls(chunk))
+            text = _response_text(chunk)
+            if text:
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - started
+                yield text
+        prompt_tokens += step_tokens
+        steps.append({'step': 'model', 'seconds': time.perf_counter() - step_started})
+        return function_calls
+
+    try:
+        function_calls = yield from send(user_prompt)
+        iterations = 1
+        while function_calls:
+            if iterations >= AGENT_MAX_ITERATIONS:
+                yield "Sorry, that took too many steps to work out. Please try a simpler request."
+                break
+            step_started = time.perf_counter()
+            results = run_function_calls(function_calls, user_id=user_id)
+            steps.append({'step': 'tools', 'seconds': time.perf_counter() - step_started,
+                          'calls': [(r['name'], r['seconds']) for r in results]})
+            # One follow-up message carries every function response, as plain dicts
+            # (no 'Part' objects, for older google-generativeai versions).
+            function_calls = yield from send(
+                [{"function_response": {"name": r['name'], "response": {"result": r['result']}}} for r in results])
+            iterations += 1
+        if first_token_seconds is None and not function_calls:
+            yield "Sorry, I encountered an issue and couldn't generate a response. Please try again."
     except (ValueError, AttributeError, IndexError):
-        try:
-            final_text = response.candidates[0].content.parts[0].text
-            return final_text, chat.history
-        except (IndexError, AttributeError):
-            return "Sorry, I encountered an issue and couldn't generate a response. Please try again.", chat.history
-            
+        yield "Sorry, I encountered an issue and couldn't generate a response. Please try again."
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
-        return f"Sorry, I ran into an unexpected error: {e}", chat.history
\ No newline at end of file
+        yield f"Sorry, I ran into an unexpected error: {e}"
+    finally:
+        chat_history.record(chat.history[len(sent_history):])
+        seconds = time.perf_counter() - started
+        chat_history.last_request = {'prompt_tokens': prompt_tokens, 'seconds': seconds,
+                                     'first_token_seconds': first_token_seconds,
+                                     'history_entries': len(sent_history), 'steps': steps}
+        breakdown = ', '.join(f"{step['step']} {step['seconds']:.2f}s" for step in steps)
+        first_token = f"{first_token_seconds:.2f}s" if first_token_seconds is not None else "n/a"
+        print(f"🧮 Assistant request: {prompt_tokens} prompt tokens, {len(sent_history)} history entries, "
+              f"first token {first_token}, total {seconds:.2f}s ({breakdown})")
+
+def process_user_request(model, user_prompt, chat_history, user_id=None):
+    """
+    Sends the user prompt to Gemini, runs any function calls it asks for (on user_id's
+    calendar), and returns (final_text, chat_history) once the whole reply is in.
+    """
+    if model is None:
+        return "Error: The AI model is not initialized. Please check your API key.", chat_history
+    return ''.join(_run_agent(model, user_prompt, chat_history, stream=False, user_id=user_id)), chat_history
+
+def stream_user_request(model, user_prompt, chat_history, user_id=None):
+    """
+    Streaming variant of process_user_request: a generator of reply text chunks, for
+    st.write_stream. chat_history is updated once the generator is exhausted.
+    """
+    if model is None:
+        yield "Error: The AI model is not initialized. Please check your API key."
+        return
+    yield from _run_agent(model, user_prompt, chat_history, stream=True, user_id=user_id)
+
+# Every public function above becomes a timing span (see tracing.py).
+tracing.instrument(globals())
@@ -1,19 +1,38 @@
 # File: ai_coach.py
+# google.generativeai is imported when the coach model is first needed.
 
-import google.generativeai as genai
 import streamlit as st
-import pandas as pd
+import re
+import threading
+import time
 
-def get_coach_advice(schedule_summary, detected_emotion):
-    """
-    Uses Google's Gemini Pro model to generate advice based on the user's
-    schedule summary and detected emotional state.
-    """
-    try:
-        genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
-    except Exception:
-        return "Error: Google API Key not configured. Please add it to your .streamlit/secrets.toml file."
+from response_cache import ResponseCache, content_hash
+from resilient_client import get_client
+import tracing
 
+COACH_MODEL = 'gemini-2.5-flash-preview-05-20'
+# Advice is cached per (schedule summary, emotion, model), so a user who keeps looking
+# at the dashboard gets the same paragraph back instead of a new LLM call per rerun.
+COACH_CACHE_TTL_SECONDS = 30 * 60
+COACH_CACHE_ENTRIES = 256
+COACH_CACHE_DIR = '.focusflow_cache/coach'  # None keeps the cache in memory only
+
+_advice_cache = ResponseCache(COACH_CACHE_ENTRIES, disk_dir=COACH_CACHE_DIR, ttl_seconds=COACH_CACHE_TTL_SECONDS)
+_model = None
+_model_lock = threading.Lock()
+
+def advice_fingerprint(schedule_summary, detected_emotion, model_name=COACH_MODEL):
+    """Cache key for a request; whitespace and letter case do not change the advice."""
+    summary = re.sub(r'\s+', ' ', str(schedule_summary)).strip()
+    emotion = str(detected_emotion).strip().lower()
+    return content_hash(model_name, emotion, summary)
+
+def coach_cache_stats():
+    """Hit/miss counters and size of the advice cache."""
+    return _advice_cache.stats()
+
+def build_coach_prompt(schedule_summary, detected_emotion):
+    """The coaching prompt for a schedule summary and a detected emotion."""
     # The prompt is the most important part. It gives the AI its personality and context.
     prompt = f"""
     You are FocusFlow, an empathetic and insightful AI wellness coach for students.
@@ -31,10 +50,85 @@ def get_coach_advice(schedule_summary, detected_emotion):
     - **Give one specific, actionable tip.** Don't just give platitudes. If they have back-to-back 'Focus Blocks', suggest a specific type of stretch during their 'Mindful Break'. If they look tired, suggest they use their break to step away from the screen entirely.
     - Keep it concise and positive.
     """
+    return prompt
+
+def _get_model():
+    """The coach model, configured and created once per process; None without an API key."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            import google.generativeai as genai
+            try:
+                genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
+            except Exception:
+                return None
+            _model = genai.GenerativeModel(COACH_MODEL)
+        return _model
+
+def get_coach_advice(schedule_summary, detected_emotion):
+    """
+    Uses Google's Gemini Pro model to generate advice based on the user's
+    schedule summary and detected emotional state.
+    """
+    key = advice_fingerprint(schedule_summary, detected_emotion)
+    advice = _advice_cache.get(key)
+    if advice is not None:
+        return advice
+
+    model = _get_model()
+    if model is None:
+        return "Error: Google API Key not configured. Please add it to your .streamlit/secrets.toml file."
+
+    try:
+        response = get_client('gemini').call(model.generate_content, build_coach_prompt(schedule_summary, detected_emotion))
+        advice = response.text
+    except Exception as e:
+        return f"An error occurred with the AI model: {e}"
+    _advice_cache.put(key, advice)
+    return advice
+
+def stream_coach_advice(schedule_summary, detected_emotion, timings=None):
+    """
+    Streaming variant of get_coach_advice: yields the advice as it is generated, for
+    st.write_stream. Time to first token and total latency are logged and, if a
+    timings dict is given, stored in it. Cached advice is returned in one chunk.
+    """
+    started = time.perf_counter()
+    first_token_seconds = None
+    key = advice_fingerprint(schedule_summary, detected_emotion)
+    advice = _advice_cache.get(key)
+    if advice is not None:
+        if timings is not None:
+            timings.update({'first_token_seconds': 0.0, 'seconds': time.perf_counter() - started, 'cached': True})
+        yield advice
+        return
+
+    model = _get_model()
+    if model is None:
+        yield "Error: Google API Key not configured. Please add it to your .streamlit/secrets.toml file."
+        return
 
+    chunks = []
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20')
-        response = model.generate_content(prompt)
-        return response.text
+        response = get_client('gemini').call(model.generate_content, build_coach_prompt(schedule_summary, detected_emotion),
+                                             stream=True)
+        for chunk in response:
+            if not chunk.parts:
+                continue
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - started
+            chunks.append(chunk.text)
+            yield chunk.text
+        if chunks:
+            _advice_cache.put(key, ''.join(chunks))
     except Exception as e:
-        return f"An error occurred with the AI model: {e}"
\ No newline at end of file
+        yield f"An error occurred with the AI model: {e}"
+    finally:
+        seconds = time.perf_counter() - started
+        if timings is not None:
+            timings.update({'first_token_seconds': first_token_seconds, 'seconds': seconds, 'cached': False})
+        first_token = f"{first_token_seconds:.2f}s" if first_token_seconds is not None else "n/a"
+        print(f"🧮 Coach advice: first token {first_token}, total {seconds:.2f}s")
+
+# Every public function above becomes a timing span (see tracing.py).
+tracing.instrument(globals(), skip=('advice_fingerprint', 'coach_cache_stats'))
@@ -1,18 +1,146 @@
 # File: app.py
 
 import streamlit as st
-import pandas as pd # Still useful for leaderboards
 import os
 import time
 
-# Import our custom V2 modules
+# Import our custom V2 modules. None of these pulls in google.generativeai or the
+# Google API client at import time; those load on the first request that needs them.
 from database import *
-from agentic_ai import get_gemini_model_with_function_calling, process_user_request
-import google.generativeai as genai
+from leaderboard import get_leaderboard, set_friend_group, display_names
+from agentic_ai import get_gemini_model_with_function_calling, stream_user_request, transcribe_audio
+from ai_coach import stream_coach_advice, coach_cache_stats
+from focus_sessions import start_session, get_session, cancel_session
+from response_cache import ResponseCache
+from chat_history import HistoryManager
+from conversation_store import ConversationStore
+import tracing
+
+FOCUS_REFRESH_SECONDS = 5
+LATENCY_PANEL_WIDTH = 700
+
+@st.cache_resource
+def _shared_assistant_model():
+    model = get_gemini_model_with_function_calling()
+    if model is None:
+        raise RuntimeError("Gemini model unavailable") # not cached, so a fixed key is picked up
+    return model
+
+def get_assistant_model():
+    """The function-calling Gemini model, built on first use and shared by every session."""
+    try:
+        return _shared_assistant_model()
+    except RuntimeError:
+        return None
+
+@tracing.traced("app.focus_session_panel")
+def focus_session_panel(was_running):
+    """Focus session controls and progress, refreshed on its own without rerunning the page."""
+    session = get_session(st.session_state.user_id)
+    if was_running and (session is None or session['state'] != "running"):
+        st.rerun() # The session just ended: refresh the whole page (stats, polling off)
+    if session and session['state'] == "running":
+        st.info(f"Focus session in progress! Avoid distractions to earn bonus points. "
+                f"{int(session['remaining_seconds'] // 60)} min {int(session['remaining_seconds'] % 60)} s left.")
+        st.progress(session['progress'])
+        if st.button("Give Up Session"):
+            cancel_session(st.session_state.user_id)
+            st.rerun()
+        return
+
+    if session and session['state'] == "completed" and st.session_state.get("celebrated_session") != session['session_id']:
+        st.session_state.celebrated_session = session['session_id']
+        st.success("Focus Session Complete! Well done!")
+        if session.get('level_up_message'): st.toast(session['level_up_message'], icon="🎉")
+        st.balloons()
+
+    focus_duration = st.slider("Select Focus Duration (minutes):", 1, 60, 25)
+    if st.button("Start Focus Session", type="primary"):
+        start_session(st.session_state.user_id, focus_duration)
+        st.rerun()
+
+def _turn_conversation_page(step):
+    st.session_state.conversation_page = st.session_state.get("conversation_page", 0) + step
+
+@st.fragment
+def conversation_panel():
+    """One page of the stored conversation, newest first; paging reruns only this panel."""
+    store = st.session_state.chat_history.store
+    count = store.exchange_count()
+    pages = store.page_count(count)
+    page = min(st.session_state.get("conversation_page", 0), pages - 1)
+    messages = store.page(page, count)
+    if not messages:
+        st.info("Your conversation will appear here.")
+    for role, text in reversed(messages):
+        role = "AI" if role == "model" else "You"
+        with st.chat_message(role):
+            st.markdown(text)
+    if pages > 1:
+        newer, position, older = st.columns([1, 2, 1])
+        newer.button("← Newer", disabled=page == 0, on_click=_turn_conversation_page, args=(-1,))
+        position.caption(f"Page {page + 1} of {pages}")
+        older.button("Older →", disabled=page >= pages - 1, on_click=_turn_conversation_page, args=(1,))
+
+def webcam_emotion_label():
+    """Streams the webcam through emotion_pipeline and returns its stable label (None until a face is seen)."""
+    try:
+        from streamlit_webrtc import webrtc_streamer
+        from emotion_pipeline import EmotionPipeline
+    except ImportError:
+        st.caption("Webcam mood detection needs streamlit-webrtc, fer and opencv-python-headless.")
+        return None
+    if "emotion_pipeline" not in st.session_state:
+        st.session_state.emotion_pipeline = EmotionPipeline()
+    pipeline = st.session_state.emotion_pipeline
+
+    def on_frame(frame):
+        # Runs on the WebRTC thread; never waits for inference, busy batches are dropped.
+        pipeline.submit(frame.to_ndarray(format="bgr24"), block=False)
+        return frame
+
+    webrtc_streamer(key="emotion", video_frame_callback=on_frame,
+                    media_stream_constraints={"video": True, "audio": False})
+    return pipeline.label
+
+def latency_panel(trace_id):
+    """Debug panel: a waterfall of one rerun's spans, and p50/p95 per operation over recent reruns."""
+    st.header("⏱️ Latency")
+    rows = tracing.waterfall(trace_id)
+    if rows:
+        import altair as alt
+        st.caption(f"This rerun: {rows[0]['duration_ms']:.0f} ms, {len(rows)} spans")
+        bars = [{'operation': f"{i + 1}. {'· ' * row['depth']}{row['name']}", 'start_ms': row['offset_ms'],
+                 'end_ms': row['offset_ms'] + row['duration_ms'], 'duration_ms': round(row['duration_ms'], 1),
+                 'error': row['error'] or ''} for i, row in enumerate(rows)]
+        chart = alt.Chart(alt.Data(values=bars)).mark_bar().encode(
+            x=alt.X('start_ms:Q', title="ms since the rerun started"), x2='end_ms:Q',
+            y=alt.Y('operation:N', sort=None, title=None),
+            color=alt.condition("datum.error != ''", alt.value('crimson'), alt.value('steelblue')),
+            tooltip=['operation:N', 'duration_ms:Q', 'error:N'])
+        st.altair_chart(chart.properties(width=LATENCY_PANEL_WIDTH))
+    stats = tracing.operation_stats()
+    st.subheader("Per operation (recent spans)")
+    st.dataframe({
+        "Operation": list(stats),
+        "Calls": [s['count'] for s in stats.values()],
+        "p50 ms": [round(s['p50_ms'], 1) for s in stats.values()],
+        "p95 ms": [round(s['p95_ms'], 1) for s in stats.values()],
+        "Max ms": [round(s['max_ms'], 1) for s in stats.values()],
+        "Errors": [s['errors'] for s in stats.values()],
+    }, hide_index=True)
 
 # --- Page Configuration ---
 st.set_page_config(layout="wide", page_title="FocusFlow V2.1")
 
+# --- Tracing ---
+# Each rerun is one trace (see tracing.py). A rerun cut short by st.rerun() never
+# reaches the end of the script, so its span is closed when the next one starts.
+if "rerun_span" in st.session_state:
+    st.session_state.rerun_span.attributes['interrupted'] = True
+    tracing.end_trace(st.session_state.rerun_span)
+st.session_state.rerun_span = tracing.begin_trace("app.rerun")
+
 # --- Initialize Session State ---
 # Ensures that our variables persist across user interactions
 if "user_id" not in st.session_state:
@@ -20,9 +148,11 @@ if "user_id" not in st.session_state:
 if "profile" not in st.session_state:
     st.session_state.profile = get_user_profile(st.session_state.user_id)
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-if "gemini_model" not in st.session_state:
-    st.session_state.gemini_model = get_gemini_model_with_function_calling()
+    # Bounded history sent to Gemini; the conversation itself is stored per user in the
+    # database (conversation_store.py), so it survives reloads and is read a page at a time.
+    st.session_state.chat_history = HistoryManager(store=ConversationStore(st.session_state.user_id))
+if "agent_results" not in st.session_state:
+    st.session_state.agent_results = ResponseCache(max_entries=32) # audio hash -> assistant reply
 
 # --- Onboarding / Profile Setup ---
 # This part remains the same. It runs only if no profile is found.
@@ -58,9 +188,33 @@ else:
         st.sidebar.metric("Points", stats['points'])
         points_in_level = stats['points'] % 500
         st.sidebar.progress(points_in_level / 500, text=f"{points_in_level}/500 Points to next level")
-    st.sidebar.subheader("Friend Leaderboard (Demo)")
-    leaderboard_data = {"Name": [st.session_state.profile['name'], "Alex", "Brenda"], "Level": [stats['level'] if stats else 1, 12, 10]}
-    st.sidebar.dataframe(leaderboard_data, hide_index=True)
+    board = get_leaderboard()
+    st.sidebar.subheader("Leaderboard")
+    top_users = display_names(board.top(5))
+    st.sidebar.dataframe({
+        "Rank": [entry['rank'] for entry in top_users],
+        "Name": [entry['name'] for entry in top_users],
+        "Level": [entry['level'] for entry in top_users],
+    }, hide_index=True)
+    my_rank = board.rank(st.session_state.user_id)
+    if my_rank:
+        st.sidebar.caption(f"Your rank: #{my_rank} of {board.size()}")
+
+    friend_group = st.session_state.profile.get('friend_group')
+    if friend_group:
+        st.sidebar.subheader(f"Friend Group: {friend_group}")
+        friends = display_names(board.top(10, group=friend_group))
+        st.sidebar.dataframe({
+            "Rank": [entry['rank'] for entry in friends],
+            "Name": [entry['name'] for entry in friends],
+            "Level": [entry['level'] for entry in friends],
+        }, hide_index=True)
+    with st.sidebar.expander("Join a friend group"):
+        group_code = st.text_input("Group code", value=friend_group or "")
+        if st.button("Save group"):
+            set_friend_group(st.session_state.user_id, group_code.strip() or None)
+            st.session_state.profile['friend_group'] = group_code.strip() or None
+            st.rerun()
 
     # --- Main Page Layout ---
     st.title("FocusFlow V2.1: Your Sentient Study Partner")
@@ -81,40 +235,36 @@ else:
         if uploaded_audio_file is not None:
             st.audio(uploaded_audio_file, format='audio/wav') # Display the uploaded audio
             
-            # Process the uploaded file
+            # Process the uploaded file. Both steps are keyed by a hash of the audio, so
+            # reruns (e.g. ticking a quest) with the same file still uploaded are free.
             with st.spinner("Assistant is analyzing your audio..."):
-                # Configure the API key for this usage
-                try:
-                    genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
-                except Exception as e:
-                    st.error(f"API Key Error: {e}")
-
-                # Use Gemini 1.5 Flash to transcribe the audio
-                audio_file = genai.upload_file(uploaded_audio_file)
-                transcribe_model = genai.GenerativeModel('models/gemini-1.5-flash-latest')
-                
-                # Ask the model to transcribe the audio
-                response = transcribe_model.generate_content(["Please transcribe this audio.", audio_file])
-                
-                if response and response.text:
-                    user_prompt = response.text
-                    st.info(f"**You said:** {user_prompt}")
-
-                    # Now, process the transcribed text with our agentic model
-                    ai_response, history = process_user_request(st.session_state.gemini_model, user_prompt, st.session_state.chat_history)
-                    st.session_state.chat_history = history # Update the chat history
-                else:
-                    st.error("Sorry, I couldn't understand the audio. Please try again.")
-
-        # Display Chat History (no changes here)
+                audio_hash, user_prompt = transcribe_audio(uploaded_audio_file)
+
+            if user_prompt:
+                st.info(f"**You said:** {user_prompt}")
+
+                # Now, process the transcribed text with our agentic model, once per recording.
+                # The reply is streamed in as it is generated; chat_history is updated at the end.
+                ai_response = st.session_state.agent_results.get(audio_hash)
+                if ai_response is None:
+                    with st.chat_message("AI"):
+                        ai_response = st.write_stream(stream_user_request(
+                            get_assistant_model(), user_prompt, st.session_state.chat_history,
+                            user_id=st.session_state.user_id))
+                    st.session_state.agent_results.put(audio_hash, ai_response)
+                    st.session_state.conversation_page = 0 # show the latest exchange
+            else:
+                st.error("Sorry, I couldn't understand the audio. Please try again.")
+
+        # Display Chat History, one page at a time
         st.write("---")
         st.subheader("Conversation History")
-        if not st.session_state.chat_history:
-            st.info("Your conversation will appear here.")
-        for message in reversed(st.session_state.chat_history):
-            role = "AI" if message.role == "model" else "You"
-            with st.chat_message(role):
-                st.markdown(message.parts[0].text)
+        last_request = st.session_state.chat_history.last_request
+        if last_request:
+            first_token = last_request['first_token_seconds']
+            st.caption(f"Last request: {last_request['prompt_tokens']} prompt tokens, "
+                       f"first token {first_token or 0:.1f}s, total {last_request['seconds']:.1f}s")
+        conversation_panel()
 
     # --- Column 2 for Quests and Focus Mode (No changes here) ---
     with col2:
@@ -132,16 +282,31 @@ else:
                 st.rerun() # Rerun to update stats immediately
         
         st.subheader("Guardian Focus Mode")
-        focus_duration = st.slider("Select Focus Duration (minutes):", 1, 60, 25)
-        
-        if st.button("Start Focus Session", type="primary"):
-            st.info(f"Focus session started! Avoid distractions for {focus_duration} minutes to earn bonus points.")
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep((focus_duration * 60) / 100) # Sleep for a fraction of the total time
-                progress_bar.progress(i + 1)
-            
-            st.success("Focus Session Complete! Well done!")
-            level_up_msg = update_gamification_stats(st.session_state.user_id, points_to_add=100, sessions_to_add=1)
-            if level_up_msg: st.toast(level_up_msg, icon="🎉")
-            st.balloons()
\ No newline at end of file
+        # The session lives in the database (see focus_sessions.py), so it survives
+        # reloads; only this fragment reruns, every FOCUS_REFRESH_SECONDS while it runs.
+        session = get_session(st.session_state.user_id)
+        running = bool(session) and session['state'] == "running"
+        st.fragment(focus_session_panel, run_every=FOCUS_REFRESH_SECONDS if running else None)(running)
+
+        st.subheader("AI Coach")
+        detected_emotion = None
+        if st.toggle("Detect my mood with the webcam"):
+            detected_emotion = webcam_emotion_label()
+            st.caption(f"Detected mood: {detected_emotion or 'no face yet'}")
+        if detected_emotion is None:
+            detected_emotion = st.selectbox("How are you feeling?", ["neutral", "happy", "sad", "stressed", "tired"])
+        if st.button("Get Coach Advice"):
+            timings = {}
+            with st.chat_message("AI"):
+                from calendar_functions import list_today_events
+                st.write_stream(stream_coach_advice(list_today_events(user_id=st.session_state.user_id),
+                                                    detected_emotion, timings))
+            cache = coach_cache_stats()
+            source = "cached" if timings.get('cached') else f"first token {timings.get('first_token_seconds') or 0:.1f}s"
+            st.caption(f"{source}, total {timings.get('seconds', 0):.1f}s · coach cache {cache['hits']} hits / {cache['misses']} misses")
+
+# --- Debug: latency panel (opt-in) ---
+rerun_span = st.session_state.pop("rerun_span")
+tracing.end_trace(rerun_span)
+if st.sidebar.toggle("Show latency panel", key="show_latency_panel"):
+    latency_panel(rerun_span.trace_id)
@@ -1,120 +1,171 @@
 # File: autonomous_scheduler.py
+# Fetch -> plan -> commit. Planning itself is pure (planner.py); run with --dry-run
+# to print the plan and the calendar changes it implies without writing anything.
 
+import argparse
 import datetime as dt
 import pytz
-from google_calendar_agent import get_calendar_service, get_events_in_range, create_calendar_event
+from googleapiclient.errors import HttpError
+from google_calendar_agent import (get_calendar_service, create_calendar_events_batch, get_busy_intervals,
+                                   get_plan_key, commit_event_changes, is_insufficient_scope,
+                                   DEFAULT_USER_ID, USE_FREEBUSY, scopes_for)
+from event_store import get_synced_events_in_range
+from intervals import events_to_intervals
+from plan_diff import diff_plan
+from database import get_user_profile
+from planner import (FOCUS_BLOCK_MINUTES, BREAK_BLOCK_MINUTES, BLOCKS_BEFORE_BREAK, MIN_FREE_SLOT_MINUTES,
+                     build_plan, constraints_from_profile, fill_free_slots, format_plan)
+import intervals
 
 # --- Configuration ---
-FOCUS_BLOCK_MINUTES = 50
-BREAK_BLOCK_MINUTES = 10
-BLOCKS_BEFORE_BREAK = 2
+# Block lengths and the free-slot minimum live in planner.py.
 SCHEDULING_WINDOW_DAYS = 5
-MIN_FREE_SLOT_MINUTES = 60
+
+# Free/busy mode (USE_FREEBUSY, in google_calendar_agent.py next to the scope it needs):
+# besides the events of 'primary', read the merged busy times of every other calendar
+# listed here with one freebusy.query call, without downloading their events.
+# Add the IDs of e.g. a school timetable or a shared family calendar.
+BUSY_CALENDAR_IDS = ['primary']
 
 INDIAN_TIMEZONE = pytz.timezone('Asia/Kolkata')
 
-def robust_datetime_parser(datetime_str):
+def find_free_slots(existing_events, start_time, end_time, presorted=False):
     """
-    A more robust parser that can handle ISO strings ending with 'Z'.
-    *** THIS IS THE NEW FUNCTION THAT FIXES THE BUG ***
+    Analyzes a list of existing events and returns a list of free time slots.
+    Overlapping and nested events are merged first, all-day events block their whole
+    day, and events marked as "free" (transparent) are ignored. Pass presorted=True when
+    the events already arrive ordered by start time (such as the iter_events_in_range
+    stream); they are then consumed one at a time, never collected into a list.
     """
-    # If the string ends with 'Z', replace it with the UTC offset '+00:00'
-    # which fromisoformat() can understand.
-    if datetime_str.endswith('Z'):
-        datetime_str = datetime_str[:-1] + '+00:00'
-    return dt.datetime.fromisoformat(datetime_str)
+    busy_intervals = events_to_intervals(existing_events, INDIAN_TIMEZONE)
+    return find_free_slots_from_busy(busy_intervals, start_time, end_time, presorted=presorted)
 
-def find_free_slots(existing_events, start_time, end_time):
+def find_free_slots_from_busy(busy_intervals, start_time, end_time, presorted=False):
     """
-    Analyzes a list of existing events and returns a list of free time slots.
+    Returns the free time slots left between compact (start, end) busy intervals,
+    such as the ones returned by freebusy.query. Intervals may overlap or nest.
     """
-    free_slots = []
-    current_time = start_time
-    
-    sorted_events = sorted(existing_events, key=lambda x: x['start'].get('dateTime', x['start'].get('date')))
-
-    for event in sorted_events:
-        event_start_str = event['start'].get('dateTime')
-        if not event_start_str:
-            continue
-        
-        # --- EDITED TO USE THE ROBUST PARSER ---
-        # Convert event time using our new robust function, then make it timezone-aware for IST
-        event_start = robust_datetime_parser(event_start_str).astimezone(INDIAN_TIMEZONE)
-        
-        if current_time < event_start:
-            free_slots.append({'start': current_time, 'end': event_start})
-            
-        event_end_str = event['end'].get('dateTime')
-        
-        # --- EDITED TO USE THE ROBUST PARSER ---
-        # Also apply the robust parser to the end time
-        current_time = robust_datetime_parser(event_end_str).astimezone(INDIAN_TIMEZONE)
-
-    if current_time < end_time:
-        free_slots.append({'start': current_time, 'end': end_time})
-        
-    return free_slots
+    return [
+        {'start': slot_start.astimezone(INDIAN_TIMEZONE), 'end': slot_end.astimezone(INDIAN_TIMEZONE)}
+        for slot_start, slot_end in intervals.free_slots(busy_intervals, start_time, end_time, presorted=presorted)
+    ]
+
+def plan_focus_sessions(free_slots):
+    """
+    Fills the free slots with Focus and Break blocks in memory, without touching
+    the calendar. Returns a list of {'summary', 'start', 'end', 'color_id', 'key'} dicts
+    (see planner.fill_free_slots). No profile constraints are applied here; the
+    scheduler itself plans through planner.build_plan.
+    """
+    return fill_free_slots([(slot['start'], slot['end']) for slot in free_slots])
 
 def schedule_focus_sessions_in_slots(service, free_slots):
     """
     Takes a list of free slots and fills them with Focus and Break blocks.
+    The whole plan is built first and then committed through the Calendar batch endpoint.
+    """
+    planned_blocks = plan_focus_sessions(free_slots)
+    if not planned_blocks:
+        return []
+    print(f"\nCommitting {len(planned_blocks)} blocks to your calendar...")
+    return create_calendar_events_batch(service, planned_blocks)
+
+def replan_focus_sessions(service, free_slots, existing_blocks, now):
+    """
+    Plans the free slots and writes only the difference against the blocks earlier
+    runs already placed (existing_blocks). Re-running on an unchanged calendar makes
+    no write calls at all.
+    """
+    return commit_plan(service, {'blocks': plan_focus_sessions(free_slots)}, existing_blocks, now)
+
+def commit_plan(service, plan, existing_blocks, now):
+    """
+    Writes a plan from planner.build_plan to the calendar: only the difference
+    against the blocks earlier runs already placed. Returns the commit summary.
+    """
+    diff = diff_plan(plan['blocks'], existing_blocks, now)
+    print(f"\nPlan: {len(diff['insert'])} to insert, {len(diff['patch'])} to patch, "
+          f"{len(diff['delete'])} to delete, {diff['unchanged']} already in place.")
+    return commit_event_changes(service, diff['insert'], diff['patch'], diff['delete'])
+
+def fetch_busy_and_blocks(service, start_of_window, end_of_window, use_freebusy=USE_FREEBUSY,
+                          calendar_ids=BUSY_CALENDAR_IDS, user_id=DEFAULT_USER_ID):
+    """
+    Reads (busy intervals, existing FocusFlow blocks) for the window. Read-only.
+
+    'primary' is always read as events (deltas only, from the synced event store):
+    the scheduler's own blocks live there, busy on the calendar but not for the
+    planner, which is about to replace them, and only the events tell a block apart
+    from a real event at the same time. In free/busy mode the other calendars in
+    calendar_ids add their merged busy times; a token that was never granted the
+    free/busy scope reads 'primary' alone.
+    """
+    print(f"Fetching existing events from {start_of_window.strftime('%Y-%m-%d')} to {end_of_window.strftime('%Y-%m-%d')}...")
+    existing_events = get_synced_events_in_range(service, start_of_window, end_of_window, user_id=user_id)
+    existing_blocks = [event for event in existing_events if get_plan_key(event)]
+    busy_intervals = list(events_to_intervals(
+        (event for event in existing_events if not get_plan_key(event)), INDIAN_TIMEZONE))
+
+    other_calendars = [calendar_id for calendar_id in calendar_ids if calendar_id != 'primary']
+    if use_freebusy and other_calendars:
+        print(f"Fetching busy times from {len(other_calendars)} more calendar(s)...")
+        try:
+            busy_intervals += get_busy_intervals(service, start_of_window, end_of_window, other_calendars)
+        except HttpError as error:
+            if not is_insufficient_scope(error):
+                raise
+            print("⚠️ This Calendar token has no free/busy scope, only 'primary' was read.")
+    return busy_intervals, existing_blocks
+
+def run_autonomous_scheduler(use_freebusy=USE_FREEBUSY, calendar_ids=BUSY_CALENDAR_IDS, service=None,
+                             user_id=DEFAULT_USER_ID, profile=None, dry_run=False):
+    """
+    Main function to execute the scheduling agent. The plan respects the user's
+    profile (institution hours, sleep window, daily focus cap). Returns the summary
+    of the changes written to the calendar, or None if the calendar could not be
+    reached. With dry_run=True nothing is written and {'plan', 'diff'} is returned.
     """
-    for slot in free_slots:
-        slot_duration = (slot['end'] - slot['start']).total_seconds() / 60
-        
-        if slot_duration >= MIN_FREE_SLOT_MINUTES:
-            print(f"\nFound a free slot of {int(slot_duration)} minutes. Scheduling...")
-            
-            current_time_in_slot = slot['start']
-            work_blocks_done = 0
-            
-            while current_time_in_slot + dt.timedelta(minutes=FOCUS_BLOCK_MINUTES) <= slot['end']:
-                if work_blocks_done >= BLOCKS_BEFORE_BREAK:
-                    break_start = current_time_in_slot
-                    break_end = break_start + dt.timedelta(minutes=BREAK_BLOCK_MINUTES)
-                    if break_end <= slot['end']:
-                        create_calendar_event(service, "🧠 Mindful Break", break_start, break_end, color_id='2')
-                        current_time_in_slot = break_end
-                        work_blocks_done = 0
-                    else:
-                        break
-                
-                focus_start = current_time_in_slot
-                focus_end = focus_start + dt.timedelta(minutes=FOCUS_BLOCK_MINUTES)
-                if focus_end <= slot['end']:
-                    create_calendar_event(service, "🚀 Focus Block", focus_start, focus_end, color_id='9')
-                    current_time_in_slot = focus_end
-                    work_blocks_done += 1
-                else:
-                    break
-
-def run_autonomous_scheduler():
-    """Main function to execute the scheduling agent."""
     print("🚀 Starting FocusFlow Autonomous Scheduler...")
-    service = get_calendar_service()
+    service = service or get_calendar_service(user_id, scopes=scopes_for(use_freebusy))
     if not service:
         print("Could not connect to Google Calendar. Exiting.")
-        return
+        return None
 
     now = dt.datetime.now(INDIAN_TIMEZONE)
-    start_of_window = now
-    end_of_window = now + dt.timedelta(days=SCHEDULING_WINDOW_DAYS)
-    
-    print(f"Fetching existing events from {start_of_window.strftime('%Y-%m-%d')} to {end_of_window.strftime('%Y-%m-%d')}...")
-    existing_events = get_events_in_range(service, start_of_window, end_of_window)
-    
+    # Plan whole days from midnight, so the plan for a day does not depend on the time
+    # of the run; blocks that have already started are left alone by the diff.
+    start_of_window = INDIAN_TIMEZONE.localize(dt.datetime.combine(now.date(), dt.time()))
+    end_of_window = start_of_window + dt.timedelta(days=SCHEDULING_WINDOW_DAYS)
+
+    busy_intervals, existing_blocks = fetch_busy_and_blocks(
+        service, start_of_window, end_of_window, use_freebusy, calendar_ids, user_id)
+
     print("Analyzing your calendar to find free time...")
-    free_slots = find_free_slots(existing_events, start_of_window, end_of_window)
-    
-    if not free_slots:
+    constraints = constraints_from_profile(profile if profile is not None else get_user_profile(user_id))
+    plan = build_plan(busy_intervals, start_of_window, end_of_window, constraints, INDIAN_TIMEZONE)
+    if not plan['blocks']:
         print("No free slots found to schedule focus sessions.")
-        return
-        
-    print("Scheduling new Focus and Break blocks into your calendar...")
-    schedule_focus_sessions_in_slots(service, free_slots)
-    
+
+    if dry_run:
+        diff = diff_plan(plan['blocks'], existing_blocks, now)
+        print(format_plan(plan))
+        print(f"\nDry run: would insert {len(diff['insert'])}, patch {len(diff['patch'])}, "
+              f"delete {len(diff['delete'])}; {diff['unchanged']} already in place. Nothing was written.")
+        return {'plan': plan, 'diff': diff}
+
+    print("Syncing Focus and Break blocks with your calendar...")
+    changes = commit_plan(service, plan, existing_blocks, now)
+
     print("\n✅ Your calendar has been optimized by FocusFlow Co-Pilot!")
+    return changes
 
 if __name__ == '__main__':
-    run_autonomous_scheduler()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Plan FocusFlow focus blocks and sync them to Google Calendar.")
+    parser.add_argument('--dry-run', action='store_true', help="Print the plan and the changes; write nothing.")
+    parser.add_argument('--user-id', default=DEFAULT_USER_ID)
+    parser.add_argument('--freebusy', action='store_true', help="Also read busy times of the --calendar calendars with freebusy.query.")
+    parser.add_argument('--calendar', action='append', dest='calendar_ids',
+                        help="Calendar to treat as busy (repeatable, with --freebusy).")
+    args = parser.parse_args()
+    run_autonomous_scheduler(use_freebusy=args.freebusy or USE_FREEBUSY, calendar_ids=args.calendar_ids or BUSY_CALENDAR_IDS,
+                             user_id=args.user_id, dry_run=args.dry_run)
@@ -0,0 +1,43 @@
+# File: bench_calendar_service.py
+# Cold vs warm cost of get_calendar_service().
+# Uses the real token.json when present; otherwise a dummy, non-expiring token
+# is used so the build/cache path can still be measured offline.
+
+import datetime as dt
+import os
+import statistics
+import time
+
+from google.oauth2.credentials import Credentials
+
+import google_calendar_agent
+
+WARM_CALLS = 200
+
+def _offline_credentials(token_path):
+    expiry = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) + dt.timedelta(days=1)
+    return Credentials(token='offline-benchmark-token', expiry=expiry)
+
+def main():
+    if not os.path.exists('token.json'):
+        print("token.json not found, benchmarking with offline dummy credentials.")
+        google_calendar_agent._load_credentials = _offline_credentials
+        google_calendar_agent._save_token_if_changed = lambda entry: None
+
+    google_calendar_agent.invalidate_calendar_service()
+    start = time.perf_counter()
+    google_calendar_agent.get_calendar_service()
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    warm_ms = []
+    for _ in range(WARM_CALLS):
+        start = time.perf_counter()
+        google_calendar_agent.get_calendar_service()
+        warm_ms.append((time.perf_counter() - start) * 1000)
+
+    print(f"Cold call: {cold_ms:.2f} ms")
+    print(f"Warm call: median {statistics.median(warm_ms):.4f} ms, max {max(warm_ms):.4f} ms over {WARM_CALLS} calls")
+    print(f"Speed-up: {cold_ms / statistics.median(warm_ms):.0f}x")
+
+if __name__ == '__main__':
+    main()
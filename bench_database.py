@@ -0,0 +1,59 @@
+# File: bench_database.py
+# Per-operation latency of the storage backends as the number of users grows.
+# SQLite lookups and writes stay flat (indexed user_id, one-row writes); TinyDB
+# scans the table on every lookup and rewrites the whole file on every write.
+
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from storage import SQLiteStorage, TinyDBStorage
+
+SQLITE_USER_COUNTS = (1_000, 10_000, 100_000)
+TINYDB_USER_COUNTS = (1_000, 5_000)
+SAMPLES = 200
+
+def populate_sqlite(storage, user_count):
+    rows = [(f'user{i}', f'{{"user_id": "user{i}", "level": 1, "points": {i % 5000}, "focus_sessions": 0}}')
+            for i in range(user_count)]
+    name = storage._table('gamification')
+    with storage._transaction() as connection:
+        connection.executemany(f'INSERT OR REPLACE INTO {name} (user_id, data) VALUES (?, ?)', rows)
+
+def populate_tinydb(storage, user_count):
+    storage.db.table('gamification').insert_multiple(
+        {'user_id': f'user{i}', 'level': 1, 'points': i % 5000, 'focus_sessions': 0} for i in range(user_count))
+
+def time_operations(storage, user_count, rng):
+    lookups, writes = [], []
+    for _ in range(SAMPLES):
+        user_id = f'user{rng.randrange(user_count)}'
+        started = time.perf_counter()
+        stats = storage.get('gamification', user_id)
+        lookups.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        storage.update('gamification', user_id, {'points': stats['points'] + 50})
+        writes.append(time.perf_counter() - started)
+    return statistics.median(lookups) * 1e6, statistics.median(writes) * 1e6
+
+def main():
+    rng = random.Random(1)
+    print(f"{'backend':<8} {'users':>8} {'lookup p50':>12} {'write p50':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for user_count in SQLITE_USER_COUNTS:
+            storage = SQLiteStorage(os.path.join(directory, f'bench{user_count}.db'))
+            populate_sqlite(storage, user_count)
+            lookup_us, write_us = time_operations(storage, user_count, rng)
+            print(f"{'sqlite':<8} {user_count:>8} {lookup_us:>9.1f} us {write_us:>9.1f} us")
+            storage.close()
+        for user_count in TINYDB_USER_COUNTS:
+            storage = TinyDBStorage(os.path.join(directory, f'bench{user_count}.json'))
+            populate_tinydb(storage, user_count)
+            lookup_us, write_us = time_operations(storage, user_count, rng)
+            print(f"{'tinydb':<8} {user_count:>8} {lookup_us:>9.1f} us {write_us:>9.1f} us")
+            storage.close()
+
+if __name__ == '__main__':
+    main()
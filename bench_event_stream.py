@@ -0,0 +1,61 @@
+# File: bench_event_stream.py
+# Materialised full-body fetch vs. the paginated, partial-response stream, against a
+# fake 10k-event calendar. Reports wall time, time to first event and peak memory.
+
+import datetime as dt
+import time
+import tracemalloc
+
+from autonomous_scheduler import INDIAN_TIMEZONE, find_free_slots
+from fake_calendar_service import FakeCalendarService
+from google_calendar_agent import get_events_in_range, iter_events_in_range
+
+EVENT_COUNT = 10_000
+PAGE_LATENCY_SECONDS = 0.02
+
+def make_busy_calendar(start, count):
+    events = []
+    for i in range(count):
+        event_start = start + dt.timedelta(minutes=30 * i)
+        events.append({
+            'summary': f'Lecture {i}',
+            'description': 'Reading list and room details. ' * 40,
+            'location': 'Main Building, Room 204',
+            'attendees': [{'email': f'student{j}@example.edu', 'responseStatus': 'accepted'} for j in range(8)],
+            'start': {'dateTime': event_start.isoformat(), 'timeZone': 'Asia/Kolkata'},
+            'end': {'dateTime': (event_start + dt.timedelta(minutes=20)).isoformat(), 'timeZone': 'Asia/Kolkata'},
+        })
+    return events
+
+def measure(label, run_pipeline):
+    """Times fetch + free-slot computation end to end and tracks when the first event arrived."""
+    first_event_at = []
+
+    def watch(events):
+        for event in events:
+            if not first_event_at:
+                first_event_at.append(time.perf_counter())
+            yield event
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    slots = run_pipeline(watch)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<26} total {elapsed * 1000:8.1f} ms | first event {(first_event_at[0] - started) * 1000:7.1f} ms"
+          f" | peak {peak / 1024 / 1024:7.2f} MiB | {len(slots)} free slots")
+
+def main():
+    window_start = INDIAN_TIMEZONE.localize(dt.datetime(2026, 1, 5, 0, 0))
+    window_end = window_start + dt.timedelta(days=220)
+    service = FakeCalendarService(make_busy_calendar(window_start, EVENT_COUNT), latency=PAGE_LATENCY_SECONDS)
+    print(f"{EVENT_COUNT} events, {PAGE_LATENCY_SECONDS * 1000:.0f} ms per page round trip\n")
+
+    measure("full bodies, materialised", lambda watch: find_free_slots(
+        list(watch(get_events_in_range(service, window_start, window_end))), window_start, window_end))
+    measure("partial fields, streamed", lambda watch: find_free_slots(
+        watch(iter_events_in_range(service, window_start, window_end)), window_start, window_end, presorted=True))
+
+if __name__ == '__main__':
+    main()
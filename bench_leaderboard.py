@@ -0,0 +1,54 @@
+# File: bench_leaderboard.py
+# Leaderboard latency at 100k users: the sorted index in leaderboard.py against the
+# naive "load every user and sort" approach the sidebar would otherwise run per rerun.
+
+import random
+import statistics
+import time
+
+from leaderboard import Leaderboard
+
+USER_COUNT = 100_000
+GROUP_COUNT = 1_000
+SAMPLES = 500
+
+def naive_top(points_by_user, k):
+    return sorted(points_by_user.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+def naive_rank(points_by_user, user_id):
+    points = points_by_user[user_id]
+    return 1 + sum(1 for other in points_by_user.values() if other > points)
+
+def median_us(function, arguments):
+    timings = []
+    for args in arguments:
+        started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+def main():
+    rng = random.Random(1)
+    stats = [{'user_id': f'user{i}', 'points': rng.randrange(50_000)} for i in range(USER_COUNT)]
+    profiles = [{'user_id': f'user{i}', 'friend_group': f'group{i % GROUP_COUNT}'} for i in range(USER_COUNT)]
+    points_by_user = {doc['user_id']: doc['points'] for doc in stats}
+
+    board = Leaderboard()
+    started = time.perf_counter()
+    board.rebuild(stats, profiles)
+    print(f"Index build for {USER_COUNT} users: {(time.perf_counter() - started) * 1e3:.1f} ms")
+
+    users = [(f'user{rng.randrange(USER_COUNT)}',) for _ in range(SAMPLES)]
+    updates = [(user_id, points_by_user[user_id] + rng.randrange(1, 200)) for (user_id,) in users]
+    few = users[:20]
+
+    print(f"{'operation':<16} {'index p50':>12} {'naive p50':>12}")
+    print(f"{'update':<16} {median_us(board.update, updates):>9.1f} us {'-':>12}")
+    print(f"{'rank':<16} {median_us(board.rank, users):>9.1f} us "
+          f"{median_us(lambda u: naive_rank(points_by_user, u), few):>9.1f} us")
+    print(f"{'top-10':<16} {median_us(lambda: board.top(10), [()] * SAMPLES):>9.1f} us "
+          f"{median_us(lambda: naive_top(points_by_user, 10), [()] * 20):>9.1f} us")
+    print(f"{'group top-10':<16} {median_us(lambda: board.top(10, group='group7'), [()] * SAMPLES):>9.1f} us {'-':>12}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# File: bench_planner.py
+# Planning throughput of planner.build_plan: users planned per second over a
+# five-day window, with institution hours, sleep and a daily cap applied.
+
+import datetime as dt
+import random
+import time
+
+import pytz
+
+from planner import build_plan, constraints_from_profile
+
+USER_COUNT = 5_000
+EVENTS_PER_USER = 20
+WINDOW_DAYS = 5
+TZ = pytz.timezone('Asia/Kolkata')
+
+def make_users(window_start, rng):
+    users = []
+    for _ in range(USER_COUNT):
+        busy = []
+        for _ in range(EVENTS_PER_USER):
+            start = window_start + dt.timedelta(minutes=rng.randrange(0, WINDOW_DAYS * 24 * 60, 15))
+            busy.append((start, start + dt.timedelta(minutes=rng.choice((30, 60, 90, 120)))))
+        profile = {'in_time': rng.choice(('08:00', '09:00')), 'out_time': rng.choice(('14:00', '16:30')),
+                   'daily_focus_minutes': rng.choice((150, 200, 300))}
+        users.append((busy, constraints_from_profile(profile)))
+    return users
+
+def main():
+    rng = random.Random(1)
+    window_start = TZ.localize(dt.datetime(2025, 1, 6))
+    window_end = window_start + dt.timedelta(days=WINDOW_DAYS)
+    users = make_users(window_start, rng)
+
+    started = time.perf_counter()
+    blocks = sum(len(build_plan(busy, window_start, window_end, constraints, TZ)['blocks']) for busy, constraints in users)
+    seconds = time.perf_counter() - started
+    print(f"Planned {USER_COUNT} users ({blocks} blocks) in {seconds:.2f} s: "
+          f"{USER_COUNT / seconds:,.0f} users/s, {seconds / USER_COUNT * 1e6:.0f} us per user")
+
+if __name__ == '__main__':
+    main()
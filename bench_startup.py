@@ -0,0 +1,70 @@
+# File: bench_startup.py
+# Cold start of app.py: import time and first render, each in a fresh process.
+# "lazy" is the app as it is; "eager" imports what app.py used to load up front
+# (google.generativeai, the Google API client via calendar_functions, pandas)
+# before the first render, the way the old module-level imports did.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPEATS = 3
+APP_MODULES = ['database', 'leaderboard', 'agentic_ai', 'ai_coach', 'focus_sessions', 'chat_history']
+EAGER_MODULES = ['google.generativeai', 'google.generativeai.types', 'calendar_functions', 'pandas']
+HEAVY_MODULES = ['google.generativeai', 'googleapiclient.discovery']
+
+def child(mode):
+    started = time.perf_counter()
+    if mode == 'eager':
+        for module in EAGER_MODULES:
+            __import__(module)
+    for module in APP_MODULES:
+        __import__(module)
+    imported = time.perf_counter() - started
+
+    from database import save_user_profile, init_gamification_stats
+    save_user_profile('demo_user_123', {'name': 'Bench', 'user_type': 'College', 'in_time': '09:00', 'out_time': '17:00'})
+    init_gamification_stats('demo_user_123')
+
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'), default_timeout=120)
+    render_started = time.perf_counter()
+    app.run()
+    first_render = time.perf_counter() - render_started
+    render_started = time.perf_counter()
+    app.run()
+    rerun = time.perf_counter() - render_started
+    loaded = [module for module in HEAVY_MODULES if module in sys.modules]
+    print(f"{imported:.4f} {first_render:.4f} {rerun:.4f} {','.join(loaded) or '-'}")
+
+def measure(mode):
+    results = []
+    for _ in range(REPEATS):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'FOCUSFLOW_SQLITE_PATH': os.path.join(directory, 'bench.db'),
+                   'PYTHONPATH': os.path.dirname(os.path.abspath(__file__))}
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, '-W', 'ignore', __file__, '--child', mode], cwd=directory,
+                                    env=env, capture_output=True, text=True, check=True).stdout
+            total = time.perf_counter() - started
+        imported, first_render, rerun, loaded = output.strip().splitlines()[-1].split()
+        results.append((float(imported), float(first_render), float(rerun), total, loaded))
+    return min(results, key=lambda r: r[3])
+
+def main():
+    print(f"{'mode':<6} {'imports':>9} {'1st render':>11} {'rerun':>8} {'process':>9}  heavy modules loaded")
+    for mode in ('eager', 'lazy'):
+        imported, first_render, rerun, total, loaded = measure(mode)
+        print(f"{mode:<6} {imported:>7.2f} s {first_render:>9.2f} s {rerun:>6.2f} s {total:>7.2f} s  {loaded}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--child', choices=['eager', 'lazy'])
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+    else:
+        main()
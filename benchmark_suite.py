@@ -0,0 +1,252 @@
+# File: benchmark_suite.py
+# Offline, repeatable benchmarks of the hot paths, saved as JSON so runs from
+# different commits can be compared.
+#
+# Calendar calls go to fake_calendar_service.FakeCalendarService and Gemini calls to
+# fake_gemini.FakeGenerativeModel, both with configurable latency and error rate, and
+# calendars come from synthetic_calendars; nothing touches the network, and every
+# input is seeded. Each benchmark runs WARMUP_RUNS untimed and then --repeats timed
+# runs; results keep min, median, p95 and mean per benchmark.
+#
+#   python benchmark_suite.py                                  # writes benchmark_results/<commit>.json
+#   python benchmark_suite.py --compare benchmark_results/<old commit>.json
+#   python benchmark_suite.py --only find_free_slots --calendar-latency 0.05
+
+import argparse
+import contextlib
+import datetime as dt
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import pytz
+
+from fake_calendar_service import FakeCalendarService
+from fake_gemini import FakeGenerativeModel
+from resilient_client import configure_client, restore_client
+from synthetic_calendars import SCENARIOS, generate
+
+REPEATS = 7
+WARMUP_RUNS = 1
+RESULTS_DIR = 'benchmark_results'
+REGRESSION_THRESHOLD = 0.20  # a median this much slower than the baseline is a regression; runs vary ~10-15%
+SEED = 1
+AGENT_TURNS = 6               # requests per process_user_request run, enough to trigger history folding
+DATABASE_USERS = 200
+TZ = pytz.timezone('Asia/Kolkata')
+WINDOW_START = TZ.localize(dt.datetime(2025, 1, 6))
+
+def measure(run, repeats=REPEATS, warmup=WARMUP_RUNS):
+    """Timings of run() in milliseconds; its prints are swallowed so they don't skew them."""
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index in range(warmup + repeats):
+            started = time.perf_counter()
+            run()
+            if index >= warmup:
+                samples.append(1000 * (time.perf_counter() - started))
+    ordered = sorted(samples)
+    return {'repeats': repeats, 'min_ms': ordered[0], 'median_ms': statistics.median(ordered),
+            'p95_ms': ordered[math.ceil(0.95 * len(ordered)) - 1], 'mean_ms': statistics.fmean(ordered)}
+
+# --- Benchmarks ---
+# Each one is a function of the run options returning {name: run} for measure().
+
+def free_slot_benchmarks(options):
+    from autonomous_scheduler import find_free_slots
+    runs = {}
+    for scenario in SCENARIOS:
+        events, window_end = generate(scenario, WINDOW_START, SEED)
+        runs[f"find_free_slots[{scenario}]"] = lambda events=events, window_end=window_end: \
+            find_free_slots(events, WINDOW_START, window_end)
+    return runs
+
+def scheduling_benchmarks(options):
+    from autonomous_scheduler import find_free_slots, schedule_focus_sessions_in_slots
+    runs = {}
+    for scenario in SCENARIOS:
+        events, window_end = generate(scenario, WINDOW_START, SEED)
+        free_slots = find_free_slots(events, WINDOW_START, window_end)
+
+        def run(free_slots=free_slots):
+            service = FakeCalendarService(latency=options.calendar_latency, error_rate=options.error_rate, seed=SEED)
+            schedule_focus_sessions_in_slots(service, free_slots)
+        runs[f"schedule_focus_sessions_in_slots[{scenario}]"] = run
+    return runs
+
+def agent_benchmarks(options):
+    import agentic_ai
+    from chat_history import HistoryManager
+    from google_calendar_agent import get_events_in_range
+
+    events, _ = generate('dense', WINDOW_START, SEED)
+    calendar = FakeCalendarService(events, latency=options.calendar_latency, seed=SEED)
+
+    def list_today_events():
+        day_events = get_events_in_range(calendar, WINDOW_START, WINDOW_START + dt.timedelta(days=1))
+        return '\n'.join(f"- {event['start']['dateTime']}: {event['summary']}" for event in day_events)
+
+    def summarize(previous_summary, transcript):
+        return f"{previous_summary}\n{transcript[:200]}"
+
+    def run_turns(stream):
+        model = FakeGenerativeModel(tools=['calendar'], latency=options.gemini_latency,
+                                    chunk_latency=options.gemini_latency / 10,
+                                    error_rate=options.error_rate, seed=SEED)
+        history = HistoryManager(summarizer=summarize)
+        original = dict(agentic_ai.AVAILABLE_FUNCTIONS)
+        agentic_ai.AVAILABLE_FUNCTIONS['list_today_events'] = list_today_events
+        # The real Gemini quota would make the rate limiter the only thing measured;
+        # retries and backoff stay as configured.
+        previous_client = configure_client('gemini', rate=1_000_000)
+        try:
+            for turn in range(AGENT_TURNS):
+                prompt = f"What is on my calendar today? (turn {turn})"
+                if stream:
+                    ''.join(agentic_ai.stream_user_request(model, prompt, history))
+                else:
+                    agentic_ai.process_user_request(model, prompt, history)
+        finally:
+            restore_client('gemini', previous_client)
+            agentic_ai.AVAILABLE_FUNCTIONS.clear()
+            agentic_ai.AVAILABLE_FUNCTIONS.update(original)
+
+    return {
+        f"process_user_request[{AGENT_TURNS} turns]": lambda: run_turns(stream=False),
+        f"stream_user_request[{AGENT_TURNS} turns]": lambda: run_turns(stream=True),
+    }
+
+def database_benchmarks(options):
+    import database
+    from storage import SQLiteStorage
+
+    directory = tempfile.mkdtemp(prefix='focusflow-bench-')
+    storage = SQLiteStorage(os.path.join(directory, 'bench.db'))
+    user_ids = [f"bench_user_{i}" for i in range(DATABASE_USERS)]
+
+    @contextlib.contextmanager
+    def bench_storage():
+        # database.py reads its module-level storage on every call.
+        original = database.storage
+        database.storage = storage
+        try:
+            yield
+        finally:
+            database.storage = original
+
+    def save_profiles():
+        with bench_storage():
+            for user_id in user_ids:
+                database.save_user_profile(user_id, {'name': user_id, 'in_time': '09:00', 'out_time': '15:00'})
+                database.init_gamification_stats(user_id)
+
+    def read_profiles():
+        with bench_storage():
+            for user_id in user_ids:
+                database.get_user_profile(user_id)
+                database.get_gamification_stats(user_id)
+
+    def update_stats():
+        with bench_storage():
+            for user_id in user_ids:
+                database.update_gamification_stats(user_id, points_to_add=50)
+            database.flush_gamification_stats()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        save_profiles()  # the read and update benchmarks need the rows, whichever run comes first
+    return {
+        f"database.save_profile+init_stats[{DATABASE_USERS} users]": save_profiles,
+        f"database.get_profile+get_stats[{DATABASE_USERS} users]": read_profiles,
+        f"database.update_gamification_stats+flush[{DATABASE_USERS} users]": update_stats,
+    }
+
+BENCHMARKS = {
+    'find_free_slots': free_slot_benchmarks,
+    'schedule_focus_sessions_in_slots': scheduling_benchmarks,
+    'process_user_request': agent_benchmarks,
+    'database': database_benchmarks,
+}
+
+# --- Results ---
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(options):
+    results = {}
+    for group in options.only or BENCHMARKS:
+        for name, run in BENCHMARKS[group](options).items():
+            results[name] = measure(run, options.repeats)
+            print(f"{name:<70} median {results[name]['median_ms']:9.2f} ms  p95 {results[name]['p95_ms']:9.2f} ms")
+    return {
+        'commit': git_commit(),
+        'created_at': dt.datetime.now(dt.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'repeats': options.repeats, 'seed': SEED, 'calendar_latency': options.calendar_latency,
+                   'gemini_latency': options.gemini_latency, 'error_rate': options.error_rate},
+        'results': results,
+    }
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Median-to-median comparison of two result files. Returns one row per benchmark in
+    both, {'name', 'baseline_ms', 'current_ms', 'change', 'regression'}; change is relative.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        before, after = baseline['results'][name]['median_ms'], result['median_ms']
+        change = (after - before) / before if before else 0.0
+        rows.append({'name': name, 'baseline_ms': before, 'current_ms': after, 'change': change,
+                     'regression': change > threshold})
+    return rows
+
+def print_comparison(rows, baseline):
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for row in rows:
+        flag = "  ❌ regression" if row['regression'] else ""
+        print(f"{row['name']:<70} {row['baseline_ms']:9.2f} -> {row['current_ms']:9.2f} ms ({row['change']:+.1%}){flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline FocusFlow benchmarks against fake Calendar and Gemini backends.")
+    parser.add_argument('--only', action='append', choices=list(BENCHMARKS), help="Run only this group (repeatable).")
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--calendar-latency', type=float, default=0.0, help="Seconds per fake Calendar round trip.")
+    parser.add_argument('--gemini-latency', type=float, default=0.0, help="Seconds before each fake Gemini response.")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Share of fake API calls failing with a 503 (retries and backoff are then timed too).")
+    parser.add_argument('--output', help=f"Result file (default {RESULTS_DIR}/<commit>.json).")
+    parser.add_argument('--compare', help="A previous result file; exits with 1 if a benchmark regressed.")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    options = parser.parse_args(argv)
+
+    results = run_suite(options)
+    output = options.output or os.path.join(RESULTS_DIR, f"{results['commit'] or 'results'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, results, options.threshold)
+        print_comparison(rows, baseline)
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
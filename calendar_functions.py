@@ -1,8 +1,9 @@
 # File: calendar_functions.py
 import datetime as dt
-from google_calendar_agent import get_calendar_service, create_calendar_event, get_events_in_range
+from google_calendar_agent import get_calendar_service, create_calendar_event, DEFAULT_USER_ID
+from event_store import get_synced_events_in_range
 
-def schedule_event(task_description: str, date: str, time: str) -> str:
+def schedule_event(task_description: str, date: str, time: str, user_id: str = DEFAULT_USER_ID) -> str:
     """
     Schedules an event on the user's Google Calendar.
 
@@ -10,11 +11,12 @@ def schedule_event(task_description: str, date: str, time: str) -> str:
         task_description (str): What the event is about (e.g., 'Study for Math exam').
         date (str): The date in YYYY-MM-DD format.
         time (str): The time in HH:MM (24-hour) format.
+        user_id (str): Whose calendar; filled in by the agent, not by the model.
     
     Returns:
         str: A confirmation message that the event was created.
     """
-    service = get_calendar_service()
+    service = get_calendar_service(user_id)
     if not service:
         return "Error: Could not connect to Google Calendar."
     
@@ -28,14 +30,17 @@ def schedule_event(task_description: str, date: str, time: str) -> str:
     except Exception as e:
         return f"Error scheduling event: {e}. Please check the date and time format."
 
-def list_today_events() -> str:
+def list_today_events(user_id: str = DEFAULT_USER_ID) -> str:
     """
     Lists all events scheduled for today from the user's Google Calendar.
 
+    Args:
+        user_id (str): Whose calendar; filled in by the agent, not by the model.
+
     Returns:
         str: A formatted string of today's events.
     """
-    service = get_calendar_service()
+    service = get_calendar_service(user_id)
     if not service:
         return "Error: Could not connect to Google Calendar."
 
@@ -43,7 +48,7 @@ def list_today_events() -> str:
     start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
     end_of_day = now.replace(hour=23, minute=59, second=59, microsecond=999)
     
-    events = get_events_in_range(service, start_of_day, end_of_day)
+    events = get_synced_events_in_range(service, start_of_day, end_of_day, user_id=user_id)
     
     if not events:
         return "You have no events scheduled for today."
@@ -0,0 +1,24 @@
+# File: calendar_time.py
+# Calendar timestamps as aware datetimes. Kept apart from google_calendar_agent so
+# the pure modules (intervals, planner) can parse event times without importing
+# the Google client libraries.
+
+import datetime as dt
+
+import pytz
+
+# The zone events are created in, and in which all-day dates start at midnight.
+CALENDAR_TIMEZONE = pytz.timezone('Asia/Kolkata')
+
+def parse_event_time(value, tz=CALENDAR_TIMEZONE):
+    """
+    Parses a Calendar timestamp (RFC3339, possibly ending in 'Z') or an all-day date
+    into an aware datetime. An all-day date is local midnight in tz.
+    """
+    if 'T' not in value:
+        day = dt.datetime.fromisoformat(value)
+        # pytz zones need localize(); zoneinfo/datetime.timezone take tzinfo directly.
+        return tz.localize(day) if hasattr(tz, 'localize') else day.replace(tzinfo=tz)
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return dt.datetime.fromisoformat(value)
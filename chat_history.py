@@ -0,0 +1,138 @@
+# File: chat_history.py
+# Keeps the history sent to Gemini bounded, however long the session runs.
+#
+# The last RECENT_TURNS exchanges (a user message plus everything the model and the
+# tools answered) are sent verbatim; older exchanges are folded into a rolling
+# summary that rides along as the first turn. Function-call and function-response
+# payloads are only kept for the latest exchange, since the model's text answer
+# already carries what mattered. The full conversation is kept separately, as
+# plain text, for display only: in .messages, or, with a store
+# (conversation_store.ConversationStore), in the database, together with the summary
+# and recent exchanges so the conversation survives a reload.
+
+HISTORY_TOKEN_BUDGET = 2000
+RECENT_TURNS = 4
+SUMMARY_MAX_CHARS = 1500
+SUMMARY_MODEL = 'gemini-1.5-flash-latest'
+CHARS_PER_TOKEN = 4  # rough estimate, good enough for budgeting without a count_tokens call
+
+def _role(content):
+    return content['role'] if isinstance(content, dict) else content.role
+
+def _parts(content):
+    return content['parts'] if isinstance(content, dict) else list(content.parts)
+
+def _part_text(part):
+    if isinstance(part, dict):
+        return part.get('text', '')
+    return part.text or ''
+
+def _is_tool_part(part):
+    if isinstance(part, dict):
+        return 'function_call' in part or 'function_response' in part
+    return bool(part.function_call.name or part.function_response.name)
+
+def content_text(content):
+    """The plain text of a history entry; tool payloads are ignored."""
+    return ' '.join(_part_text(p) for p in _parts(content) if not _is_tool_part(p)).strip()
+
+def estimate_tokens(contents):
+    chars = 0
+    for content in contents:
+        for part in _parts(content):
+            chars += len(_part_text(part)) if not _is_tool_part(part) else len(str(part))
+    return chars // CHARS_PER_TOKEN
+
+def _strip_tool_payloads(exchange):
+    """Text-only copy of an exchange; entries that were pure tool traffic disappear."""
+    stripped = []
+    for content in exchange:
+        text = content_text(content)
+        if text:
+            stripped.append({'role': _role(content), 'parts': [{'text': text}]})
+    return stripped
+
+def _is_user_message(content):
+    return _role(content) == 'user' and bool(content_text(content))
+
+def summarize_with_gemini(previous_summary, transcript):
+    """Folds transcript lines into the running summary with a small Gemini call."""
+    import google.generativeai as genai
+    prompt = (
+        "Update this running summary of a conversation between a student and their study "
+        "assistant. Keep names, dates, times and anything that was scheduled. "
+        f"Answer in at most {SUMMARY_MAX_CHARS // 6} words.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}")
+    from resilient_client import get_client
+    response = get_client('gemini').call(genai.GenerativeModel(SUMMARY_MODEL).generate_content, prompt)
+    return response.text
+
+class HistoryManager:
+    """Bounded Gemini chat history: recent exchanges verbatim, older ones summarized."""
+
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET, recent_turns=RECENT_TURNS,
+                 summarizer=summarize_with_gemini, store=None):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summarizer = summarizer
+        self.store = store
+        self.summary = ''
+        self.exchanges = []  # each a list of history entries, oldest first
+        self.messages = []   # (role, text) of every message, for display; empty with a store
+        self.last_request = None
+        context = store.load_context() if store is not None else None
+        if context:
+            self.summary = context.get('summary', '')
+            self.exchanges = context.get('exchanges', [])
+
+    def history(self):
+        """The history to pass to model.start_chat()."""
+        history = []
+        if self.summary:
+            history.append({'role': 'user', 'parts': [{'text': f"Summary of our earlier conversation: {self.summary}"}]})
+            history.append({'role': 'model', 'parts': [{'text': "Understood, I'll keep that in mind."}]})
+        for exchange in self.exchanges:
+            history.extend(exchange)
+        return history
+
+    def record(self, new_contents):
+        """Adds the entries a send_message round appended to the chat, then compacts."""
+        new_messages = []
+        for content in new_contents:
+            if _is_user_message(content) or not self.exchanges:
+                if self.exchanges:
+                    self.exchanges[-1] = _strip_tool_payloads(self.exchanges[-1])
+                self.exchanges.append([])
+            self.exchanges[-1].append(content)
+            text = content_text(content)
+            if text:
+                new_messages.append((_role(content), text))
+        self._compact()
+        if self.store is None:
+            self.messages.extend(new_messages)
+        else:
+            self.store.append(new_messages)
+            self.store.save_context(self.context())
+
+    def context(self):
+        """The summary and recent exchanges as plain text dicts (tool payloads dropped), for storing."""
+        return {'summary': self.summary, 'exchanges': [_strip_tool_payloads(e) for e in self.exchanges]}
+
+    def _compact(self):
+        to_fold = []
+        while len(self.exchanges) > self.recent_turns:
+            to_fold.append(self.exchanges.pop(0))
+        while len(self.exchanges) > 1 and estimate_tokens(self.history()) > self.token_budget:
+            to_fold.append(self.exchanges.pop(0))
+        if to_fold:
+            self._fold(to_fold)
+
+    def _fold(self, exchanges):
+        transcript = '\n'.join(f"{_role(c)}: {content_text(c)}"
+                               for exchange in exchanges for c in exchange if content_text(c))
+        try:
+            summary = self.summarizer(self.summary, transcript)
+        except Exception as e:
+            print(f"Could not summarize chat history, keeping a truncated copy instead: {e}")
+            summary = f"{self.summary}\n{transcript}".strip()
+        self.summary = summary[-SUMMARY_MAX_CHARS:]
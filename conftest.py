@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# test_auth.py is a manual script that opens the OAuth consent flow; keep it out of pytest runs.
+collect_ignore = ['test_auth.py']
+
+# Tests that reach database.storage without their own backend get a throwaway SQLite
+# file instead of ./focusflow.db (set before storage.py reads it at import).
+os.environ.setdefault('FOCUSFLOW_SQLITE_PATH', os.path.join(tempfile.mkdtemp(prefix='focusflow-tests-'), 'focusflow.db'))
@@ -0,0 +1,88 @@
+# File: conversation_store.py
+# Per-user conversation history, persisted in the database instead of session state.
+#
+# Every exchange (the user's message and the assistant's reply; tool traffic is not
+# kept) is appended as one segment of the 'conversation_segments' segment table, so
+# writing never rewrites what is already stored. A segment is compact JSON with short
+# keys, zlib-compressed when that makes it smaller. The UI reads one page of segments
+# at a time, newest first, so a rerun loads and renders only the visible window and a
+# session holds nothing but the current page number, however long the history gets.
+#
+# The context Gemini needs to carry on (chat_history.HistoryManager's rolling summary
+# and recent exchanges, as plain text) is saved in 'conversation_context' after every
+# exchange, so a reload or a new browser session continues the same conversation.
+
+import base64
+import json
+import time
+import zlib
+
+from database import storage
+
+SEGMENTS_TABLE = 'conversation_segments'
+CONTEXT_TABLE = 'conversation_context'
+PAGE_SIZE = 5                # exchanges per page in the UI
+COMPRESS_MIN_BYTES = 256     # shorter segments are stored as plain JSON
+
+_ROLE_CODES = {'user': 'u', 'model': 'm'}
+_ROLES = {code: role for role, code in _ROLE_CODES.items()}
+
+def encode_segment(messages, timestamp):
+    """(role, text) messages as a compact string: 'j' + JSON, or 'z' + base64 of zlib'd JSON."""
+    payload = json.dumps({'t': int(timestamp), 'm': [[_ROLE_CODES.get(role, role), text] for role, text in messages]},
+                         separators=(',', ':'), ensure_ascii=False)
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        compressed = 'z' + base64.b64encode(zlib.compress(payload.encode('utf-8'), 6)).decode('ascii')
+        if len(compressed) < len(payload):
+            return compressed
+    return 'j' + payload
+
+def decode_segment(data):
+    """The inverse of encode_segment: {'timestamp', 'messages': [(role, text), ...]}."""
+    if data[0] == 'z':
+        data = 'j' + zlib.decompress(base64.b64decode(data[1:])).decode('utf-8')
+    segment = json.loads(data[1:])
+    return {'timestamp': segment['t'], 'messages': [(_ROLES.get(code, code), text) for code, text in segment['m']]}
+
+class ConversationStore:
+    """One user's conversation in the database. Pass it to HistoryManager(store=...)."""
+
+    def __init__(self, user_id, page_size=PAGE_SIZE, storage_backend=None):
+        self.user_id = user_id
+        self.page_size = page_size
+        self.storage = storage_backend or storage
+
+    def append(self, messages, now=None):
+        """Stores one exchange's (role, text) messages as a new segment; returns its number."""
+        if not messages:
+            return None
+        now = time.time() if now is None else now
+        return self.storage.append_segment(SEGMENTS_TABLE, self.user_id, encode_segment(messages, now))
+
+    def exchange_count(self):
+        return self.storage.segment_count(SEGMENTS_TABLE, self.user_id)
+
+    # page_count and page take the exchange count when the caller already has it, so
+    # rendering a page runs the count query once.
+    def page_count(self, count=None):
+        count = self.exchange_count() if count is None else count
+        return max(1, -(-count // self.page_size))
+
+    def page(self, index=0, count=None):
+        """
+        The messages of one page, oldest first; page 0 holds the latest exchanges. Only
+        that page's segments are read.
+        """
+        count = self.exchange_count() if count is None else count
+        end = count - index * self.page_size
+        if end <= 0:
+            return []
+        segments = self.storage.get_segments(SEGMENTS_TABLE, self.user_id, max(0, end - self.page_size), end)
+        return [message for _, data in segments for message in decode_segment(data)['messages']]
+
+    def save_context(self, context):
+        """Stores HistoryManager.context() (summary and recent exchanges, as plain text)."""
+        self.storage.upsert(CONTEXT_TABLE, self.user_id, context)
+
+    def load_context(self):
+        return self.storage.get(CONTEXT_TABLE, self.user_id)
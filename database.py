@@ -1,53 +1,142 @@
 # File: database.py
-from tinydb import TinyDB, Query
+import atexit
+import json
+import threading
+from storage import LazyStorage
+import tracing
 
-# Initialize a simple file-based database
-db = TinyDB('focusflow_db.json')
-users_table = db.table('users')
-gamification_table = db.table('gamification')
+# The configured storage backend (SQLite by default, see storage.py), opened on first use
+storage = LazyStorage()
+
+# Gamification increments are buffered this long so a burst of clicks (several
+# quests ticked in a row) is written as one atomic increment per user. 0 writes through.
+GAMIFICATION_FLUSH_SECONDS = 0.5
+POINTS_PER_LEVEL = 500
+
+_pending_stats = {}  # user_id -> {'points': n, 'focus_sessions': n} not yet flushed
+_points_listeners = []
+_pending_lock = threading.Lock()
+_flush_timer = None
 
 def save_user_profile(user_id, profile_data):
     """Saves or updates a user's profile."""
-    User = Query()
-    users_table.upsert({'user_id': user_id, **profile_data}, User.user_id == user_id)
+    storage.upsert('users', user_id, profile_data)
     print(f"Profile saved for user {user_id}")
 
 def get_user_profile(user_id):
     """Retrieves a user's profile."""
-    User = Query()
-    result = users_table.get(User.user_id == user_id)
+    result = storage.get('users', user_id)
     return result
 
+def get_all_user_ids():
+    """Returns the IDs of every user with a saved profile."""
+    return [user['user_id'] for user in storage.all('users')]
+
+def save_user_credentials(user_id, token_json):
+    """Saves a user's Google OAuth token (authorized-user JSON) for unattended scheduling."""
+    storage.upsert('credentials', user_id, {'token': token_json})
+
+def get_user_credentials(user_id):
+    """Retrieves a user's stored Google OAuth token as a dict, or None."""
+    result = storage.get('credentials', user_id)
+    return json.loads(result['token']) if result else None
+
 def init_gamification_stats(user_id):
     """Initializes gamification stats for a new user."""
-    Stats = Query()
-    if not gamification_table.contains(Stats.user_id == user_id):
-        gamification_table.insert({'user_id': user_id, 'level': 1, 'points': 0, 'focus_sessions': 0})
+    storage.insert_if_absent('gamification', user_id, {'level': 1, 'points': 0, 'focus_sessions': 0})
     print(f"Gamification stats initialized for user {user_id}")
 
+def level_for_points(points):
+    """Leveling logic: a new level every 500 points."""
+    return (points // POINTS_PER_LEVEL) + 1
+
+def _with_pending(user_stats, deltas):
+    if not user_stats or not deltas:
+        return user_stats
+    merged = dict(user_stats)
+    merged['points'] += deltas.get('points', 0)
+    merged['focus_sessions'] += deltas.get('focus_sessions', 0)
+    merged['level'] = level_for_points(merged['points'])
+    return merged
+
+def on_points_changed(listener):
+    """Registers listener(user_id, new_points), called after every points update (e.g. the leaderboard index)."""
+    _points_listeners.append(listener)
+
 def get_gamification_stats(user_id):
-    """Retrieves gamification stats."""
-    Stats = Query()
-    return gamification_table.get(Stats.user_id == user_id)
+    """Retrieves gamification stats, including increments that are still buffered."""
+    # Read under the lock, so a flush in progress is seen either fully stored or fully buffered.
+    with _pending_lock:
+        return _with_pending(storage.get('gamification', user_id), _pending_stats.get(user_id))
+
+def flush_gamification_stats():
+    """
+    Writes every buffered increment to storage, one atomic increment per user. A user's
+    deltas stay buffered until their increment has committed; failed ones are retried later.
+    """
+    global _flush_timer
+    with _pending_lock:
+        user_ids = list(_pending_stats)
+        _flush_timer = None
+    failed = False
+    for user_id in user_ids:
+        with _pending_lock:
+            deltas = _pending_stats.get(user_id)
+            if not deltas:
+                continue
+            try:
+                storage.increment('gamification', user_id, deltas,
+                                  derive=lambda stats: {'level': level_for_points(stats['points'])})
+            except Exception as e:
+                print(f"Could not flush gamification stats for {user_id}: {e}")
+                failed = True
+                continue
+            del _pending_stats[user_id]
+    if failed:
+        _schedule_flush()
+
+def _schedule_flush():
+    global _flush_timer
+    with _pending_lock:
+        if _flush_timer is None and _pending_stats:
+            _flush_timer = threading.Timer(GAMIFICATION_FLUSH_SECONDS, flush_gamification_stats)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+# Buffered points are written on a normal interpreter exit. A killed process (SIGKILL,
+# or a SIGTERM that skips atexit) loses at most the last GAMIFICATION_FLUSH_SECONDS of them.
+atexit.register(flush_gamification_stats)
 
 def update_gamification_stats(user_id, points_to_add=0, sessions_to_add=0):
-    """Updates points and focus sessions, and handles leveling up."""
-    Stats = Query()
-    user_stats = gamification_table.get(Stats.user_id == user_id)
-    if user_stats:
-        new_points = user_stats['points'] + points_to_add
-        new_sessions = user_stats['focus_sessions'] + sessions_to_add
-        
-        # Leveling logic: a new level every 500 points
+    """
+    Adds points and focus sessions, and handles leveling up. The increment is applied
+    atomically in storage (the level is recomputed there too), after being buffered
+    for GAMIFICATION_FLUSH_SECONDS; the level-up message is returned right away.
+    """
+    with _pending_lock:
+        deltas = _pending_stats.get(user_id, {})
+        user_stats = _with_pending(storage.get('gamification', user_id), deltas)
+        if not user_stats:
+            return None
         current_level = user_stats['level']
-        new_level = (new_points // 500) + 1
-        
-        gamification_table.update({
-            'points': new_points,
-            'focus_sessions': new_sessions,
-            'level': new_level
-        }, Stats.user_id == user_id)
-        
-        if new_level > current_level:
-            return f"Leveled Up! You are now Level {new_level}!"
-    return None
\ No newline at end of file
+        new_points = user_stats['points'] + points_to_add
+        new_level = level_for_points(new_points)
+
+        deltas = _pending_stats.setdefault(user_id, {})
+        deltas['points'] = deltas.get('points', 0) + points_to_add
+        deltas['focus_sessions'] = deltas.get('focus_sessions', 0) + sessions_to_add
+
+    if GAMIFICATION_FLUSH_SECONDS > 0:
+        _schedule_flush()
+    else:
+        flush_gamification_stats()
+    if points_to_add:
+        for listener in _points_listeners:
+            listener(user_id, new_points)
+
+    if new_level > current_level:
+        return f"Leveled Up! You are now Level {new_level}!"
+    return None
+
+# Every public function above becomes a timing span (see tracing.py).
+tracing.instrument(globals(), skip=('level_for_points', 'on_points_changed'))
@@ -0,0 +1,252 @@
+# File: emotion_pipeline.py
+# CPU-only emotion detection for the coach, from a webcam stream or a video file.
+#
+#   frames -> sample every FRAME_SKIP-th -> downscale to TARGET_WIDTH -> batch
+#          -> FER face + emotion inference in a worker process pool
+#          -> sliding-window vote -> one stable label for get_coach_advice
+#
+# Inference is the expensive stage, so it runs in separate processes (one FER
+# detector per worker, created once) and never blocks the thread that reads frames.
+# For a live stream, batches are dropped instead of queued when the workers fall
+# behind, so the label follows the user instead of lagging further and further.
+# cv2 and fer are imported only where they are used.
+
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+FRAME_SKIP = 5            # analyse every 5th frame (~6 fps from a 30 fps camera)
+TARGET_WIDTH = 320        # frames are downscaled to this width before inference
+BATCH_SIZE = 4
+PIPELINE_WORKERS = max(1, min(2, (os.cpu_count() or 2) // 2))
+MAX_BATCHES_IN_FLIGHT = 2  # per worker
+SMOOTHING_WINDOW = 12      # analysed frames the stable label is voted over
+MIN_EMOTION_SCORE = 0.3
+STAGE_SAMPLES = 1000       # latest latency samples kept per stage for the summary
+
+_detector = None
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+def _init_worker():
+    """Creates the FER detector once per worker process (OpenCV face detection, CPU only)."""
+    global _detector
+    from fer import FER
+    _detector = FER(mtcnn=False)
+
+def detect_emotions(frames):
+    """
+    Runs FER on a batch of frames. Returns one (label, score, seconds) per frame, with
+    label None when no face is found. Executed inside the worker processes.
+    """
+    if _detector is None:
+        _init_worker()
+    results = []
+    for frame in frames:
+        started = time.perf_counter()
+        label, score = _detector.top_emotion(frame)
+        results.append((label, score or 0.0, time.perf_counter() - started))
+    return results
+
+def downscale(frame, width=TARGET_WIDTH):
+    """Resizes a frame to the given width, keeping its aspect ratio; smaller frames are kept."""
+    if not width or frame.shape[1] <= width:
+        return frame
+    import cv2
+    height = int(frame.shape[0] * width / frame.shape[1])
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+def shared_executor(workers=PIPELINE_WORKERS):
+    """One process pool for every pipeline in this process (e.g. every Streamlit session)."""
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        return _shared_executor
+
+class EmotionSmoother:
+    """Score-weighted vote over the last `window` detections; frames without a face don't vote."""
+
+    def __init__(self, window=SMOOTHING_WINDOW, min_score=MIN_EMOTION_SCORE):
+        self.min_score = min_score
+        self._recent = deque(maxlen=window)
+
+    def add(self, label, score):
+        if label is not None and score >= self.min_score:
+            self._recent.append((label, score))
+
+    def label(self):
+        if not self._recent:
+            return None
+        votes = Counter()
+        for label, score in self._recent:
+            votes[label] += score
+        return votes.most_common(1)[0][0]
+
+class PipelineMetrics:
+    """Frame counters, per-stage latency and CPU usage of one pipeline run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.frames_analyzed = 0
+        self.faces_found = 0
+        self.batches_dropped = 0
+        self.batches_failed = 0
+        self.stage_seconds = {stage: deque(maxlen=STAGE_SAMPLES)
+                              for stage in ('preprocess', 'inference', 'batch_round_trip')}
+        self._cpu_start = _cpu_seconds()
+
+    def summary(self):
+        wall = time.perf_counter() - self.started
+        cpu = _cpu_seconds() - self._cpu_start
+        stages = {}
+        for stage, values in self.stage_seconds.items():
+            ordered = sorted(values)
+            stages[stage] = {'mean_ms': 1000 * sum(ordered) / len(ordered) if ordered else 0.0,
+                             'p95_ms': 1000 * ordered[math.ceil(0.95 * len(ordered)) - 1] if ordered else 0.0}
+        return {
+            'wall_seconds': wall,
+            'frames_read': self.frames_read,
+            'frames_analyzed': self.frames_analyzed,
+            'faces_found': self.faces_found,
+            'batches_dropped': self.batches_dropped,
+            'batches_failed': self.batches_failed,
+            'input_fps': self.frames_read / wall if wall else 0.0,
+            'analyzed_fps': self.frames_analyzed / wall if wall else 0.0,
+            'stages': stages,
+            'cpu_percent': 100 * cpu / wall if wall else 0.0,  # can exceed 100 with several workers
+        }
+
+def _cpu_seconds():
+    """CPU time of this process and its live children (the worker pool)."""
+    try:
+        import psutil
+    except ImportError:
+        times = os.times()
+        return times.user + times.system + times.children_user + times.children_system
+    process = psutil.Process()
+    total = sum(process.cpu_times()[:2])
+    for child in process.children(recursive=True):
+        try:
+            total += sum(child.cpu_times()[:2])
+        except psutil.Error:
+            pass
+    return total
+
+class EmotionPipeline:
+    """
+    Feed frames with submit(); read the current stable label from .label. With
+    workers=0 inference runs inline (no process pool), which is handy for tests.
+    """
+
+    def __init__(self, frame_skip=FRAME_SKIP, width=TARGET_WIDTH, batch_size=BATCH_SIZE,
+                 workers=PIPELINE_WORKERS, window=SMOOTHING_WINDOW, executor=None, detect=detect_emotions):
+        self.frame_skip = max(1, frame_skip)
+        self.width = width
+        self.batch_size = batch_size
+        self.detect = detect
+        self.executor = executor or (shared_executor(workers) if workers else None)
+        self.max_in_flight = MAX_BATCHES_IN_FLIGHT * max(1, workers)
+        self.smoother = EmotionSmoother(window)
+        self.metrics = PipelineMetrics()
+        self._batch = []
+        self._in_flight = deque()  # (future, submitted_at), oldest first
+        self._lock = threading.Lock()
+
+    @property
+    def label(self):
+        with self._lock:
+            self._collect(wait=False)
+            return self.smoother.label()
+
+    def submit(self, frame, block=True):
+        """
+        Offers one frame. Only every frame_skip-th frame is analysed. With block=False
+        (live streams) a full batch is dropped when the workers are still busy.
+        """
+        with self._lock:
+            self.metrics.frames_read += 1
+            if (self.metrics.frames_read - 1) % self.frame_skip:
+                return
+            started = time.perf_counter()
+            self._batch.append(downscale(frame, self.width))
+            self.metrics.stage_seconds['preprocess'].append(time.perf_counter() - started)
+            self.metrics.frames_sampled += 1
+            if len(self._batch) >= self.batch_size:
+                self._dispatch(block)
+
+    def flush(self):
+        """Analyses any partial batch and waits for every batch still running."""
+        with self._lock:
+            if self._batch:
+                self._dispatch(block=True)
+            self._collect(wait=True)
+        return self.smoother.label()
+
+    def _dispatch(self, block):
+        batch, self._batch = self._batch, []
+        self._collect(wait=False)
+        if len(self._in_flight) >= self.max_in_flight:
+            if not block:
+                self.metrics.batches_dropped += 1
+                return
+            self._collect(wait=True, keep=self.max_in_flight - 1)
+        submitted_at = time.perf_counter()
+        if self.executor is None:
+            self._finish(lambda: self.detect(batch), submitted_at)
+        else:
+            self._in_flight.append((self.executor.submit(self.detect, batch), submitted_at))
+
+    def _collect(self, wait, keep=0):
+        """Folds finished batches into the smoother, in submission order."""
+        while self._in_flight and len(self._in_flight) > keep:
+            future, submitted_at = self._in_flight[0]
+            if not wait and not future.done():
+                break
+            self._in_flight.popleft()
+            self._finish(future.result, submitted_at)
+
+    def _finish(self, get_results, submitted_at):
+        """Records one batch. A failed batch is counted and the previous label kept."""
+        try:
+            results = get_results()
+        except Exception as error:
+            self.metrics.batches_failed += 1
+            print(f"⚠️ Emotion batch failed: {error}")
+            return
+        self._record(results, submitted_at)
+
+    def _record(self, results, submitted_at):
+        self.metrics.stage_seconds['batch_round_trip'].append(time.perf_counter() - submitted_at)
+        for label, score, seconds in results:
+            self.metrics.frames_analyzed += 1
+            self.metrics.stage_seconds['inference'].append(seconds)
+            if label is not None:
+                self.metrics.faces_found += 1
+            self.smoother.add(label, score)
+
+def read_video_frames(path):
+    """Yields the BGR frames of a recorded video file."""
+    import cv2
+    capture = cv2.VideoCapture(path)
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+def detect_emotion_from_video(path, **pipeline_options):
+    """Runs the pipeline over a video file. Returns (stable label or None, metrics summary)."""
+    pipeline = EmotionPipeline(**pipeline_options)
+    for frame in read_video_frames(path):
+        pipeline.submit(frame)
+    label = pipeline.flush()
+    return label, pipeline.metrics.summary()
@@ -0,0 +1,178 @@
+# File: event_store.py
+# A local, per-user copy of the Google Calendar, kept current with syncToken deltas.
+# After one full sync, every later sync downloads only what changed since the last one,
+# and range queries are answered from the local copy instead of re-listing the window.
+
+import datetime as dt
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from googleapiclient.errors import HttpError
+
+from google_calendar_agent import DEFAULT_USER_ID, list_event_pages, parse_event_time
+
+EVENT_STORE_DIR = os.path.join('.focusflow_cache', 'events')
+# The window the initial full sync covers. singleEvents=True expands recurring series
+# into instances, so without an end an open-ended series would never finish listing.
+# Deltas after that are unbounded; a query reaching past the end triggers a new full sync.
+FULL_SYNC_PAST_DAYS = 30
+FULL_SYNC_FUTURE_DAYS = 180
+# Stores kept in memory, least recently used dropped first (like the service cache in
+# google_calendar_agent). A dropped store reloads from its file on the next use.
+EVENT_STORE_CACHE_SIZE = 64
+
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+def _event_bounds(event):
+    start = event['start'].get('dateTime') or event['start'].get('date')
+    end = event['end'].get('dateTime') or event['end'].get('date')
+    return parse_event_time(start), parse_event_time(end)
+
+class EventStore:
+    """
+    One user's calendar, mirrored locally and persisted as JSON.
+
+    sync() does a full sync the first time (or after the server expires the
+    sync token with a 410, or when a query reaches past the synced horizon) and an
+    incremental syncToken sync afterwards.
+    """
+
+    def __init__(self, user_id, calendar_id='primary', path=None):
+        self.user_id = user_id
+        self.calendar_id = calendar_id
+        self.path = path or os.path.join(EVENT_STORE_DIR, f'{user_id}.json')
+        self.events = {}
+        self.sync_token = None
+        self.horizon = None  # end of the window the last full sync listed
+        self._bounds = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- Persistence ---
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            saved = json.load(f)
+        if saved.get('calendar_id') != self.calendar_id:
+            return
+        self.sync_token = saved.get('sync_token')
+        self.horizon = parse_event_time(saved['horizon']) if saved.get('horizon') else None
+        for event in saved.get('events', []):
+            self._put(event)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'calendar_id': self.calendar_id,
+                'sync_token': self.sync_token,
+                'horizon': self.horizon.isoformat() if self.horizon else None,
+                'events': list(self.events.values()),
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    # --- Local mutations ---
+    def _put(self, event):
+        try:
+            bounds = _event_bounds(event)
+        except (KeyError, ValueError):
+            return
+        self.events[event['id']] = event
+        self._bounds[event['id']] = bounds
+
+    def _remove(self, event_id):
+        self.events.pop(event_id, None)
+        self._bounds.pop(event_id, None)
+
+    def _clear(self):
+        self.events = {}
+        self._bounds = {}
+        self.sync_token = None
+        self.horizon = None
+
+    # --- Syncing ---
+    def _full_sync(self, service, until=None):
+        self._clear()
+        now = dt.datetime.now(dt.timezone.utc)
+        time_min = now - dt.timedelta(days=FULL_SYNC_PAST_DAYS)
+        time_max = max(now + dt.timedelta(days=FULL_SYNC_FUTURE_DAYS), until or now)
+        for page in list_event_pages(service, self.calendar_id, singleEvents=True,
+                                     timeMin=time_min.isoformat(), timeMax=time_max.isoformat()):
+            for event in page.get('items', []):
+                if event.get('status') != 'cancelled':
+                    self._put(event)
+            self.sync_token = page.get('nextSyncToken', self.sync_token)
+        self.horizon = time_max
+        return len(self.events)
+
+    def _incremental_sync(self, service):
+        changed = 0
+        for page in list_event_pages(service, self.calendar_id, singleEvents=True, syncToken=self.sync_token):
+            for event in page.get('items', []):
+                if event.get('status') == 'cancelled':
+                    self._remove(event['id'])
+                else:
+                    self._put(event)
+                changed += 1
+            self.sync_token = page.get('nextSyncToken', self.sync_token)
+        return changed
+
+    def sync(self, service, until=None):
+        """
+        Brings the local copy up to date, covering at least up to `until`. Returns the
+        number of events that were downloaded (everything on a full sync, only the
+        changes on a delta sync).
+        """
+        with self._lock:
+            if self.sync_token is None or self.horizon is None or (until is not None and until > self.horizon):
+                print(f"Performing a full calendar sync for {self.user_id}...")
+                changed = self._full_sync(service, until)
+            else:
+                try:
+                    changed = self._incremental_sync(service)
+                except HttpError as error:
+                    if error.resp.status != 410:
+                        raise
+                    # The sync token expired on the server: start over from scratch.
+                    print(f"Sync token expired for {self.user_id}, performing a full resync...")
+                    changed = self._full_sync(service, until)
+            if changed:
+                self.save()
+            return changed
+
+    # --- Queries ---
+    def events_in_range(self, time_min, time_max):
+        """Events overlapping [time_min, time_max), sorted by start time, like events().list(orderBy='startTime')."""
+        with self._lock:
+            matches = [
+                (bounds[0], self.events[event_id])
+                for event_id, bounds in self._bounds.items()
+                if bounds[1] > time_min and bounds[0] < time_max
+            ]
+        matches.sort(key=lambda match: match[0])
+        return [event for _, event in matches]
+
+def get_event_store(user_id, calendar_id='primary'):
+    """Returns the process-wide EventStore for a user, loading it from disk the first time."""
+    key = (user_id, calendar_id)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = EventStore(user_id, calendar_id)
+            _stores[key] = store
+            while len(_stores) > EVENT_STORE_CACHE_SIZE:
+                _stores.popitem(last=False)
+        else:
+            _stores.move_to_end(key)
+        return store
+
+def get_synced_events_in_range(service, time_min, time_max, user_id=DEFAULT_USER_ID, calendar_id='primary'):
+    """Syncs the user's local event store (deltas only) and answers the range query from it."""
+    store = get_event_store(user_id, calendar_id)
+    store.sync(service, until=time_max)
+    return store.events_in_range(time_min, time_max)
@@ -0,0 +1,311 @@
+# File: fake_calendar_service.py
+# An in-process stand-in for the Google Calendar service returned by
+# google_calendar_agent.get_calendar_service(), so the scheduler can be
+# exercised offline (tests, benchmarks) without touching a real calendar.
+
+import datetime as dt
+import itertools
+import json
+import random
+import threading
+import time
+
+import httplib2
+import pytz
+from googleapiclient.errors import HttpError
+
+# The zone of the fake calendars, the one FocusFlow creates events in.
+CALENDAR_TIMEZONE = pytz.timezone('Asia/Kolkata')
+
+
+def make_http_error(status, message='Injected failure'):
+    """Builds an HttpError shaped like the ones googleapiclient raises."""
+    resp = httplib2.Response({'status': status, 'reason': message})
+    content = json.dumps({'error': {'code': status, 'message': message}}).encode('utf-8')
+    return HttpError(resp, content)
+
+
+class FakeRequest:
+    """Mimics googleapiclient.http.HttpRequest: nothing happens until execute()."""
+
+    def __init__(self, service, method, handler):
+        self._service = service
+        self.method = method
+        self._handler = handler
+
+    def execute(self, http=None, num_retries=0):
+        self._service._round_trip()
+        return self._service._dispatch(self)
+
+
+class FakeBatchHttpRequest:
+    """Mimics googleapiclient.http.BatchHttpRequest: one round trip for all items."""
+
+    def __init__(self, service, callback=None):
+        self._service = service
+        self._callback = callback
+        self._items = []
+
+    def add(self, request, callback=None, request_id=None):
+        if request_id is None:
+            request_id = str(len(self._items))
+        self._items.append((request_id, request, callback or self._callback))
+
+    def execute(self, http=None):
+        self._service._round_trip()
+        for request_id, request, callback in self._items:
+            try:
+                response, exception = self._service._dispatch(request), None
+            except HttpError as error:
+                response, exception = None, error
+            if callback:
+                callback(request_id, response, exception)
+
+
+class FakeEventsResource:
+    def __init__(self, service):
+        self._service = service
+
+    def insert(self, calendarId, body, **kwargs):
+        return FakeRequest(self._service, 'insert', lambda: self._service._insert(calendarId, body))
+
+    def get(self, calendarId, eventId, **kwargs):
+        return FakeRequest(self._service, 'get', lambda: self._service._get(calendarId, eventId))
+
+    def patch(self, calendarId, eventId, body, **kwargs):
+        return FakeRequest(self._service, 'patch', lambda: self._service._patch(calendarId, eventId, body))
+
+    def delete(self, calendarId, eventId, **kwargs):
+        return FakeRequest(self._service, 'delete', lambda: self._service._delete(calendarId, eventId))
+
+    def list(self, calendarId, **kwargs):
+        return FakeRequest(self._service, 'list', lambda: self._service._list(calendarId, **kwargs))
+
+
+class FakeFreebusyResource:
+    def __init__(self, service):
+        self._service = service
+
+    def query(self, body, **kwargs):
+        return FakeRequest(self._service, 'freebusy', lambda: self._service._freebusy(body))
+
+
+class FakeCalendarService:
+    """
+    A thread-safe, in-memory Calendar service.
+
+    latency is the simulated cost of one HTTP round trip in seconds; a batch
+    call costs a single round trip regardless of how many items it carries.
+    Failures are injected per method with fail_next('insert', 503, times=2), or at
+    random: error_rate is the share of calls failing with error_status, drawn from a
+    generator seeded with seed so a run can be repeated exactly.
+    """
+
+    def __init__(self, events=None, latency=0.0, error_rate=0.0, error_status=503, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self.calendars = {}
+        self.round_trips = 0
+        self.calls = {}
+        self._ids = itertools.count(1)
+        self._change_seq = 0
+        self._sync_epoch = 0
+        self._failures = {}
+        self._lock = threading.Lock()
+        for event in events or []:
+            self.add_event(event)
+
+    # --- Test helpers ---
+    def add_event(self, event, calendar_id='primary'):
+        """Seeds an event directly, without counting an API call."""
+        with self._lock:
+            stored = dict(event)
+            stored.setdefault('id', f'evt{next(self._ids)}')
+            stored.setdefault('status', 'confirmed')
+            self._touch(stored)
+            self.calendars.setdefault(calendar_id, {})[stored['id']] = stored
+            return stored
+
+    def all_events(self, calendar_id='primary'):
+        with self._lock:
+            return [_public(e) for e in self.calendars.get(calendar_id, {}).values() if e['status'] != 'cancelled']
+
+    def fail_next(self, method, status, times=1, message='Injected failure'):
+        """Makes the next `times` calls of `method` fail with the given HTTP status (and error message)."""
+        with self._lock:
+            self._failures.setdefault(method, []).extend([(status, message)] * times)
+
+    def expire_sync_tokens(self):
+        """Invalidates every sync token handed out so far (the next delta sync gets a 410)."""
+        with self._lock:
+            self._sync_epoch += 1
+
+    def write_calls(self):
+        return sum(self.calls.get(m, 0) for m in ('insert', 'patch', 'delete'))
+
+    # --- googleapiclient surface ---
+    def events(self):
+        return FakeEventsResource(self)
+
+    def freebusy(self):
+        return FakeFreebusyResource(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatchHttpRequest(self, callback=callback)
+
+    # --- Internals ---
+    def _round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _dispatch(self, request):
+        with self._lock:
+            self.calls[request.method] = self.calls.get(request.method, 0) + 1
+            queued = self._failures.get(request.method)
+            status, message = queued.pop(0) if queued else (None, None)
+            if status is None and self.error_rate and self._rng.random() < self.error_rate:
+                status, message = self.error_status, 'Injected failure'
+        if status is not None:
+            raise make_http_error(status, message)
+        return request._handler()
+
+    def _touch(self, event):
+        self._change_seq += 1
+        event['_seq'] = self._change_seq
+        event['_start'] = _event_edge(event, 'start')
+        event['_end'] = _event_edge(event, 'end')
+
+    def _calendar(self, calendar_id):
+        return self.calendars.setdefault(calendar_id, {})
+
+    def _insert(self, calendar_id, body):
+        with self._lock:
+            event = json.loads(json.dumps(body))
+            # Like the real API, a client-chosen ID that is already taken is refused.
+            if event.get('id') in self._calendar(calendar_id):
+                raise make_http_error(409, 'The requested identifier already exists.')
+            event.setdefault('id', f'evt{next(self._ids)}')
+            event['status'] = 'confirmed'
+            self._touch(event)
+            self._calendar(calendar_id)[event['id']] = event
+            return _public(event)
+
+    def _get(self, calendar_id, event_id):
+        with self._lock:
+            event = self._calendar(calendar_id).get(event_id)
+            if event is None or event['status'] == 'cancelled':
+                raise make_http_error(404, 'Not Found')
+            return _public(event)
+
+    def _patch(self, calendar_id, event_id, body):
+        with self._lock:
+            event = self._calendar(calendar_id).get(event_id)
+            if event is None or event['status'] == 'cancelled':
+                raise make_http_error(404, 'Not Found')
+            event.update(json.loads(json.dumps(body)))
+            self._touch(event)
+            return _public(event)
+
+    def _delete(self, calendar_id, event_id):
+        with self._lock:
+            event = self._calendar(calendar_id).get(event_id)
+            if event is None or event['status'] == 'cancelled':
+                raise make_http_error(410, 'Resource has been deleted')
+            event['status'] = 'cancelled'
+            self._touch(event)
+            return ''
+
+    def _freebusy(self, body):
+        time_min, time_max = _parse(body['timeMin']), _parse(body['timeMax'])
+        calendars = {}
+        for item in body.get('items', []):
+            with self._lock:
+                events = self.calendars.get(item['id'])
+                events = None if events is None else list(events.values())
+            if events is None:
+                calendars[item['id']] = {'busy': [], 'errors': [{'domain': 'global', 'reason': 'notFound'}]}
+                continue
+            intervals = sorted(
+                (max(e['_start'], time_min), min(e['_end'], time_max)) for e in events
+                if e['status'] != 'cancelled' and e.get('transparency') != 'transparent'
+                and e['_end'] > time_min and e['_start'] < time_max
+            )
+            merged = []
+            for start, end in intervals:
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            calendars[item['id']] = {'busy': [
+                {'start': start.isoformat().replace('+00:00', 'Z'), 'end': end.isoformat().replace('+00:00', 'Z')}
+                for start, end in merged
+            ]}
+        return {'kind': 'calendar#freeBusy', 'timeMin': body['timeMin'], 'timeMax': body['timeMax'], 'calendars': calendars}
+
+    def _list(self, calendar_id, timeMin=None, timeMax=None, syncToken=None, pageToken=None,
+              maxResults=250, fields=None, privateExtendedProperty=None, **kwargs):
+        with self._lock:
+            events = list(self._calendar(calendar_id).values())
+            current_token = f'{self._sync_epoch}:{self._change_seq}'
+            if syncToken is not None:
+                epoch, since_seq = (int(part) for part in syncToken.split(':'))
+                if epoch != self._sync_epoch:
+                    raise make_http_error(410, 'Sync token is no longer valid, a full sync is required.')
+
+        if syncToken is not None:
+            # Deltas include cancelled events so the client can drop them.
+            items = [e for e in events if e['_seq'] > since_seq]
+        else:
+            items = [e for e in events if e['status'] != 'cancelled']
+            if timeMin:
+                items = [e for e in items if e['_end'] > _parse(timeMin)]
+            if timeMax:
+                items = [e for e in items if e['_start'] < _parse(timeMax)]
+            if privateExtendedProperty:
+                name, value = privateExtendedProperty.split('=', 1)
+                items = [e for e in items if e.get('extendedProperties', {}).get('private', {}).get(name) == value]
+            items.sort(key=lambda e: e['_start'])
+
+        offset = int(pageToken or 0)
+        keep = _item_fields(fields)
+        page = [_public(e, keep) for e in items[offset:offset + maxResults]]
+        result = {'kind': 'calendar#events', 'items': page}
+        if offset + maxResults < len(items):
+            result['nextPageToken'] = str(offset + maxResults)
+        else:
+            result['nextSyncToken'] = current_token
+        return result
+
+
+def _public(event, keep=None):
+    """What the API would send back: a fresh copy without the fake's bookkeeping keys."""
+    visible = {k: v for k, v in event.items() if not k.startswith('_') and (keep is None or k in keep)}
+    return json.loads(json.dumps(visible))
+
+
+def _item_fields(fields):
+    """The top-level item keys kept by a partial response such as 'nextPageToken,items(id,start)'."""
+    if not fields or 'items(' not in fields:
+        return None
+    inner = fields.split('items(', 1)[1].rsplit(')', 1)[0]
+    return {name.split('(')[0].split('/')[0] for name in inner.split(',')}
+
+
+def _parse(value):
+    """
+    Parses an RFC3339 timestamp or an all-day date into an aware UTC datetime. All-day
+    dates start at midnight in the calendar's zone, as they do on the real calendar.
+    """
+    if 'T' not in value:
+        return CALENDAR_TIMEZONE.localize(dt.datetime.fromisoformat(value)).astimezone(dt.timezone.utc)
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return dt.datetime.fromisoformat(value).astimezone(dt.timezone.utc)
+
+
+def _event_edge(event, edge):
+    return _parse(event[edge].get('dateTime') or event[edge].get('date'))
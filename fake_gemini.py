@@ -0,0 +1,169 @@
+# File: fake_gemini.py
+# An in-process stand-in for google.generativeai.GenerativeModel, so the assistant,
+# the coach and the history summarizer can be exercised offline (tests, benchmarks)
+# without an API key or network.
+#
+# Responses have the shape agentic_ai and chat_history read from the real SDK:
+# response.candidates[0].content.parts (each with .text, .function_call and
+# .function_response), response.usage_metadata.prompt_token_count and response.text.
+# Latency and failures are configurable, per call and per streamed chunk.
+
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+CHARS_PER_TOKEN = 4
+
+class FakeGeminiError(Exception):
+    """Shaped like google.api_core errors: the HTTP status is in .code."""
+
+    def __init__(self, code, message='Injected failure'):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+def make_part(text='', function_call=None, function_response=None):
+    """A content part. function_call is a (name, args) pair, function_response a name."""
+    name, args = function_call or ('', {})
+    return SimpleNamespace(text=text, function_call=SimpleNamespace(name=name, args=dict(args)),
+                           function_response=SimpleNamespace(name=function_response or ''))
+
+def make_content(role, parts):
+    return SimpleNamespace(role=role, parts=list(parts))
+
+class FakeResponse:
+    def __init__(self, parts, prompt_tokens=0):
+        self.candidates = [SimpleNamespace(content=make_content('model', parts))]
+        self.usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens)
+
+    @property
+    def text(self):
+        return ''.join(part.text for part in self.candidates[0].content.parts if part.text)
+
+def _message_content(message):
+    """A send_message / generate_content argument as a user content entry."""
+    if isinstance(message, str):
+        return make_content('user', [make_part(text=message)])
+    parts = []
+    for item in message:
+        if isinstance(item, str):
+            parts.append(make_part(text=item))
+        elif isinstance(item, dict) and 'function_response' in item:
+            parts.append(make_part(function_response=item['function_response']['name']))
+        elif isinstance(item, dict) and 'text' in item:
+            parts.append(make_part(text=item['text']))
+        else:
+            parts.append(make_part(text='<file>'))  # an uploaded file, e.g. audio
+    return make_content('user', parts)
+
+def _history_content(entry):
+    if isinstance(entry, dict):
+        return make_content(entry['role'], [make_part(text=p.get('text', '')) for p in entry['parts']])
+    return entry
+
+def _count_tokens(contents):
+    return sum(len(part.text or '') for content in contents for part in content.parts) // CHARS_PER_TOKEN
+
+def agent_responder(tool_calls=(('list_today_events', {}),), reply_words=40):
+    """
+    Default behaviour: a fresh user prompt is answered with the given function calls
+    (all in one response, as Gemini does for independent calls); once their results
+    come back, with a text reply of reply_words words. Without tools, text right away.
+    """
+    def respond(contents, has_tools):
+        last = contents[-1]
+        answered_tools = any(part.function_response.name for part in last.parts)
+        if has_tools and tool_calls and not answered_tools:
+            return [make_part(function_call=call) for call in tool_calls]
+        words = ' '.join(f"word{i}" for i in range(reply_words))
+        return [make_part(text=f"Here is what I found. {words}")]
+    return respond
+
+class FakeGenerativeModel:
+    """
+    Mimics genai.GenerativeModel. latency is the wait before a response (or its first
+    chunk), chunk_latency the wait between streamed chunks. Failures are injected with
+    fail_next(429, times=2), or at random with error_rate (seeded, so runs repeat).
+    responder(contents, has_tools) returns the parts of the next model turn.
+    """
+
+    def __init__(self, model_name='fake-gemini', tools=None, latency=0.0, chunk_latency=0.0,
+                 stream_chunks=4, error_rate=0.0, error_status=503, seed=0, responder=None):
+        self.model_name = model_name
+        self.tools = tools
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.stream_chunks = stream_chunks
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.responder = responder or agent_responder()
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._failures = []
+        self._lock = threading.Lock()
+
+    def fail_next(self, status, times=1):
+        with self._lock:
+            self._failures.extend([status] * times)
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, [_history_content(entry) for entry in history or []])
+
+    def generate_content(self, contents, stream=False):
+        if isinstance(contents, list) and contents and isinstance(contents[0], dict) and 'role' in contents[0]:
+            request = [_history_content(entry) for entry in contents]  # a full conversation
+        else:
+            request = [_message_content(contents)]  # a prompt, or a prompt plus files
+        return self._respond(request, stream)
+
+    def _respond(self, contents, stream):
+        with self._lock:
+            self.calls += 1
+            status = self._failures.pop(0) if self._failures else None
+            if status is None and self.error_rate and self._rng.random() < self.error_rate:
+                status = self.error_status
+        if self.latency:
+            time.sleep(self.latency)
+        if status is not None:
+            raise FakeGeminiError(status)
+        parts = self.responder(contents, bool(self.tools))
+        prompt_tokens = _count_tokens(contents)
+        if not stream:
+            return FakeResponse(parts, prompt_tokens)
+        return self._stream(parts, prompt_tokens)
+
+    def _stream(self, parts, prompt_tokens):
+        """Text is split over stream_chunks chunks; function calls arrive whole, in the last one."""
+        text = ''.join(part.text for part in parts if part.text)
+        calls = [part for part in parts if part.function_call.name]
+        size = max(1, -(-len(text) // self.stream_chunks))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or ['']
+        for index, piece in enumerate(pieces):
+            if index and self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            chunk_parts = [make_part(text=piece)] if piece else []
+            if index == len(pieces) - 1:
+                chunk_parts += calls
+            yield FakeResponse(chunk_parts, prompt_tokens)
+
+class FakeChatSession:
+    """Mimics genai.ChatSession: send_message appends the exchange to .history."""
+
+    def __init__(self, model, history):
+        self.model = model
+        self.history = history
+
+    def send_message(self, message, stream=False):
+        user = _message_content(message)
+        response = self.model._respond(self.history + [user], stream)
+        if not stream:
+            self.history += [user, response.candidates[0].content]
+            return response
+        return self._record_stream(user, response)
+
+    def _record_stream(self, user, chunks):
+        parts = []
+        for chunk in chunks:
+            parts.extend(chunk.candidates[0].content.parts)
+            yield chunk
+        self.history += [user, make_content('model', parts)]
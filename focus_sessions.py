@@ -0,0 +1,93 @@
+# File: focus_sessions.py
+# Server-side focus sessions.
+#
+# A session is just a row in the 'focus_sessions' table (one per user): when it
+# started, how long it runs, and its state. Nothing waits or sleeps while it runs;
+# a session is completed lazily by whoever looks at it after it is due (the UI
+# polling it, or sweep_due_sessions from a periodic job), so thousands of sessions
+# cost no threads at all. The bonus is credited exactly once: completing claims the
+# row with a compare-and-set, and only the caller that wins the claim awards points.
+
+import argparse
+import time
+import uuid
+
+from database import storage, update_gamification_stats
+
+FOCUS_SESSION_POINTS = 100
+FOCUS_SESSIONS_TABLE = 'focus_sessions'
+
+RUNNING = 'running'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+
+def _with_progress(session, now):
+    ends_at = session['started_at'] + session['duration_seconds']
+    elapsed = min(max(now - session['started_at'], 0), session['duration_seconds'])
+    return {**session, 'ends_at': ends_at,
+            'remaining_seconds': max(ends_at - now, 0) if session['state'] == RUNNING else 0,
+            'progress': elapsed / session['duration_seconds'] if session['state'] != CANCELLED else 0.0}
+
+def start_session(user_id, minutes, now=None):
+    """Starts a focus session, or returns the one already running for this user."""
+    now = time.time() if now is None else now
+    current = get_session(user_id, now)
+    if current and current['state'] == RUNNING:
+        return current
+    session = {'session_id': uuid.uuid4().hex, 'started_at': now, 'duration_seconds': int(minutes * 60),
+               'state': RUNNING, 'level_up_message': None}
+    storage.upsert(FOCUS_SESSIONS_TABLE, user_id, session)
+    print(f"Focus session of {minutes} min started for user {user_id}")
+    return _with_progress({**session, 'user_id': user_id}, now)
+
+def _complete(user_id, session, now):
+    """Marks a due session completed; only the call that claims it credits the points."""
+    claimed = storage.compare_and_set(
+        FOCUS_SESSIONS_TABLE, user_id,
+        expected={'session_id': session['session_id'], 'state': RUNNING},
+        fields={'state': COMPLETED, 'completed_at': now})
+    if not claimed:
+        return storage.get(FOCUS_SESSIONS_TABLE, user_id)
+    level_up_message = update_gamification_stats(user_id, points_to_add=FOCUS_SESSION_POINTS, sessions_to_add=1)
+    storage.update(FOCUS_SESSIONS_TABLE, user_id, {'level_up_message': level_up_message})
+    print(f"Focus session {session['session_id']} completed for user {user_id}")
+    return {**session, 'state': COMPLETED, 'completed_at': now, 'level_up_message': level_up_message}
+
+def get_session(user_id, now=None):
+    """
+    The user's latest session with 'remaining_seconds' and 'progress' (0..1), or None.
+    A running session that is already due is completed (and credited) on the spot.
+    """
+    now = time.time() if now is None else now
+    session = storage.get(FOCUS_SESSIONS_TABLE, user_id)
+    if session is None:
+        return None
+    if session['state'] == RUNNING and now >= session['started_at'] + session['duration_seconds']:
+        session = _complete(user_id, session, now)
+    return _with_progress(session, now)
+
+def cancel_session(user_id):
+    """Stops a running session without points. Returns True if one was running."""
+    session = storage.get(FOCUS_SESSIONS_TABLE, user_id)
+    if session is None or session['state'] != RUNNING:
+        return False
+    return storage.compare_and_set(FOCUS_SESSIONS_TABLE, user_id,
+                                   expected={'session_id': session['session_id'], 'state': RUNNING},
+                                   fields={'state': CANCELLED})
+
+def sweep_due_sessions(now=None):
+    """Completes and credits every session that is due, e.g. for users who closed the tab."""
+    now = time.time() if now is None else now
+    completed = 0
+    for session in storage.all(FOCUS_SESSIONS_TABLE):
+        if session['state'] == RUNNING and now >= session['started_at'] + session['duration_seconds']:
+            if get_session(session['user_id'], now)['state'] == COMPLETED:
+                completed += 1
+    return completed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="FocusFlow focus session tools.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    subcommands.add_parser('sweep', help="Complete and credit every focus session that is due.")
+    args = parser.parse_args()
+    print(f"Completed {sweep_due_sessions()} due focus sessions.")
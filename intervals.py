@@ -0,0 +1,176 @@
+# File: intervals.py
+# Interval algebra for busy/free time. An interval is a (start, end) tuple with
+# start < end; a "set" of intervals is a list of them. Values only need to be
+# comparable (aware datetimes, numbers...), so the same code serves every caller.
+#
+# The batch_free_slots() path computes free time for thousands of calendars in
+# one vectorized NumPy pass; NumPy is only imported when that path is used.
+
+from calendar_time import parse_event_time
+
+def merge_intervals(intervals, presorted=False):
+    """
+    Normalises any collection of intervals: sorted by start, with overlapping,
+    nested and touching intervals merged. With presorted=True the input (which may
+    be a generator) is consumed in order without being collected and sorted first.
+    """
+    ordered = intervals if presorted else sorted(intervals)
+    merged = []
+    for start, end in ordered:
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            # Nested or overlapping: only ever extend the current interval, never shrink it.
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def union(a, b):
+    """Time covered by either set."""
+    return merge_intervals(list(a) + list(b))
+
+def intersection(a, b):
+    """Time covered by both sets."""
+    a, b = merge_intervals(a), merge_intervals(b)
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+def subtract(a, b):
+    """Time covered by set a but not by set b."""
+    a, b = merge_intervals(a), merge_intervals(b)
+    result = []
+    j = 0
+    for start, end in a:
+        current = start
+        while j < len(b) and b[j][1] <= current:
+            j += 1
+        k = j
+        while k < len(b) and b[k][0] < end:
+            if b[k][0] > current:
+                result.append((current, b[k][0]))
+            current = max(current, b[k][1])
+            if current >= end:
+                break
+            k += 1
+        if current < end:
+            result.append((current, end))
+    return result
+
+def free_slots(busy, window_start, window_end, presorted=False):
+    """The gaps left in [window_start, window_end) once the busy intervals are removed."""
+    free = []
+    current = window_start
+    for start, end in merge_intervals(busy, presorted=presorted):
+        if end <= current:
+            continue
+        if start >= window_end:
+            break
+        if start > current:
+            free.append((current, start))
+        current = end
+    if current < window_end:
+        free.append((current, window_end))
+    return free
+
+def _localize(naive, tz):
+    # pytz zones need localize(); zoneinfo/datetime.timezone take tzinfo directly.
+    if hasattr(tz, 'localize'):
+        return tz.localize(naive)
+    return naive.replace(tzinfo=tz)
+
+def event_interval(event, tz):
+    """
+    The busy interval of a Calendar event, or None when the event does not block time:
+    cancelled events, events shown as "free" (transparent) and events without a start.
+    All-day events span local midnight to midnight in tz (their end date is exclusive).
+    """
+    if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+        return None
+    start, end = event.get('start', {}), event.get('end', {})
+    if start.get('dateTime') and end.get('dateTime'):
+        return parse_event_time(start['dateTime']), parse_event_time(end['dateTime'])
+    if start.get('date') and end.get('date'):
+        return parse_event_time(start['date'], tz), parse_event_time(end['date'], tz)
+    return None
+
+def events_to_intervals(events, tz):
+    """Lazily turns Calendar events into busy intervals, parsing every timestamp once."""
+    for event in events:
+        interval = event_interval(event, tz)
+        if interval is not None:
+            yield interval
+
+def batch_free_slots(owners, starts, ends, window_start, window_end, user_count, min_duration=None):
+    """
+    Free slots for many users in one vectorized pass.
+
+    owners is an integer array (0..user_count-1) saying whose calendar each busy
+    interval belongs to; starts and ends are datetime64 arrays. Every user shares
+    the same [window_start, window_end) window (numpy.datetime64 values). Returns
+    (owner, free_start, free_end) arrays, grouped by owner and sorted by start.
+    Users without any busy interval get the whole window.
+    """
+    import numpy as np
+
+    unit = 'us'
+    owners = np.asarray(owners, dtype=np.int64)
+    window_start = np.datetime64(window_start, unit)
+    window_end = np.datetime64(window_end, unit)
+    span = (window_end - window_start).astype(np.int64)
+
+    # Work in integer offsets from the window start, clipped to the window.
+    rel_start = np.clip((np.asarray(starts, dtype=f'datetime64[{unit}]') - window_start).astype(np.int64), 0, span)
+    rel_end = np.clip((np.asarray(ends, dtype=f'datetime64[{unit}]') - window_start).astype(np.int64), 0, span)
+    keep = rel_end > rel_start
+    owners, rel_start, rel_end = owners[keep], rel_start[keep], rel_end[keep]
+
+    order = np.lexsort((rel_start, owners))
+    owners, rel_start, rel_end = owners[order], rel_start[order], rel_end[order]
+
+    # Running maximum of end times within each owner's group. Shifting every group by
+    # owner * (span + 1) keeps groups apart, so one global accumulate never leaks across users.
+    offset = owners * (span + 1)
+    covered_until = np.maximum.accumulate(rel_end + offset) - offset
+
+    group_start = np.ones(len(owners), dtype=bool)
+    group_start[1:] = owners[1:] != owners[:-1]
+    group_end = np.ones(len(owners), dtype=bool)
+    group_end[:-1] = group_start[1:]
+
+    previous_cover = np.empty_like(covered_until)
+    previous_cover[1:] = covered_until[:-1]
+    previous_cover[group_start] = 0
+
+    # A gap opens before an interval that starts after everything before it has ended,
+    # and after the last interval of each owner if that ends before the window does.
+    inner = rel_start > previous_cover
+    tail = group_end & (covered_until < span)
+
+    busy_owners = np.unique(owners)
+    idle_owners = np.setdiff1d(np.arange(user_count), busy_owners)
+
+    free_owner = np.concatenate([owners[inner], owners[tail], idle_owners])
+    free_start = np.concatenate([previous_cover[inner], covered_until[tail], np.zeros(len(idle_owners), dtype=np.int64)])
+    free_end = np.concatenate([rel_start[inner], np.full(tail.sum(), span), np.full(len(idle_owners), span)])
+
+    if min_duration is not None:
+        min_length = np.timedelta64(min_duration, unit).astype(np.int64)
+        long_enough = (free_end - free_start) >= min_length
+        free_owner, free_start, free_end = free_owner[long_enough], free_start[long_enough], free_end[long_enough]
+
+    order = np.lexsort((free_start, free_owner))
+    free_start = window_start + free_start[order].astype(f'timedelta64[{unit}]')
+    free_end = window_start + free_end[order].astype(f'timedelta64[{unit}]')
+    return free_owner[order], free_start, free_end
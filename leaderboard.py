@@ -0,0 +1,151 @@
+# File: leaderboard.py
+# Ranked leaderboard over the gamification table.
+#
+# A sorted index of (-points, user_id) entries is built once per process and then
+# kept current incrementally from update_gamification_stats, so "top K" is a slice
+# and "your rank" is a binary search; no Streamlit rerun scans or sorts every user.
+# Friend groups (the 'friend_group' field of a profile) get their own sorted index.
+
+import bisect
+import threading
+import time
+
+from database import (get_user_profile, level_for_points, on_points_changed,
+                      save_user_profile, storage)
+
+# Other processes (a second Streamlit server, the scheduler runner) update points
+# too; a background thread rebuilds the index from storage this often to pick those
+# changes up, so no request ever waits for a rebuild after the first one.
+LEADERBOARD_REFRESH_SECONDS = 300
+
+class Leaderboard:
+    """Sorted rank index: O(log n) rank lookups, O(K) top-K reads, O(log n + shift) updates."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._ranking = []   # sorted (-points, user_id)
+        self._points = {}    # user_id -> points
+        self._groups = {}    # friend group -> sorted (-points, user_id)
+        self._group_of = {}  # user_id -> friend group
+        self.built_at = 0.0
+
+    def __len__(self):
+        return len(self._ranking)
+
+    def rebuild(self, stats_documents, profiles):
+        """Rebuilds the whole index from gamification documents and user profiles."""
+        with self._lock:
+            self._clear()
+            self._group_of = {p['user_id']: p['friend_group'] for p in profiles if p.get('friend_group')}
+            self._points = {doc['user_id']: doc.get('points', 0) for doc in stats_documents}
+            self._ranking = sorted((-points, user_id) for user_id, points in self._points.items())
+            for points_key, user_id in self._ranking:
+                group = self._group_of.get(user_id)
+                if group:
+                    self._groups.setdefault(group, []).append((points_key, user_id))
+            self.built_at = time.monotonic()
+
+    def _move(self, ranking, old_entry, new_entry):
+        if old_entry is not None:
+            index = bisect.bisect_left(ranking, old_entry)
+            if index < len(ranking) and ranking[index] == old_entry:
+                del ranking[index]
+        if new_entry is not None:
+            bisect.insort(ranking, new_entry)
+
+    def update(self, user_id, points):
+        """Moves a user to their new position after a points change."""
+        with self._lock:
+            old_points = self._points.get(user_id)
+            old_entry = None if old_points is None else (-old_points, user_id)
+            new_entry = (-points, user_id)
+            self._points[user_id] = points
+            self._move(self._ranking, old_entry, new_entry)
+            group = self._group_of.get(user_id)
+            if group:
+                self._move(self._groups.setdefault(group, []), old_entry, new_entry)
+
+    def set_group(self, user_id, group):
+        with self._lock:
+            entry = (-self._points[user_id], user_id) if user_id in self._points else None
+            old_group = self._group_of.pop(user_id, None)
+            if old_group and entry:
+                self._move(self._groups.get(old_group, []), entry, None)
+            if group:
+                self._group_of[user_id] = group
+                if entry:
+                    self._move(self._groups.setdefault(group, []), None, entry)
+
+    def _ranking_for(self, group):
+        return self._ranking if group is None else self._groups.get(group, [])
+
+    def top(self, k=10, group=None):
+        """The k best users, globally or within a friend group, as {'rank', 'user_id', 'points', 'level'}."""
+        with self._lock:
+            entries = self._ranking_for(group)[:k]
+        top = []
+        for index, (points_key, user_id) in enumerate(entries):
+            # Ties share the better rank, as in rank(): 1, 2, 2, 4...
+            rank = top[-1]['rank'] if top and top[-1]['points'] == -points_key else index + 1
+            top.append({'rank': rank, 'user_id': user_id, 'points': -points_key, 'level': level_for_points(-points_key)})
+        return top
+
+    def rank(self, user_id, group=None):
+        """1-based rank of a user (ties share the better rank), or None if unranked."""
+        with self._lock:
+            points = self._points.get(user_id)
+            if points is None or (group is not None and self._group_of.get(user_id) != group):
+                return None
+            ranking = self._ranking_for(group)
+            return bisect.bisect_left(ranking, (-points, '')) + 1
+
+    def size(self, group=None):
+        with self._lock:
+            return len(self._ranking_for(group))
+
+_leaderboard = Leaderboard()
+_leaderboard_lock = threading.Lock()
+
+def _rebuild_from_storage():
+    _leaderboard.rebuild(storage.all('gamification'), storage.all('users'))
+
+def _refresh_periodically():
+    while True:
+        time.sleep(LEADERBOARD_REFRESH_SECONDS)
+        try:
+            _rebuild_from_storage()
+        except Exception as e:
+            print(f"Leaderboard refresh failed: {e}")
+
+def get_leaderboard():
+    """
+    The process-wide leaderboard. It is built from storage on first use, which also
+    starts the background refresh; points changes in this process keep it current.
+    """
+    with _leaderboard_lock:
+        if not _leaderboard.built_at:
+            _rebuild_from_storage()
+            threading.Thread(target=_refresh_periodically, name='leaderboard-refresh', daemon=True).start()
+    return _leaderboard
+
+def set_friend_group(user_id, group):
+    """Puts a user in a friend group (or removes them with group=None) and updates the index."""
+    save_user_profile(user_id, {'friend_group': group})
+    _leaderboard.set_group(user_id, group)
+
+def display_names(entries):
+    """Adds each entry's profile name; only the K displayed users are looked up."""
+    for entry in entries:
+        profile = get_user_profile(entry['user_id']) or {}
+        entry['name'] = profile.get('name', entry['user_id'])
+    return entries
+
+def _on_points_changed(user_id, points):
+    # Before the first build there is nothing to keep current; the build reads storage.
+    if _leaderboard.built_at:
+        _leaderboard.update(user_id, points)
+
+on_points_changed(_on_points_changed)
@@ -0,0 +1,87 @@
+# File: plan_diff.py
+# Diffs a freshly computed focus plan against the blocks earlier scheduler runs
+# already placed, so a re-run only writes what actually changed.
+
+from google_calendar_agent import get_plan_key, parse_event_time
+
+def _slot_of(event):
+    """(start, end, summary) of an existing block, or None when it has no timed start/end."""
+    try:
+        return (parse_event_time(event['start']['dateTime']), parse_event_time(event['end']['dateTime']),
+                event.get('summary'))
+    except (KeyError, ValueError):
+        return None
+
+def _matches(event, planned):
+    """True when an existing block already looks exactly like the planned one."""
+    return (_slot_of(event) == (planned['start'], planned['end'], planned['summary'])
+            and event.get('colorId') == planned['color_id']
+            and event.get('transparency', 'opaque') == 'opaque')
+
+def _has_started(event, now):
+    try:
+        return parse_event_time(event['start']['dateTime']) < now
+    except (KeyError, ValueError):
+        return False
+
+def diff_plan(planned_blocks, existing_blocks, now):
+    """
+    Computes the minimal set of writes that turns existing_blocks (events carrying a
+    plan key) into planned_blocks (dicts with a 'key'). Blocks that have already
+    started, on either side, are left alone.
+
+    Existing blocks are matched to planned ones by (start, end, summary) first, since
+    keys are positional and shift when a block appears or disappears earlier in the
+    day. Only the blocks left over are paired by key, then in order, and patched.
+
+    Returns {'insert': [planned], 'patch': [(event_id, planned)], 'delete': [event_id],
+    'unchanged': count}.
+    """
+    remaining = [event for event in existing_blocks
+                 if get_plan_key(event) is not None and not _has_started(event, now)]
+    upcoming = []
+    for planned in planned_blocks:
+        if planned['start'] >= now:
+            upcoming.append(planned)
+            continue
+        # The block is under way: keep the event its key points to.
+        remaining = [event for event in remaining if get_plan_key(event) != planned['key']]
+
+    diff = {'insert': [], 'patch': [], 'delete': [], 'unchanged': 0}
+    by_slot = {}
+    for event in remaining:
+        by_slot.setdefault(_slot_of(event), []).append(event)
+    moved = []
+    for planned in upcoming:
+        candidates = by_slot.get((planned['start'], planned['end'], planned['summary']))
+        if not candidates:
+            moved.append(planned)
+            continue
+        event = candidates.pop(0)
+        remaining.remove(event)
+        if _matches(event, planned):
+            diff['unchanged'] += 1
+        else:
+            diff['patch'].append((event['id'], planned))
+
+    # Moved blocks reuse an event with the same key, else any spare event, else are inserted.
+    by_key = {}
+    for event in remaining:
+        by_key.setdefault(get_plan_key(event), event)
+    unpaired = []
+    for planned in moved:
+        event = by_key.pop(planned['key'], None)
+        if event is None:
+            unpaired.append(planned)
+        else:
+            remaining.remove(event)
+            diff['patch'].append((event['id'], planned))
+    for planned in unpaired:
+        if remaining:
+            diff['patch'].append((remaining.pop(0)['id'], planned))
+        else:
+            diff['insert'].append(planned)
+
+    # Whatever is left, duplicates from an interrupted run included, is no longer part of the plan.
+    diff['delete'].extend(event['id'] for event in remaining)
+    return diff
@@ -0,0 +1,160 @@
+# File: planner.py
+# Pure focus-block planning: busy intervals + profile constraints in, plan out.
+#
+# Nothing here talks to Google Calendar or the database, so a plan can be built,
+# printed (autonomous_scheduler.py --dry-run), tested or benchmarked on its own and
+# committed as a separate step. Time a student cannot study is removed up front:
+#   - institution hours: the profile's in_time..out_time, on INSTITUTION_WEEKDAYS
+#   - sleep: sleep_time..wake_time (may cross midnight)
+#   - a cap on focus minutes per day
+# What is left is filled with Focus blocks and Mindful Breaks.
+
+import datetime as dt
+from functools import lru_cache
+
+import intervals
+
+FOCUS_BLOCK_MINUTES = 50
+BREAK_BLOCK_MINUTES = 10
+BLOCKS_BEFORE_BREAK = 2
+MIN_FREE_SLOT_MINUTES = 60
+
+INSTITUTION_WEEKDAYS = (0, 1, 2, 3, 4)  # Monday to Friday
+DEFAULT_SLEEP_TIME = '23:00'
+DEFAULT_WAKE_TIME = '07:00'
+DEFAULT_DAILY_FOCUS_MINUTES = 300
+
+FOCUS_SUMMARY = "🚀 Focus Block"
+BREAK_SUMMARY = "🧠 Mindful Break"
+
+def parse_clock(value):
+    """'HH:MM' as a datetime.time."""
+    hours, minutes = value.split(':')[:2]
+    return dt.time(int(hours), int(minutes))
+
+def _clock_range(start, end):
+    """(start, end) as times, or None when they are equal: that is no window, not a whole day."""
+    start, end = parse_clock(start), parse_clock(end)
+    return None if start == end else (start, end)
+
+def constraints_from_profile(profile):
+    """
+    Planning constraints from a user profile (database.py). Missing fields fall back
+    to the defaults; a profile without in_time/out_time, or with both at the same
+    time (the form's untouched defaults), has no institution hours. The same goes
+    for sleep.
+    """
+    profile = profile or {}
+    institution = None
+    if profile.get('in_time') and profile.get('out_time'):
+        institution = _clock_range(profile['in_time'], profile['out_time'])
+    return {
+        'institution_hours': institution,
+        'institution_weekdays': tuple(profile.get('institution_weekdays', INSTITUTION_WEEKDAYS)),
+        'sleep': _clock_range(profile.get('sleep_time', DEFAULT_SLEEP_TIME),
+                              profile.get('wake_time', DEFAULT_WAKE_TIME)),
+        'daily_focus_minutes': profile.get('daily_focus_minutes', DEFAULT_DAILY_FOCUS_MINUTES),
+    }
+
+@lru_cache(maxsize=1024)
+def daily_windows(start_time, end_time, window_start, window_end, tz, weekdays=None):
+    """
+    The interval start_time..end_time on every day touching the window (only on
+    the given weekdays, if any). A range that ends at or before it starts, such
+    as a night, runs into the next day. Cached: in a multi-user run most users
+    share a window and a few common timetables, and localizing is the slow part.
+    """
+    result = []
+    day = window_start.astimezone(tz).date() - dt.timedelta(days=1)
+    last_day = window_end.astimezone(tz).date()
+    while day <= last_day:
+        if weekdays is None or day.weekday() in weekdays:
+            start = intervals._localize(dt.datetime.combine(day, start_time), tz)
+            end_day = day if end_time > start_time else day + dt.timedelta(days=1)
+            end = intervals._localize(dt.datetime.combine(end_day, end_time), tz)
+            if end > window_start and start < window_end:
+                result.append((start, end))
+        day += dt.timedelta(days=1)
+    return tuple(result)
+
+def unavailable_intervals(constraints, window_start, window_end, tz):
+    """Institution hours and sleep inside the window, as busy intervals."""
+    blocked = []
+    if constraints['sleep']:
+        blocked += daily_windows(*constraints['sleep'], window_start, window_end, tz)
+    if constraints['institution_hours']:
+        blocked += daily_windows(*constraints['institution_hours'], window_start, window_end, tz,
+                                 weekdays=constraints['institution_weekdays'])
+    return blocked
+
+def fill_free_slots(free_slots, daily_focus_minutes=None):
+    """
+    Fills (start, end) free slots with Focus and Break blocks; days (for the daily
+    cap and the keys) are the dates of the slots' own time zone. Returns a list of
+    {'summary', 'start', 'end', 'color_id', 'key'} dicts. The key ("<date>#<n>", the
+    n-th block of that day) stays the same across runs as long as the day's plan
+    does, which is what lets a re-run patch blocks instead of duplicating them.
+    """
+    focus = dt.timedelta(minutes=FOCUS_BLOCK_MINUTES)
+    rest = dt.timedelta(minutes=BREAK_BLOCK_MINUTES)
+    min_slot = dt.timedelta(minutes=MIN_FREE_SLOT_MINUTES)
+    focus_minutes = {}
+    blocks = []
+    for slot_start, slot_end in free_slots:
+        if slot_end - slot_start < min_slot:
+            continue
+        current = slot_start
+        work_blocks_done = 0
+        while current + focus <= slot_end:
+            day = current.date()
+            if daily_focus_minutes is not None and focus_minutes.get(day, 0) + FOCUS_BLOCK_MINUTES > daily_focus_minutes:
+                break
+            if work_blocks_done >= BLOCKS_BEFORE_BREAK:
+                if current + rest + focus > slot_end:
+                    break
+                blocks.append({'summary': BREAK_SUMMARY, 'start': current, 'end': current + rest, 'color_id': '2'})
+                current += rest
+                work_blocks_done = 0
+            blocks.append({'summary': FOCUS_SUMMARY, 'start': current, 'end': current + focus, 'color_id': '9'})
+            focus_minutes[day] = focus_minutes.get(day, 0) + FOCUS_BLOCK_MINUTES
+            current += focus
+            work_blocks_done += 1
+
+    blocks_per_day = {}
+    for block in blocks:
+        day = block['start'].date().isoformat()
+        block['key'] = f"{day}#{blocks_per_day.get(day, 0)}"
+        blocks_per_day[day] = blocks_per_day.get(day, 0) + 1
+    return blocks
+
+def build_plan(busy_intervals, window_start, window_end, constraints, tz):
+    """
+    The complete plan for one user, without side effects: the free slots left once
+    busy time, institution hours and sleep are removed, the blocks placed in them,
+    and the focus minutes per day.
+    """
+    blocked = list(busy_intervals) + unavailable_intervals(constraints, window_start, window_end, tz)
+    free = [(start.astimezone(tz), end.astimezone(tz))
+            for start, end in intervals.free_slots(blocked, window_start, window_end)]
+    blocks = fill_free_slots(free, constraints['daily_focus_minutes'])
+    focus_minutes_by_day = {}
+    for block in blocks:
+        if block['summary'] == FOCUS_SUMMARY:
+            day = block['key'].split('#')[0]
+            focus_minutes_by_day[day] = focus_minutes_by_day.get(day, 0) + FOCUS_BLOCK_MINUTES
+    return {'window_start': window_start, 'window_end': window_end, 'constraints': constraints,
+            'free_slots': free, 'blocks': blocks, 'focus_minutes_by_day': focus_minutes_by_day}
+
+def format_plan(plan):
+    """A human-readable rendering of a plan, one line per block, grouped by day."""
+    lines = []
+    current_day = None
+    for block in plan['blocks']:
+        day = block['key'].split('#')[0]
+        if day != current_day:
+            current_day = day
+            lines.append(f"\n📅 {day} ({plan['focus_minutes_by_day'].get(day, 0)} focus minutes)")
+        lines.append(f"  {block['start'].strftime('%H:%M')}-{block['end'].strftime('%H:%M')}  {block['summary']}")
+    if not lines:
+        lines.append("No blocks planned: no free time left after classes, sleep and existing events.")
+    return '\n'.join(lines)
@@ -0,0 +1,34 @@
+# File: rate_limiter.py
+# A cap on calls per second, shared by every thread that takes from the same bucket.
+# resilient_client.py keeps one per upstream API.
+
+import threading
+import time
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average, with bursts of up to `capacity`.
+
+    acquire() reserves its tokens immediately and then sleeps off any debt outside
+    the lock, so waiting callers are served in arrival order without holding up
+    each other's bookkeeping.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.acquired = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= tokens
+            self.acquired += tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
@@ -0,0 +1,249 @@
+# File: resilient_client.py
+# Retries, rate limiting and adaptive concurrency for calls to Google APIs.
+#
+# Every Calendar request and every Gemini call goes through a per-API
+# ResilientClient:
+#   - a token bucket (rate_limiter.TokenBucket) caps calls per second;
+#   - an AIMD concurrency limit caps calls in flight: +1 slot per window of
+#     successes, halved whenever the upstream throttles (429 / 503 / rate-limit 403);
+#   - retryable failures are retried with exponential backoff and full jitter,
+#     waiting at least as long as the server's Retry-After header asks.
+# Errors that are not worth retrying (400, 404, auth...) are raised immediately.
+
+import email.utils
+import random
+import threading
+import time
+
+import tracing
+from rate_limiter import TokenBucket
+
+MAX_ATTEMPTS = 5
+BASE_DELAY_SECONDS = 0.5
+MAX_DELAY_SECONDS = 30.0
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+
+CLIENT_SETTINGS = {
+    # Calendar allows far more than a single user needs; this mostly guards the
+    # multi-user runner (scheduler_runner.py), which sets its own rate per run.
+    'calendar': {'rate': 50, 'burst': 50, 'initial_concurrency': 16, 'max_concurrency': 64},
+    'gemini': {'rate': 10, 'burst': 30, 'initial_concurrency': 8, 'max_concurrency': 32},
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def error_status(error):
+    """The HTTP status of an exception from googleapiclient, google.api_core or urllib, or None."""
+    response = getattr(error, 'resp', None)  # googleapiclient HttpError
+    if response is not None and getattr(response, 'status', None) is not None:
+        return int(response.status)
+    for attribute in ('code', 'status_code', 'status'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+def _is_rate_limit_403(error):
+    content = getattr(error, 'content', b'') or b''
+    return b'ateLimitExceeded' in content if isinstance(content, bytes) else 'ateLimitExceeded' in str(content)
+
+def is_retryable(error):
+    """Throttling and transient server errors; Calendar also reports rate limits as 403."""
+    status = error_status(error)
+    return status in RETRYABLE_STATUSES or (status == 403 and _is_rate_limit_403(error))
+
+def is_throttle(error):
+    status = error_status(error)
+    return status in THROTTLE_STATUSES or (status == 403 and _is_rate_limit_403(error))
+
+def retry_after_seconds(error):
+    """The server's Retry-After (seconds or HTTP date) as seconds, or None."""
+    headers = getattr(error, 'resp', None) or getattr(error, 'headers', None)
+    if headers is None and getattr(error, 'response', None) is not None:
+        headers = getattr(error.response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after') or headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+def backoff_delay(attempt, base=BASE_DELAY_SECONDS, cap=MAX_DELAY_SECONDS, rng=random):
+    """Full-jitter exponential backoff for the given retry (1 = first retry)."""
+    return rng.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+def _operation_name(function):
+    """'calendar.events.list' for a googleapiclient request's execute, else the function's name."""
+    request = getattr(function, '__self__', None)
+    return getattr(request, 'methodId', None) or getattr(function, '__qualname__', repr(function))
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD limit on calls in flight: each success adds 1/limit (about +1 per full
+    window), each throttle halves the limit. acquire() blocks while the limit is used up.
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+class ResilientClient:
+    """Runs calls to one upstream API with rate limiting, adaptive concurrency and retries."""
+
+    def __init__(self, name, rate, burst=None, initial_concurrency=8, max_concurrency=64,
+                 max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY_SECONDS, max_delay=MAX_DELAY_SECONDS,
+                 sleep=time.sleep):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrencyLimit(initial_concurrency, maximum=max_concurrency)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.stats = {'calls': 0, 'retries': 0, 'throttled': 0, 'failures': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def call(self, function, *args, tokens=1, retry=True, **kwargs):
+        """
+        Calls function(*args, **kwargs), retrying retryable errors up to max_attempts
+        times. With retry=False it is sent once, for callers that retry on their own.
+        """
+        # One span per call, retries and waits for the bucket or a concurrency slot included.
+        with tracing.span(f"{self.name}.api", call=_operation_name(function)):
+            return self._call(function, args, kwargs, tokens, self.max_attempts if retry else 1)
+
+    def _call(self, function, args, kwargs, tokens, max_attempts):
+        attempt = 0
+        while True:
+            attempt += 1
+            self._count('calls')
+            self.bucket.acquire(tokens)
+            self.concurrency.acquire()
+            throttled = False
+            try:
+                return function(*args, **kwargs)
+            except Exception as error:
+                throttled = is_throttle(error)
+                if throttled:
+                    self._count('throttled')
+                if not is_retryable(error) or attempt >= max_attempts:
+                    self._count('failures')
+                    raise
+                delay = max(retry_after_seconds(error) or 0.0,
+                            backoff_delay(attempt, self.base_delay, self.max_delay))
+                print(f"{self.name}: {type(error).__name__} (status {error_status(error)}), "
+                      f"retry {attempt}/{max_attempts - 1} in {delay:.1f}s")
+            finally:
+                self.concurrency.release(throttled)
+            self._count('retries')
+            self.sleep(delay)
+
+def get_client(name):
+    """The process-wide client for an API listed in CLIENT_SETTINGS ('calendar', 'gemini')."""
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = ResilientClient(name, **CLIENT_SETTINGS[name])
+        return _clients[name]
+
+def configure_client(name, **settings):
+    """
+    Replaces the process-wide client for an API with one built from settings (see
+    ResilientClient), e.g. a much higher rate against an in-process fake. Returns the
+    client it replaced, or None, so a caller can put it back.
+    """
+    with _clients_lock:
+        previous = _clients.get(name)
+        _clients[name] = ResilientClient(name, **settings)
+        return previous
+
+def restore_client(name, previous):
+    with _clients_lock:
+        if previous is None:
+            _clients.pop(name, None)
+        else:
+            _clients[name] = previous
+
+class _ResilientRequest:
+    def __init__(self, request, client):
+        self.request = request
+        self._client = client
+
+    def execute(self, *args, **kwargs):
+        return self._client.call(self.request.execute, *args, **kwargs)
+
+class _ResilientBatch:
+    def __init__(self, batch, client):
+        self._batch = batch
+        self._client = client
+        self._size = 0
+
+    def add(self, request, *args, **kwargs):
+        if isinstance(request, _ResilientRequest):
+            request = request.request
+        self._size += 1
+        return self._batch.add(request, *args, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        # Every item counts against the quota. Sent once: google_calendar_agent.execute_batch
+        # retries both a failed batch call and its failed items.
+        return self._client.call(self._batch.execute, *args, tokens=max(self._size, 1), retry=False, **kwargs)
+
+class _ResilientResource:
+    def __init__(self, resource, client):
+        self._resource = resource
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._resource, name)
+
+        def build_request(*args, **kwargs):
+            return _ResilientRequest(method(*args, **kwargs), self._client)
+        return build_request
+
+class ResilientService:
+    """
+    Wraps a Calendar service (real or fake) so every request it executes goes through
+    a ResilientClient. Resources such as events() and freebusy() are wrapped transparently.
+    """
+
+    def __init__(self, service, client):
+        self._service = service
+        self._client = client
+
+    def new_batch_http_request(self, *args, **kwargs):
+        return _ResilientBatch(self._service.new_batch_http_request(*args, **kwargs), self._client)
+
+    def __getattr__(self, name):
+        resource_factory = getattr(self._service, name)
+
+        def build_resource(*args, **kwargs):
+            return _ResilientResource(resource_factory(*args, **kwargs), self._client)
+        return build_resource
@@ -0,0 +1,112 @@
+# File: response_cache.py
+# Small LRU cache for expensive model responses, keyed by a content hash.
+#
+# Streamlit reruns the whole script on every widget interaction, so anything that
+# calls Gemini from the top level of app.py must be cached or it is paid for again
+# on each rerun. Entries live in memory (least recently used evicted first) and,
+# optionally, as one JSON file per key on disk so they survive a server restart.
+# With a TTL, entries older than ttl_seconds count as misses and are dropped.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def content_hash(*parts):
+    """SHA-256 hex digest of the given bytes/str parts (str parts are UTF-8 encoded)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(part)
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+class ResponseCache:
+    """Thread-safe LRU of JSON-serializable values, with an optional TTL and on-disk copy."""
+
+    def __init__(self, max_entries=128, disk_dir=None, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _expired(self, stored_at):
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def _read_disk(self, key):
+        """(value, stored_at) from disk, or None if missing, unreadable or expired."""
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(record, dict) or 'value' not in record or self._expired(record.get('stored_at', 0)):
+            return None
+        return record['value'], record['stored_at']
+
+    def _write_disk(self, key, value, stored_at):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            temp_path = self._disk_path(key) + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump({'value': value, 'stored_at': stored_at}, f)
+            os.replace(temp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"Could not write cache entry {key}: {e}")
+
+    def _remember(self, key, value, stored_at):
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """The cached value for key, or None. Disk hits are promoted into memory."""
+        with self._lock:
+            if key in self._entries:
+                value, stored_at = self._entries[key]
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        record = self._read_disk(key)
+        with self._lock:
+            if record is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, *record)
+        return record[0]
+
+    def put(self, key, value):
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, value, stored_at)
+        self._write_disk(key, value, stored_at)
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value, or calls compute() and caches its result unless it is None."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
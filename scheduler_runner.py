@@ -0,0 +1,116 @@
+# File: scheduler_runner.py
+# Runs the autonomous scheduler for many users at once, e.g. as a nightly job.
+# Each user's fetch -> plan -> commit pipeline runs on a bounded worker pool with
+# its own Calendar service and event store. Every service goes through the one
+# process-wide Calendar client (resilient_client.py), whose token bucket caps the
+# total number of Calendar API calls per second across all workers.
+
+import argparse
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from autonomous_scheduler import run_autonomous_scheduler, USE_FREEBUSY
+from database import get_all_user_ids, get_user_credentials, save_user_credentials
+from google_calendar_agent import get_calendar_service
+from resilient_client import CLIENT_SETTINGS, ResilientService, configure_client, get_client, restore_client
+
+DEFAULT_WORKERS = 16
+DEFAULT_API_CALLS_PER_SECOND = 50
+
+def service_from_database(user_id):
+    """Builds a user's Calendar service from the OAuth token stored in database.py."""
+    token_info = get_user_credentials(user_id)
+    if token_info is None:
+        raise LookupError(f"No Google credentials stored for user {user_id}")
+    service = get_calendar_service(
+        user_id, token_info=token_info,
+        save_token=lambda token_json: save_user_credentials(user_id, token_json))
+    if service is None:
+        raise ConnectionError(f"Could not connect to Google Calendar for user {user_id}")
+    return service
+
+def _percentile(values, percentile):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percentile / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize_run(results, wall_seconds, api_calls):
+    latencies = [r['seconds'] for r in results]
+    failures = [r for r in results if not r['ok']]
+    return {
+        'users': len(results),
+        'succeeded': len(results) - len(failures),
+        'failed': len(failures),
+        'failures': [{'user_id': r['user_id'], 'error': r['error']} for r in failures],
+        'wall_seconds': wall_seconds,
+        'users_per_second': len(results) / wall_seconds if wall_seconds else 0.0,
+        'p50_seconds': _percentile(latencies, 50),
+        'p95_seconds': _percentile(latencies, 95),
+        'api_calls': api_calls,
+    }
+
+def print_summary(summary):
+    print("\n📊 Scheduler run summary")
+    print(f"Users: {summary['users']} ({summary['succeeded']} succeeded, {summary['failed']} failed)")
+    print(f"Wall time: {summary['wall_seconds']:.2f} s, throughput {summary['users_per_second']:.2f} users/s")
+    print(f"Per-user latency: p50 {summary['p50_seconds']:.2f} s, p95 {summary['p95_seconds']:.2f} s")
+    print(f"Calendar API calls: {summary['api_calls']}")
+    for failure in summary['failures']:
+        print(f"  ❌ {failure['user_id']}: {failure['error']}")
+
+def run_for_users(user_ids=None, workers=DEFAULT_WORKERS, api_calls_per_second=DEFAULT_API_CALLS_PER_SECOND,
+                  service_factory=service_from_database, use_freebusy=USE_FREEBUSY):
+    """
+    Schedules every user in user_ids (default: every user in the database) and
+    returns a summary with throughput, p50/p95 per-user latency and failures.
+    A failure for one user is recorded and never stops the others. Stored tokens
+    cannot go through consent unattended, so use_freebusy (USE_FREEBUSY, not a flag
+    here) only helps users whose token was granted the free/busy scope.
+    """
+    if user_ids is None:
+        user_ids = get_all_user_ids()
+
+    def schedule_user(user_id):
+        started = time.perf_counter()
+        try:
+            service = service_factory(user_id)
+            if not isinstance(service, ResilientService):
+                service = ResilientService(service, client)
+            changes = run_autonomous_scheduler(use_freebusy=use_freebusy, service=service, user_id=user_id)
+            if changes is None:
+                error = "Could not connect to Google Calendar"
+            elif changes['failed']:
+                error = f"{len(changes['failed'])} calendar writes failed"
+            else:
+                error = None
+        except Exception as e:
+            changes, error = None, f"{type(e).__name__}: {e}"
+        ok = error is None
+        return {'user_id': user_id, 'ok': ok, 'error': error, 'changes': changes,
+                'seconds': time.perf_counter() - started}
+
+    # The run's rate replaces the calendar client's for its duration; services built
+    # by get_calendar_service meanwhile pick up this client.
+    previous_client = configure_client('calendar', **{**CLIENT_SETTINGS['calendar'], 'rate': api_calls_per_second,
+                                                      'burst': api_calls_per_second})
+    client = get_client('calendar')
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(schedule_user, user_ids))
+    finally:
+        restore_client('calendar', previous_client)
+    summary = summarize_run(results, time.perf_counter() - started, client.bucket.acquired)
+    print_summary(summary)
+    return summary
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the FocusFlow scheduler for every user in the database.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--api-calls-per-second', type=float, default=DEFAULT_API_CALLS_PER_SECOND)
+    args = parser.parse_args()
+    run_for_users(workers=args.workers, api_calls_per_second=args.api_calls_per_second)
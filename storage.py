@@ -0,0 +1,346 @@
+# File: storage.py
+# Pluggable document storage behind database.py.
+#
+# Every table holds one JSON document per user_id. Two backends implement the same
+# small interface (get / upsert / insert_if_absent / update / compare_and_set /
+# increment / all), plus append-only segment tables, where each user has a numbered
+# sequence of opaque strings that are only ever added (append_segment / get_segments /
+# segment_count), e.g. a long conversation written a piece at a time:
+#   - SQLiteStorage: the default. WAL mode, user_id as PRIMARY KEY (an index), so a
+#     lookup or write touches one row instead of scanning or rewriting the whole file,
+#     and several Streamlit sessions or worker threads can write safely at once.
+#   - TinyDBStorage: the original focusflow_db.json file, kept for compatibility.
+#
+# Migrate an existing TinyDB file with:  python storage.py migrate focusflow_db.json focusflow.db
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+
+DB_BACKEND = os.environ.get('FOCUSFLOW_DB_BACKEND', 'sqlite')
+SQLITE_PATH = os.environ.get('FOCUSFLOW_SQLITE_PATH', 'focusflow.db')
+TINYDB_PATH = 'focusflow_db.json'
+# Every table written with append_segment (conversation_store.SEGMENTS_TABLE...). The
+# migration copies these as segments and every other table as documents.
+SEGMENT_TABLES = frozenset({'conversation_segments'})
+
+_TABLE_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+class TinyDBStorage:
+    """The original JSON-file backend. Every write rewrites the file; lookups scan the table."""
+
+    def __init__(self, path=TINYDB_PATH):
+        from tinydb import TinyDB, Query
+        self._query = Query()
+        self.db = TinyDB(path)
+        # TinyDB itself is not thread-safe.
+        self._lock = threading.RLock()
+
+    def get(self, table, user_id):
+        with self._lock:
+            return self.db.table(table).get(self._query.user_id == user_id)
+
+    def upsert(self, table, user_id, doc):
+        with self._lock:
+            self.db.table(table).upsert({**doc, 'user_id': user_id}, self._query.user_id == user_id)
+
+    def insert_if_absent(self, table, user_id, doc):
+        with self._lock:
+            documents = self.db.table(table)
+            if documents.contains(self._query.user_id == user_id):
+                return False
+            documents.insert({**doc, 'user_id': user_id})
+            return True
+
+    def update(self, table, user_id, fields):
+        with self._lock:
+            return bool(self.db.table(table).update(fields, self._query.user_id == user_id))
+
+    def compare_and_set(self, table, user_id, expected, fields):
+        with self._lock:
+            documents = self.db.table(table)
+            doc = documents.get(self._query.user_id == user_id)
+            if doc is None or not _matches(doc, expected):
+                return False
+            documents.update(fields, self._query.user_id == user_id)
+            return True
+
+    def increment(self, table, user_id, deltas, derive=None):
+        with self._lock:
+            documents = self.db.table(table)
+            doc = documents.get(self._query.user_id == user_id)
+            if doc is None:
+                return None
+            doc = _apply_increment(dict(doc), deltas, derive)
+            documents.update(doc, self._query.user_id == user_id)
+            return doc
+
+    def all(self, table):
+        with self._lock:
+            return [dict(doc) for doc in self.db.table(table).all()]
+
+    def append_segment(self, table, user_id, data):
+        with self._lock:
+            segments = self.db.table(table)
+            seq = segments.count(self._query.user_id == user_id)
+            segments.insert({'user_id': user_id, 'seq': seq, 'data': data})
+            return seq
+
+    def get_segments(self, table, user_id, start=0, end=None):
+        with self._lock:
+            docs = self.db.table(table).search(
+                (self._query.user_id == user_id) & (self._query.seq >= start)
+                & (self._query.seq < (end if end is not None else float('inf'))))
+        return [(doc['seq'], doc['data']) for doc in sorted(docs, key=lambda doc: doc['seq'])]
+
+    def segment_count(self, table, user_id):
+        with self._lock:
+            return self.db.table(table).count(self._query.user_id == user_id)
+
+    def close(self):
+        self.db.close()
+
+class SQLiteStorage:
+    """
+    SQLite in WAL mode: readers never block the writer and vice versa. Each thread
+    gets its own connection; writes that read first run inside BEGIN IMMEDIATE so
+    concurrent read-modify-write cycles cannot interleave.
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._tables = set()
+        self._segment_tables = set()
+        self._tables_lock = threading.Lock()
+        self._connections = []
+        self._connect()
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            with self._tables_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _table(self, table):
+        """Validates the table name and creates the table on first use."""
+        if table not in self._tables:
+            if not _TABLE_NAME.match(table):
+                raise ValueError(f"Invalid table name: {table!r}")
+            self._connect().execute(
+                f'CREATE TABLE IF NOT EXISTS "{table}" (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            with self._tables_lock:
+                self._tables.add(table)
+        return f'"{table}"'
+
+    def _segment_table(self, table):
+        """Like _table, for append-only segments: (user_id, seq) is the primary key."""
+        if table not in self._segment_tables:
+            if not _TABLE_NAME.match(table):
+                raise ValueError(f"Invalid table name: {table!r}")
+            self._connect().execute(
+                f'CREATE TABLE IF NOT EXISTS "{table}" '
+                '(user_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (user_id, seq))')
+            with self._tables_lock:
+                self._segment_tables.add(table)
+        return f'"{table}"'
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._connect())
+
+    def get(self, table, user_id):
+        row = self._connect().execute(
+            f'SELECT data FROM {self._table(table)} WHERE user_id = ?', (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert(self, table, user_id, doc):
+        """Merges doc's fields into the user's document, creating it if needed (like TinyDB's upsert)."""
+        name = self._table(table)
+        with self._transaction() as connection:
+            row = connection.execute(f'SELECT data FROM {name} WHERE user_id = ?', (user_id,)).fetchone()
+            merged = {**(json.loads(row[0]) if row else {}), **doc, 'user_id': user_id}
+            connection.execute(f'INSERT OR REPLACE INTO {name} (user_id, data) VALUES (?, ?)',
+                               (user_id, json.dumps(merged)))
+
+    def insert_if_absent(self, table, user_id, doc):
+        cursor = self._connect().execute(
+            f'INSERT OR IGNORE INTO {self._table(table)} (user_id, data) VALUES (?, ?)',
+            (user_id, json.dumps({**doc, 'user_id': user_id})))
+        return cursor.rowcount == 1
+
+    def update(self, table, user_id, fields):
+        name = self._table(table)
+        with self._transaction() as connection:
+            row = connection.execute(f'SELECT data FROM {name} WHERE user_id = ?', (user_id,)).fetchone()
+            if row is None:
+                return False
+            connection.execute(f'UPDATE {name} SET data = ? WHERE user_id = ?',
+                               (json.dumps({**json.loads(row[0]), **fields}), user_id))
+            return True
+
+    def compare_and_set(self, table, user_id, expected, fields):
+        """
+        Updates fields only if the document currently has every value in expected, in
+        one transaction. Returns True if this call won (e.g. to claim a one-time credit).
+        """
+        name = self._table(table)
+        with self._transaction() as connection:
+            row = connection.execute(f'SELECT data FROM {name} WHERE user_id = ?', (user_id,)).fetchone()
+            if row is None:
+                return False
+            doc = json.loads(row[0])
+            if not _matches(doc, expected):
+                return False
+            connection.execute(f'UPDATE {name} SET data = ? WHERE user_id = ?',
+                               (json.dumps({**doc, **fields}), user_id))
+            return True
+
+    def increment(self, table, user_id, deltas, derive=None):
+        """
+        Atomically adds deltas to numeric fields, then applies derive(doc) (e.g. the level
+        computed from the new points) in the same transaction. Returns the new document,
+        or None if the user has none.
+        """
+        name = self._table(table)
+        with self._transaction() as connection:
+            row = connection.execute(f'SELECT data FROM {name} WHERE user_id = ?', (user_id,)).fetchone()
+            if row is None:
+                return None
+            doc = _apply_increment(json.loads(row[0]), deltas, derive)
+            connection.execute(f'UPDATE {name} SET data = ? WHERE user_id = ?', (json.dumps(doc), user_id))
+            return doc
+
+    def all(self, table):
+        rows = self._connect().execute(f'SELECT data FROM {self._table(table)}').fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def append_segment(self, table, user_id, data):
+        """Adds data (a string) as the user's next segment and returns its number (0, 1, ...)."""
+        name = self._segment_table(table)
+        with self._transaction() as connection:
+            seq = connection.execute(f'SELECT COALESCE(MAX(seq) + 1, 0) FROM {name} WHERE user_id = ?',
+                                     (user_id,)).fetchone()[0]
+            connection.execute(f'INSERT INTO {name} (user_id, seq, data) VALUES (?, ?, ?)', (user_id, seq, data))
+            return seq
+
+    def get_segments(self, table, user_id, start=0, end=None):
+        """(seq, data) of the user's segments start <= seq < end, in order; an index range scan."""
+        rows = self._connect().execute(
+            f'SELECT seq, data FROM {self._segment_table(table)} WHERE user_id = ? AND seq >= ? AND seq < ? ORDER BY seq',
+            (user_id, start, end if end is not None else 2 ** 62)).fetchall()
+        return [(seq, data) for seq, data in rows]
+
+    def segment_count(self, table, user_id):
+        # Segments are numbered without gaps, so the highest number gives the count.
+        row = self._connect().execute(
+            f'SELECT COALESCE(MAX(seq) + 1, 0) FROM {self._segment_table(table)} WHERE user_id = ?', (user_id,)).fetchone()
+        return row[0]
+
+    def close(self):
+        with self._tables_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+def _matches(doc, expected):
+    return all(doc.get(field) == value for field, value in expected.items())
+
+def _apply_increment(doc, deltas, derive):
+    for field, delta in deltas.items():
+        doc[field] = doc.get(field, 0) + delta
+    if derive is not None:
+        doc.update(derive(doc))
+    return doc
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+def migrate_tinydb_to_sqlite(json_path=TINYDB_PATH, sqlite_path=SQLITE_PATH, segment_tables=SEGMENT_TABLES):
+    """
+    Copies every table of a TinyDB JSON file into SQLite; the tables named in
+    segment_tables as segments. Documents are read straight from the JSON, so TinyDB
+    does not need to be installed. Returns {table: count}.
+    """
+    with open(json_path) as f:
+        tables = json.load(f)
+    target = SQLiteStorage(sqlite_path)
+    counts = {}
+    for table, documents in tables.items():
+        documents = [doc for doc in documents.values() if 'user_id' in doc]
+        with target._transaction() as connection:
+            if table in segment_tables:
+                rows = [(doc['user_id'], doc['seq'], doc['data']) for doc in documents]
+                connection.executemany(
+                    f'INSERT OR REPLACE INTO {target._segment_table(table)} (user_id, seq, data) VALUES (?, ?, ?)', rows)
+            else:
+                rows = [(doc['user_id'], json.dumps(doc)) for doc in documents]
+                connection.executemany(
+                    f'INSERT OR REPLACE INTO {target._table(table)} (user_id, data) VALUES (?, ?)', rows)
+        counts[table] = len(rows)
+    target.close()
+    return counts
+
+def open_storage(backend=None):
+    """
+    Opens the configured backend (FOCUSFLOW_DB_BACKEND: 'sqlite' or 'tinydb').
+    The first time SQLite is used next to an existing focusflow_db.json, that file is
+    migrated automatically so no profile or stats are lost.
+    """
+    backend = backend or DB_BACKEND
+    if backend == 'tinydb':
+        return TinyDBStorage(TINYDB_PATH)
+    if backend != 'sqlite':
+        raise ValueError(f"Unknown database backend: {backend!r}")
+    if not os.path.exists(SQLITE_PATH) and os.path.exists(TINYDB_PATH):
+        counts = migrate_tinydb_to_sqlite(TINYDB_PATH, SQLITE_PATH)
+        print(f"Migrated {TINYDB_PATH} to {SQLITE_PATH}: {counts}")
+    return SQLiteStorage(SQLITE_PATH)
+
+class LazyStorage:
+    """
+    Stands in for open_storage(backend) and opens it on first use, so importing a module
+    that holds one (database.py) creates or migrates no files.
+    """
+
+    def __init__(self, backend=None):
+        self._backend_name = backend
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        with self._lock:
+            if self._backend is None:
+                self._backend = open_storage(self._backend_name)
+            return self._backend
+
+    def __getattr__(self, name):
+        return getattr(self._backend or self._open(), name)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="FocusFlow storage tools.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    migrate = subcommands.add_parser('migrate', help="Copy a TinyDB JSON file into SQLite.")
+    migrate.add_argument('json_path', nargs='?', default=TINYDB_PATH)
+    migrate.add_argument('sqlite_path', nargs='?', default=SQLITE_PATH)
+    args = parser.parse_args()
+    print(migrate_tinydb_to_sqlite(args.json_path, args.sqlite_path))
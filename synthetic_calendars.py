@@ -0,0 +1,80 @@
+# File: synthetic_calendars.py
+# Seeded, synthetic Google Calendar event lists for benchmarks and tests.
+#
+#   sparse       1-2 events a day, lots of free time
+#   dense        back-to-back events from morning to late evening, short gaps
+#   overlapping  nested and overlapping events, plus all-day and "free" events
+#   multi_week   a weekly class timetable repeated over several weeks, plus extras
+#
+# Every generator returns (events, window_end) for a window starting at
+# window_start; the same seed always gives the same calendar.
+
+import datetime as dt
+import random
+
+def _event(summary, start, end, **extra):
+    return {'summary': summary, 'start': {'dateTime': start.isoformat()},
+            'end': {'dateTime': end.isoformat()}, **extra}
+
+def _day_start(window_start, day):
+    return window_start + dt.timedelta(days=day)
+
+def sparse_calendar(window_start, days=5, seed=0):
+    rng = random.Random(seed)
+    events = []
+    for day in range(days):
+        for _ in range(rng.randint(1, 2)):
+            start = _day_start(window_start, day) + dt.timedelta(hours=rng.randint(9, 19))
+            events.append(_event("Meeting", start, start + dt.timedelta(minutes=rng.choice((30, 60)))))
+    return events, window_start + dt.timedelta(days=days)
+
+def dense_calendar(window_start, days=5, seed=0):
+    rng = random.Random(seed)
+    events = []
+    for day in range(days):
+        current = _day_start(window_start, day) + dt.timedelta(hours=8)
+        day_end = _day_start(window_start, day) + dt.timedelta(hours=22)
+        while current < day_end:
+            end = current + dt.timedelta(minutes=rng.choice((30, 45, 60, 90)))
+            events.append(_event("Class", current, end))
+            current = end + dt.timedelta(minutes=rng.choice((0, 0, 10, 15, 70)))
+    return events, window_start + dt.timedelta(days=days)
+
+def overlapping_calendar(window_start, days=5, seed=0, events_per_day=25):
+    rng = random.Random(seed)
+    events = []
+    for day in range(days):
+        base = _day_start(window_start, day)
+        events.append({'summary': "Holiday" if day == 2 else "Reminder", 'start': {'date': base.date().isoformat()},
+                       'end': {'date': (base + dt.timedelta(days=1)).date().isoformat()},
+                       **({} if day == 2 else {'transparency': 'transparent'})})
+        for _ in range(events_per_day):
+            start = base + dt.timedelta(minutes=rng.randrange(7 * 60, 21 * 60, 5))
+            extra = {'transparency': 'transparent'} if rng.random() < 0.1 else {}
+            events.append(_event("Overlap", start, start + dt.timedelta(minutes=rng.choice((15, 30, 60, 120, 240))), **extra))
+    return events, window_start + dt.timedelta(days=days)
+
+def multi_week_calendar(window_start, weeks=4, seed=0):
+    rng = random.Random(seed)
+    timetable = [(weekday, rng.choice((9, 10, 11, 14, 15)), rng.choice((60, 90))) for weekday in range(5) for _ in range(3)]
+    events = []
+    for week in range(weeks):
+        week_start = _day_start(window_start, 7 * week)
+        for weekday, hour, minutes in timetable:
+            start = week_start + dt.timedelta(days=weekday, hours=hour)
+            events.append(_event("Lecture", start, start + dt.timedelta(minutes=minutes)))
+        for _ in range(rng.randint(3, 8)):
+            start = week_start + dt.timedelta(days=rng.randrange(7), hours=rng.randint(8, 20))
+            events.append(_event("Study group", start, start + dt.timedelta(minutes=60)))
+    return events, window_start + dt.timedelta(days=7 * weeks)
+
+SCENARIOS = {
+    'sparse': sparse_calendar,
+    'dense': dense_calendar,
+    'overlapping': overlapping_calendar,
+    'multi_week': multi_week_calendar,
+}
+
+def generate(name, window_start, seed=0):
+    """(events, window_end) for one of SCENARIOS."""
+    return SCENARIOS[name](window_start, seed=seed)
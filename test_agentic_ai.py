@@ -0,0 +1,134 @@
+# File: test_agentic_ai.py
+# The agent loop, driven by a scripted stub model.
+
+import time
+from types import SimpleNamespace
+
+import agentic_ai
+from agentic_ai import process_user_request
+from chat_history import HistoryManager
+
+
+def call(name, **args):
+    return SimpleNamespace(text='', function_call=SimpleNamespace(name=name, args=args),
+                           function_response=SimpleNamespace(name=''))
+
+
+def text(value):
+    return SimpleNamespace(text=value, function_call=SimpleNamespace(name='', args={}),
+                           function_response=SimpleNamespace(name=''))
+
+
+class ScriptedChat:
+    """Answers each send_message with the next scripted list of parts."""
+
+    def __init__(self, script):
+        self.script = iter(script)
+        self.history = []
+        self.sent = []
+
+    def send_message(self, message):
+        self.sent.append(message)
+        reply = SimpleNamespace(role='model', parts=next(self.script))
+        self.history.append(reply)
+        return SimpleNamespace(candidates=[SimpleNamespace(content=reply)])
+
+
+class ScriptedModel:
+    def __init__(self, script):
+        self.chat = ScriptedChat(script)
+
+    def start_chat(self, history):
+        return self.chat
+
+
+def slow_tool(result):
+    def tool(**args):
+        time.sleep(0.2)
+        return f"{result} {sorted(args.items())}"
+    return tool
+
+
+def test_function_calls_of_one_response_run_in_parallel(monkeypatch):
+    monkeypatch.setattr(agentic_ai, 'AVAILABLE_FUNCTIONS', {
+        'schedule_event': slow_tool("scheduled"), 'list_today_events': slow_tool("agenda")})
+    model = ScriptedModel([
+        [call('schedule_event', task_description=f"Study {i}", date='2025-01-01', time=f'1{i}:00') for i in range(3)]
+        + [call('list_today_events')],
+        [text("Done: three sessions booked. Your agenda is clear.")],
+    ])
+    manager = HistoryManager(summarizer=lambda old, new: old)
+
+    started = time.perf_counter()
+    reply, _ = process_user_request(model, "Schedule three study sessions and tell me today's agenda", manager)
+
+    assert reply == "Done: three sessions booked. Your agenda is clear."
+    assert time.perf_counter() - started < 0.6
+    follow_up = model.chat.sent[1]
+    assert [r['function_response']['name'] for r in follow_up] == ['schedule_event'] * 3 + ['list_today_events']
+    assert follow_up[0]['function_response']['response']['result'].startswith("scheduled")
+    assert [step['step'] for step in manager.last_request['steps']] == ['model', 'tools', 'model']
+    assert len(manager.last_request['steps'][1]['calls']) == 4
+
+
+def test_tool_errors_are_reported_to_the_model(monkeypatch):
+    def broken(**args):
+        raise RuntimeError("calendar offline")
+    monkeypatch.setattr(agentic_ai, 'AVAILABLE_FUNCTIONS', {'list_today_events': broken})
+    model = ScriptedModel([[call('list_today_events'), call('missing_tool')], [text("Sorry, no calendar.")]])
+
+    reply, _ = process_user_request(model, "What's on today?", HistoryManager())
+
+    results = [r['function_response']['response']['result'] for r in model.chat.sent[1]]
+    assert "calendar offline" in results[0] and "unknown function" in results[1]
+    assert reply == "Sorry, no calendar."
+
+
+def test_loop_stops_at_the_iteration_cap(monkeypatch):
+    monkeypatch.setattr(agentic_ai, 'AVAILABLE_FUNCTIONS', {'list_today_events': lambda: "nothing"})
+    model = ScriptedModel([[call('list_today_events')]] * 10)
+
+    reply, _ = process_user_request(model, "Loop forever", HistoryManager())
+
+    assert "too many steps" in reply
+    assert len(model.chat.sent) == agentic_ai.AGENT_MAX_ITERATIONS
+
+
+class StreamingChat(ScriptedChat):
+    """Like ScriptedChat, but streams each scripted reply one part per chunk."""
+
+    def send_message(self, message, stream=False):
+        assert stream
+        self.sent.append(message)
+        parts = next(self.script)
+        self.history.append(SimpleNamespace(role='model', parts=parts))
+        return [SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[p]))]) for p in parts]
+
+
+def test_streaming_yields_text_and_runs_calls_found_mid_stream(monkeypatch):
+    monkeypatch.setattr(agentic_ai, 'AVAILABLE_FUNCTIONS', {'list_today_events': lambda: "Gym at 18:00"})
+    model = ScriptedModel([])
+    model.chat = StreamingChat([
+        [text("Let me check. "), call('list_today_events')],
+        [text("You have "), text("gym at 18:00.")],
+    ])
+    manager = HistoryManager()
+
+    chunks = list(agentic_ai.stream_user_request(model, "What's on today?", manager))
+
+    assert chunks == ["Let me check. ", "You have ", "gym at 18:00."]
+    assert model.chat.sent[1][0]['function_response']['response']['result'] == "Gym at 18:00"
+    assert 0 < manager.last_request['first_token_seconds'] <= manager.last_request['seconds']
+
+
+def test_calendar_tools_run_for_the_requesting_user(monkeypatch):
+    import calendar_functions
+    seen = []
+    monkeypatch.setattr(calendar_functions, 'list_today_events', lambda user_id='default': seen.append(user_id) or "agenda")
+    monkeypatch.setattr(agentic_ai, 'AVAILABLE_FUNCTIONS', {
+        'list_today_events': agentic_ai._calendar_function('list_today_events')})
+    model = ScriptedModel([[call('list_today_events'), call('list_today_events')], [text("Here you go.")]])
+
+    process_user_request(model, "What's on today?", HistoryManager(summarizer=lambda old, new: old), user_id='alice')
+
+    assert seen == ['alice', 'alice']
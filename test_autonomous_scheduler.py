@@ -0,0 +1,211 @@
+# File: test_autonomous_scheduler.py
+# Offline checks for the scheduler, run against fake_calendar_service.
+
+import datetime as dt
+from collections import OrderedDict
+
+import event_store
+from autonomous_scheduler import (INDIAN_TIMEZONE, commit_plan, fetch_busy_and_blocks, find_free_slots,
+                                  find_free_slots_from_busy, plan_focus_sessions, replan_focus_sessions,
+                                  run_autonomous_scheduler, schedule_focus_sessions_in_slots)
+from fake_calendar_service import FakeCalendarService
+from google_calendar_agent import create_calendar_events_batch, get_busy_intervals, parse_event_time
+from intervals import intersection
+from plan_diff import diff_plan
+from planner import build_plan, constraints_from_profile
+from synthetic_calendars import generate
+
+
+def _slot(hours):
+    start = INDIAN_TIMEZONE.localize(dt.datetime(2026, 1, 5, 9, 0))
+    return {'start': start, 'end': start + dt.timedelta(hours=hours)}
+
+
+def test_plan_alternates_focus_and_break_blocks():
+    planned = plan_focus_sessions([_slot(3)])
+    summaries = [p['summary'] for p in planned]
+    assert summaries == ["🚀 Focus Block", "🚀 Focus Block", "🧠 Mindful Break", "🚀 Focus Block"]
+    assert all(a['end'] <= b['start'] for a, b in zip(planned, planned[1:]))
+
+
+def test_blocks_are_committed_in_batched_round_trips():
+    service = FakeCalendarService()
+    results = schedule_focus_sessions_in_slots(service, [_slot(60)])
+
+    assert len(results) > 50
+    assert all(r['error'] is None for r in results)
+    assert len(service.all_events()) == len(results)
+    assert service.round_trips == -(-len(results) // 50)
+
+
+def test_only_failed_items_are_retried():
+    service = FakeCalendarService()
+    planned = plan_focus_sessions([_slot(6)])
+    service.fail_next('insert', 503, times=2)
+
+    results = create_calendar_events_batch(service, planned, backoff_seconds=0)
+
+    assert all(r['error'] is None for r in results)
+    assert len(service.all_events()) == len(planned)
+    assert service.calls['insert'] == len(planned) + 2
+    assert service.round_trips == 2
+
+
+def test_non_retryable_failures_are_reported_not_retried():
+    service = FakeCalendarService()
+    planned = plan_focus_sessions([_slot(3)])
+    service.fail_next('insert', 400)
+
+    results = create_calendar_events_batch(service, planned, backoff_seconds=0)
+
+    assert results[0]['error'].resp.status == 400
+    assert all(r['error'] is None for r in results[1:])
+    assert service.round_trips == 1
+
+
+def test_rerun_on_unchanged_calendar_makes_no_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_store, 'EVENT_STORE_DIR', str(tmp_path))
+    monkeypatch.setattr(event_store, '_stores', OrderedDict())
+    now = dt.datetime.now(INDIAN_TIMEZONE)
+    service = FakeCalendarService([{
+        'summary': 'Lecture',
+        'start': {'dateTime': (now + dt.timedelta(days=1)).isoformat()},
+        'end': {'dateTime': (now + dt.timedelta(days=1, hours=3)).isoformat()},
+    }])
+
+    run_autonomous_scheduler(service=service)
+    first_run_writes = service.write_calls()
+    run_autonomous_scheduler(service=service)
+
+    assert first_run_writes > 0
+    assert service.write_calls() == first_run_writes
+
+
+def test_blocks_stay_busy_but_rerun_with_freebusy_makes_no_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_store, 'EVENT_STORE_DIR', str(tmp_path))
+    monkeypatch.setattr(event_store, '_stores', OrderedDict())
+    service = FakeCalendarService()
+
+    run_autonomous_scheduler(use_freebusy=True, service=service)
+    first_run_writes = service.write_calls()
+    run_autonomous_scheduler(use_freebusy=True, service=service)
+
+    assert first_run_writes > 0
+    assert service.write_calls() == first_run_writes
+    assert all(event.get('transparency') == 'opaque' for event in service.all_events())
+
+
+def test_replan_patches_moved_blocks_and_deletes_obsolete_ones():
+    service = FakeCalendarService()
+    now = _slot(0)['start'] - dt.timedelta(days=1)
+    replan_focus_sessions(service, [_slot(3)], [], now)
+    existing = service.all_events()
+    assert len(existing) == 4
+
+    # The slot shrinks and starts later: a block already in place stays, one is moved, the rest deleted.
+    later = {'start': _slot(0)['start'] + dt.timedelta(hours=1), 'end': _slot(0)['start'] + dt.timedelta(hours=3)}
+    summary = replan_focus_sessions(service, [later], existing, now)
+
+    assert (summary['inserted'], summary['patched'], summary['deleted']) == (0, 1, 2)
+    assert sorted(e['start']['dateTime'] for e in service.all_events()) == [
+        later['start'].isoformat(), (later['start'] + dt.timedelta(minutes=50)).isoformat()]
+
+
+def test_dry_run_plans_around_the_profile_without_writing(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_store, 'EVENT_STORE_DIR', str(tmp_path))
+    monkeypatch.setattr(event_store, '_stores', OrderedDict())
+    service = FakeCalendarService()
+
+    result = run_autonomous_scheduler(service=service, profile={'in_time': '08:00', 'out_time': '15:00'}, dry_run=True)
+
+    assert service.write_calls() == 0
+    upcoming = [b for b in result['plan']['blocks'] if b['start'] >= dt.datetime.now(INDIAN_TIMEZONE)]
+    assert upcoming and len(result['diff']['insert']) == len(upcoming)
+    assert all(block['start'].hour >= 7 and block['end'].hour <= 23 for block in result['plan']['blocks'])
+
+
+def test_event_early_in_the_day_only_rewrites_the_blocks_it_moves():
+    constraints = constraints_from_profile({'in_time': '09:00', 'out_time': '15:00'})
+    service = FakeCalendarService()
+    now = _at(0, day=4)
+    commit_plan(service, build_plan([], _at(0), _at(0, day=6), constraints, INDIAN_TIMEZONE), [], now)
+    first_run_writes = service.write_calls()
+
+    # A 07:00-08:00 tutor slot shifts every positional key of the day by one.
+    plan = build_plan([(_at(7), _at(8))], _at(0), _at(0, day=6), constraints, INDIAN_TIMEZONE)
+    diff = diff_plan(plan['blocks'], service.all_events(), now)
+    commit_plan(service, plan, service.all_events(), now)
+
+    assert (len(diff['insert']), len(diff['patch']), len(diff['delete']), diff['unchanged']) == (1, 2, 0, 5)
+    assert service.write_calls() - first_run_writes == 3
+    commit_plan(service, plan, service.all_events(), now)  # stale stored keys cost nothing
+    assert service.write_calls() - first_run_writes == 3
+
+
+def _at(hour, minute=0, day=5):
+    return INDIAN_TIMEZONE.localize(dt.datetime(2026, 1, day, hour, minute))
+
+
+def _timed(summary, start, end, **extra):
+    return {'summary': summary, 'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': end.isoformat()}, **extra}
+
+
+def test_busy_intervals_cover_several_calendars_and_local_all_day_events():
+    service = FakeCalendarService([_timed("Lecture", _at(9), _at(10)), _timed("Free", _at(11), _at(12), transparency='transparent')])
+    service.add_event(_timed("Lab", _at(9, 30), _at(11)), calendar_id='school')
+    service.add_event({'summary': "Holiday", 'start': {'date': '2026-01-06'}, 'end': {'date': '2026-01-07'}},
+                      calendar_id='school')
+
+    busy = get_busy_intervals(service, _at(0), _at(0, day=8), ['primary', 'school', 'missing'])
+
+    assert busy == [(_at(9), _at(10)), (_at(9, 30), _at(11)), (_at(0, day=6), _at(0, day=7))]
+    slots = find_free_slots_from_busy(busy, _at(8), _at(13))
+    assert [(s['start'], s['end']) for s in slots] == [(_at(8), _at(9)), (_at(11), _at(13))]
+
+
+def test_free_slots_from_busy_times_match_the_event_list_path():
+    window_start = INDIAN_TIMEZONE.localize(dt.datetime(2025, 1, 6))
+    events, window_end = generate('overlapping', window_start, seed=3)
+    service = FakeCalendarService(events)
+
+    from_busy = find_free_slots_from_busy(get_busy_intervals(service, window_start, window_end), window_start, window_end)
+
+    assert from_busy == find_free_slots(events, window_start, window_end)
+
+
+def test_token_without_freebusy_scope_reads_primary_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_store, 'EVENT_STORE_DIR', str(tmp_path))
+    monkeypatch.setattr(event_store, '_stores', OrderedDict())
+    tomorrow = INDIAN_TIMEZONE.localize(dt.datetime.combine(dt.date.today() + dt.timedelta(days=1), dt.time()))
+    lecture = (tomorrow + dt.timedelta(hours=9), tomorrow + dt.timedelta(hours=10))
+    service = FakeCalendarService([_timed("Lecture", *lecture)])
+    service.fail_next('freebusy', 403, message='Request had insufficient authentication scopes.')
+
+    busy, blocks = fetch_busy_and_blocks(service, tomorrow, tomorrow + dt.timedelta(days=1), use_freebusy=True,
+                                         calendar_ids=['primary', 'school'])
+
+    assert busy == [lecture] and blocks == []
+    assert service.calls['list'] == 1 and service.calls['freebusy'] == 1
+
+
+def test_event_put_over_a_block_moves_the_block_in_freebusy_mode(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_store, 'EVENT_STORE_DIR', str(tmp_path))
+    monkeypatch.setattr(event_store, '_stores', OrderedDict())
+    service = FakeCalendarService()
+    tomorrow = INDIAN_TIMEZONE.localize(dt.datetime.combine(dt.date.today() + dt.timedelta(days=1), dt.time()))
+    service.add_event(_timed("Timetable", tomorrow + dt.timedelta(hours=7), tomorrow + dt.timedelta(hours=8)),
+                      calendar_id='school')
+    run_autonomous_scheduler(use_freebusy=True, calendar_ids=['primary', 'school'], service=service,
+                             profile={'in_time': '09:00', 'out_time': '15:00'})
+    block = min((e for e in service.all_events() if e['start']['dateTime'] >= tomorrow.isoformat()),
+                key=lambda e: e['start']['dateTime'])
+    service.add_event(_timed("Exam", parse_event_time(block['start']['dateTime']), parse_event_time(block['end']['dateTime'])))
+
+    run_autonomous_scheduler(use_freebusy=True, calendar_ids=['primary', 'school'], service=service,
+                             profile={'in_time': '09:00', 'out_time': '15:00'})
+
+    exam = (parse_event_time(block['start']['dateTime']), parse_event_time(block['end']['dateTime']))
+    blocks = [(parse_event_time(e['start']['dateTime']), parse_event_time(e['end']['dateTime']))
+              for e in service.all_events() if e['summary'] != "Exam" and e.get('extendedProperties')]
+    assert not intersection(blocks, [exam])
+    assert not intersection(blocks, [(tomorrow + dt.timedelta(hours=7), tomorrow + dt.timedelta(hours=8))])
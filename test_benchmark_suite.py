@@ -0,0 +1,45 @@
+# File: test_benchmark_suite.py
+
+import json
+
+import agentic_ai
+import benchmark_suite
+from chat_history import HistoryManager
+from fake_gemini import FakeGenerativeModel
+from resilient_client import configure_client, restore_client
+from synthetic_calendars import SCENARIOS, generate
+
+def test_synthetic_calendars_are_seeded_and_fit_their_window():
+    for name in SCENARIOS:
+        events, window_end = generate(name, benchmark_suite.WINDOW_START, seed=3)
+        assert events and (events, window_end) == generate(name, benchmark_suite.WINDOW_START, seed=3)
+        assert all('dateTime' in e['start'] or 'date' in e['start'] for e in events)
+    assert generate('dense', benchmark_suite.WINDOW_START, 1) != generate('dense', benchmark_suite.WINDOW_START, 2)
+
+def test_fake_gemini_drives_the_agent_loop_through_a_throttle(monkeypatch):
+    monkeypatch.setitem(agentic_ai.AVAILABLE_FUNCTIONS, 'list_today_events', lambda: "- 10:00 Math")
+    model = FakeGenerativeModel(tools=['calendar'])
+    model.fail_next(429)
+    previous = configure_client('gemini', rate=1_000, base_delay=0.01)
+    try:
+        text, history = agentic_ai.process_user_request(model, "What's on today?", HistoryManager())
+    finally:
+        restore_client('gemini', previous)
+    assert text.startswith("Here is what I found.")
+    assert model.calls == 3  # the throttled call, the function call, the answer
+    assert [role for role, _ in history.messages] == ['user', 'model']
+
+def test_suite_saves_json_and_flags_regressions(tmp_path):
+    output = tmp_path / 'current.json'
+    assert benchmark_suite.main(['--only', 'find_free_slots', '--repeats', '2', '--output', str(output)]) == 0
+    current = json.loads(output.read_text())
+    assert set(current['results']) == {f"find_free_slots[{name}]" for name in SCENARIOS}
+    assert current['config']['repeats'] == 2
+    assert all(result['p95_ms'] >= result['median_ms'] for result in current['results'].values())
+
+    baseline = json.loads(output.read_text())
+    name = 'find_free_slots[dense]'
+    baseline['results'][name]['median_ms'] = current['results'][name]['median_ms'] / 2
+    rows = {row['name']: row for row in benchmark_suite.compare(baseline, current)}
+    assert rows[name]['regression'] and rows[name]['change'] > 0.9
+    assert not rows['find_free_slots[sparse]']['regression']
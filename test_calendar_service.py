@@ -0,0 +1,168 @@
+# File: test_calendar_service.py
+# The per-user service cache in google_calendar_agent: reuse, token refresh and saving.
+
+import datetime as dt
+import json
+import os
+import threading
+
+import httplib2
+import pytest
+from google.auth.exceptions import RefreshError
+from google.oauth2.credentials import Credentials
+
+import google_calendar_agent
+from google_calendar_agent import get_calendar_service, invalidate_calendar_service
+
+
+def _utcnow():
+    return dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+
+
+def _token_info(expires_in):
+    return {'token': 'token-0', 'refresh_token': 'refresh', 'client_id': 'client', 'client_secret': 'secret',
+            'token_uri': 'https://oauth2.googleapis.com/token',
+            'expiry': (_utcnow() + expires_in).isoformat() + 'Z'}
+
+
+class FakeHttp:
+    """Stands in for httplib2.Http: answers the next scripted statuses, then 200."""
+
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.statuses = []
+        self.closed = False
+        FakeHttp.instances.append(self)
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        status = self.statuses.pop(0) if self.statuses else 200
+        return httplib2.Response({'status': status}), b'{}'
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    """Counts token refreshes; each one hands out a new token valid for an hour."""
+    calls = []
+
+    def refresh(creds, request):
+        calls.append(creds.token)
+        creds.token = f"token-{len(calls)}"
+        creds.expiry = _utcnow() + dt.timedelta(hours=1)
+    monkeypatch.setattr(Credentials, 'refresh', refresh)
+    monkeypatch.setattr(httplib2, 'Http', FakeHttp)
+    FakeHttp.instances = []
+    yield calls
+    invalidate_calendar_service()
+
+
+def _service(user_id, expires_in, saved):
+    return get_calendar_service(user_id, token_info=_token_info(expires_in), save_token=saved.append)
+
+
+def test_service_is_built_once_and_reused(refreshes):
+    saved = []
+    first = _service('alice', dt.timedelta(hours=1), saved)
+    second = _service('alice', dt.timedelta(hours=1), saved)
+
+    assert first._service is second._service
+    assert _service('bob', dt.timedelta(hours=1), saved)._service is not first._service
+    assert refreshes == [] and saved == []  # nothing changed, nothing written
+
+
+def test_token_is_refreshed_inside_the_margin_only(refreshes):
+    saved = []
+    _service('alice', google_calendar_agent.TOKEN_REFRESH_MARGIN + dt.timedelta(minutes=5), saved)
+    assert refreshes == [] and saved == []
+
+    _service('bob', google_calendar_agent.TOKEN_REFRESH_MARGIN - dt.timedelta(minutes=1), saved)
+    assert refreshes == ['token-0']
+    assert len(saved) == 1 and '"token-1"' in saved[0]
+
+    _service('bob', dt.timedelta(hours=1), saved)  # fresh token now: no refresh, no write
+    assert len(refreshes) == 1 and len(saved) == 1
+
+
+def test_token_refreshed_after_a_401_is_saved(refreshes):
+    saved = []
+    service = _service('alice', dt.timedelta(hours=1), saved)
+    http = service._service._http
+    http.request('https://www.googleapis.com/calendar/v3/users/me/calendarList')  # opens this thread's connection
+    FakeHttp.instances[-1].statuses = [401]
+
+    http.request('https://www.googleapis.com/calendar/v3/users/me/calendarList')
+
+    assert refreshes == ['token-0']
+    assert len(saved) == 1 and '"token-1"' in saved[0]
+
+
+def test_failed_refresh_returns_no_service(refreshes, monkeypatch):
+    def revoked(creds, request):
+        raise RefreshError('invalid_grant: Token has been expired or revoked.')
+    monkeypatch.setattr(Credentials, 'refresh', revoked)
+
+    assert _service('alice', dt.timedelta(minutes=1), []) is None
+
+
+def test_invalidate_closes_every_threads_connection(refreshes):
+    http = _service('alice', dt.timedelta(hours=1), [])._service._http
+    threads = [threading.Thread(target=http.request, args=('https://www.googleapis.com/',)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(FakeHttp.instances) == 3
+
+    invalidate_calendar_service('alice')
+
+    assert all(instance.closed for instance in FakeHttp.instances)
+
+
+def test_cache_keeps_only_the_most_recently_used_services(refreshes, monkeypatch):
+    monkeypatch.setattr(google_calendar_agent, 'SERVICE_CACHE_SIZE', 2)
+    alice = _service('alice', dt.timedelta(hours=1), [])
+    _service('bob', dt.timedelta(hours=1), [])
+    _service('alice', dt.timedelta(hours=1), [])  # alice is now the most recently used
+    _service('carol', dt.timedelta(hours=1), [])
+
+    assert list(google_calendar_agent._service_cache) == ['alice', 'carol']
+    assert _service('alice', dt.timedelta(hours=1), [])._service is alice._service
+
+
+def test_users_without_their_own_token_fall_back_to_token_json(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert google_calendar_agent._token_path('alice') == os.path.join('tokens', 'alice.json')
+
+    (tmp_path / 'token.json').write_text('{}')
+    assert google_calendar_agent._token_path('alice') == 'token.json'
+
+    (tmp_path / 'tokens').mkdir()
+    (tmp_path / 'tokens' / 'alice.json').write_text('{}')
+    assert google_calendar_agent._token_path('alice') == os.path.join('tokens', 'alice.json')
+
+
+def test_freebusy_mode_sends_a_token_without_the_scope_through_consent(tmp_path, monkeypatch):
+    consented = []
+
+    class FakeFlow:
+        @classmethod
+        def from_client_secrets_file(cls, path, scopes):
+            consented.append(scopes)
+            return cls()
+
+        def run_local_server(self, port):
+            return Credentials.from_authorized_user_info({**_token_info(dt.timedelta(hours=1)), 'scopes': consented[-1]})
+    monkeypatch.setattr(google_calendar_agent, 'InstalledAppFlow', FakeFlow)
+    token_path = tmp_path / 'token.json'
+    token_path.write_text(json.dumps({**_token_info(dt.timedelta(hours=1)),
+                                      'scopes': google_calendar_agent.scopes_for(False)}))
+
+    assert google_calendar_agent._load_credentials(str(token_path), google_calendar_agent.scopes_for(False)).valid
+    assert consented == []
+
+    creds = google_calendar_agent._load_credentials(str(token_path), google_calendar_agent.scopes_for(True))
+    assert consented == [google_calendar_agent.scopes_for(True)]
+    assert creds.has_scopes([google_calendar_agent.FREEBUSY_SCOPE])
@@ -0,0 +1,64 @@
+# File: test_chat_history.py
+# History bounding, driven by a stub Gemini chat.
+
+from types import SimpleNamespace
+
+import agentic_ai
+from agentic_ai import process_user_request
+from chat_history import HistoryManager, estimate_tokens
+
+
+def part(text='', call=None, result=None):
+    return SimpleNamespace(text=text, function_call=SimpleNamespace(name=call or '', args={}),
+                           function_response=SimpleNamespace(name=result or ''))
+
+
+def entry(role, *parts):
+    return SimpleNamespace(role=role, parts=list(parts))
+
+
+class StubChat:
+    def __init__(self, history):
+        self.history = list(history)
+
+    def send_message(self, message):
+        if isinstance(message, list):
+            self.history.append(SimpleNamespace(role='user', parts=[part(result='list_today_events')]))
+            reply = entry('model', part("You have nothing else today."))
+        else:
+            self.history.append(entry('user', part(message)))
+            reply = entry('model', part(call='list_today_events'))
+        self.history.append(reply)
+        usage = SimpleNamespace(prompt_token_count=estimate_tokens(self.history))
+        return SimpleNamespace(candidates=[SimpleNamespace(content=reply)], usage_metadata=usage)
+
+
+class StubModel:
+    def start_chat(self, history):
+        return StubChat(history)
+
+
+def test_history_stays_bounded_and_drops_old_tool_payloads(monkeypatch):
+    monkeypatch.setattr(agentic_ai, 'AVAILABLE_FUNCTIONS', {'list_today_events': lambda: "No events"})
+    summaries = []
+    manager = HistoryManager(token_budget=10_000, recent_turns=3,
+                             summarizer=lambda old, new: summaries.append(new) or f"{old} | {new[:20]}")
+
+    for i in range(20):
+        text, manager = process_user_request(StubModel(), f"What is on today? ({i})", manager)
+        assert text == "You have nothing else today."
+
+    assert len(manager.exchanges) == 3
+    assert manager.summary and summaries
+    # Only the newest exchange still carries function-call / function-response entries.
+    assert [len(exchange) for exchange in manager.exchanges] == [2, 2, 4]
+    assert len(manager.messages) == 40
+    assert manager.last_request['history_entries'] <= 2 + 2 + 2 + 4
+
+
+def test_token_budget_folds_old_exchanges():
+    manager = HistoryManager(token_budget=50, recent_turns=10, summarizer=lambda old, new: "short")
+    for i in range(5):
+        manager.record([entry('user', part("x" * 200)), entry('model', part("y" * 200))])
+    assert len(manager.exchanges) == 1
+    assert manager.summary == "short"
@@ -0,0 +1,81 @@
+# File: test_conversation_store.py
+import pytest
+
+import agentic_ai
+from chat_history import HistoryManager
+from conversation_store import ConversationStore, decode_segment, encode_segment
+from fake_gemini import FakeGenerativeModel
+from resilient_client import configure_client, restore_client
+from storage import SQLiteStorage, TinyDBStorage
+
+
+@pytest.fixture(params=['sqlite', 'tinydb'])
+def backend(request, tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'c.db')) if request.param == 'sqlite' else TinyDBStorage(str(tmp_path / 'c.json'))
+    yield storage
+    storage.close()
+
+
+def test_segments_are_numbered_per_user_and_read_by_range(backend):
+    assert [backend.append_segment('segments', 'ana', f"a{i}") for i in range(4)] == [0, 1, 2, 3]
+    backend.append_segment('segments', 'ben', "b0")
+    assert backend.segment_count('segments', 'ana') == 4
+    assert backend.segment_count('segments', 'zoe') == 0
+    assert backend.get_segments('segments', 'ana', 1, 3) == [(1, 'a1'), (2, 'a2')]
+    assert backend.get_segments('segments', 'ben') == [(0, 'b0')]
+
+
+def test_segments_are_compact_and_round_trip():
+    short = [('user', "hi"), ('model', "héllo")]
+    assert encode_segment(short, 1.5) == 'j{"t":1,"m":[["u","hi"],["m","héllo"]]}'
+    long = [('user', "plan my week"), ('model', "Focus block. " * 100)]
+    data = encode_segment(long, 7)
+    assert data[0] == 'z' and len(data) < len("Focus block. " * 100)
+    assert decode_segment(data) == {'timestamp': 7, 'messages': long}
+
+
+def test_pages_hold_the_latest_exchanges_first(backend):
+    store = ConversationStore('ana', page_size=2, storage_backend=backend)
+    assert store.page(0) == [] and store.page_count() == 1
+    for i in range(5):
+        store.append([('user', f"q{i}"), ('model', f"a{i}")])
+    assert store.page_count() == 3
+    assert store.page(0) == [('user', 'q3'), ('model', 'a3'), ('user', 'q4'), ('model', 'a4')]
+    assert store.page(2) == [('user', 'q0'), ('model', 'a0')]
+    assert store.page(3) == []
+
+
+def test_a_page_render_counts_the_exchanges_once(backend, monkeypatch):
+    store = ConversationStore('ana', page_size=2, storage_backend=backend)
+    for i in range(5):
+        store.append([('user', f"q{i}"), ('model', f"a{i}")])
+    counts = []
+    segment_count = backend.segment_count
+    monkeypatch.setattr(backend, 'segment_count', lambda *args: counts.append(args) or segment_count(*args))
+
+    count = store.exchange_count()
+    assert store.page_count(count) == 3 and store.page(1, count) == store.page(1)
+    assert len(counts) == 2  # the render's count, and the plain page(1) call
+
+
+def test_history_survives_a_reload_without_keeping_messages_in_memory(backend, monkeypatch):
+    monkeypatch.setitem(agentic_ai.AVAILABLE_FUNCTIONS, 'list_today_events', lambda: "- 10:00 Math")
+    def summarize(summary, transcript):
+        return ' | '.join([summary] + [line for line in transcript.splitlines() if line.startswith('user')])
+    store = ConversationStore('ana', storage_backend=backend)
+    history = HistoryManager(store=store, recent_turns=2, summarizer=summarize)
+    model = FakeGenerativeModel(tools=['calendar'])
+    previous = configure_client('gemini', rate=1_000)
+    try:
+        for turn in range(4):
+            agentic_ai.process_user_request(model, f"question {turn}", history)
+    finally:
+        restore_client('gemini', previous)
+    assert history.messages == []
+    assert store.exchange_count() == 4
+    assert store.page(0)[-2][1] == "question 3"
+
+    reloaded = HistoryManager(store=ConversationStore('ana', storage_backend=backend))
+    assert reloaded.summary == history.summary and 'question 0' in reloaded.summary
+    assert reloaded.history() == HistoryManager(store=store).history()
+    assert [e['parts'][0]['text'] for e in reloaded.exchanges[-1]][0] == "question 3"
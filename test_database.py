@@ -0,0 +1,105 @@
+# File: test_database.py
+# Buffered gamification increments.
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import database
+from storage import SQLiteStorage
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    storage = SQLiteStorage(str(tmp_path / 'db.db'))
+    monkeypatch.setattr(database, 'storage', storage)
+    monkeypatch.setattr(database, 'GAMIFICATION_FLUSH_SECONDS', 60)  # flushed by hand below
+    database.init_gamification_stats('ana')
+    yield storage
+    database.flush_gamification_stats()
+    storage.close()
+
+
+def count_increments(storage, monkeypatch, fail_times=0):
+    calls = []
+    increment = storage.increment
+
+    def counted(table, user_id, deltas, derive=None):
+        calls.append(dict(deltas))
+        if len(calls) <= fail_times:
+            raise OSError("disk full")
+        return increment(table, user_id, deltas, derive)
+    monkeypatch.setattr(storage, 'increment', counted)
+    return calls
+
+
+def test_a_burst_is_coalesced_into_one_increment(store, monkeypatch):
+    calls = count_increments(store, monkeypatch)
+    messages = [database.update_gamification_stats('ana', points_to_add=200) for _ in range(3)]
+    assert messages == [None, None, "Leveled Up! You are now Level 2!"]
+    assert database.get_gamification_stats('ana')['points'] == 600
+    database.flush_gamification_stats()
+    assert calls == [{'points': 600, 'focus_sessions': 0}]
+    assert store.get('gamification', 'ana')['level'] == 2
+
+
+def test_reads_during_a_flush_see_every_point(store, monkeypatch):
+    started = threading.Event()
+    increment = store.increment
+
+    def slow_increment(*args, **kwargs):
+        started.set()
+        time.sleep(0.05)
+        return increment(*args, **kwargs)
+    monkeypatch.setattr(store, 'increment', slow_increment)
+    database.update_gamification_stats('ana', points_to_add=100)
+    flusher = threading.Thread(target=database.flush_gamification_stats)
+    flusher.start()
+    started.wait()
+    assert database.get_gamification_stats('ana')['points'] == 100
+    assert database.update_gamification_stats('ana', points_to_add=400) == "Leveled Up! You are now Level 2!"
+    flusher.join()
+    database.flush_gamification_stats()
+    assert store.get('gamification', 'ana')['points'] == 500
+
+
+def test_concurrent_increments_from_threads_all_land(store):
+    def click():
+        for _ in range(50):
+            database.update_gamification_stats('ana', points_to_add=1, sessions_to_add=1)
+    threads = [threading.Thread(target=click) for _ in range(8)]
+    flushers = [threading.Thread(target=database.flush_gamification_stats) for _ in range(4)]
+    for thread in threads + flushers:
+        thread.start()
+    for thread in threads + flushers:
+        thread.join()
+    database.flush_gamification_stats()
+    stored = store.get('gamification', 'ana')
+    assert (stored['points'], stored['focus_sessions']) == (400, 400)
+
+
+def test_a_failed_flush_keeps_the_deltas_buffered(store, monkeypatch):
+    calls = count_increments(store, monkeypatch, fail_times=1)
+    database.update_gamification_stats('ana', points_to_add=50)
+    database.flush_gamification_stats()
+    assert store.get('gamification', 'ana')['points'] == 0
+    assert database.get_gamification_stats('ana')['points'] == 50
+    database.update_gamification_stats('ana', points_to_add=25)
+    database.flush_gamification_stats()
+    assert calls[-1] == {'points': 75, 'focus_sessions': 0}
+    assert store.get('gamification', 'ana')['points'] == 75
+
+
+def test_buffered_points_are_flushed_on_exit(tmp_path):
+    path = str(tmp_path / 'exit.db')
+    script = ("import database\n"
+              "database.GAMIFICATION_FLUSH_SECONDS = 60\n"
+              "database.init_gamification_stats('ana')\n"
+              "database.update_gamification_stats('ana', points_to_add=30)\n")
+    env = {**os.environ, 'FOCUSFLOW_SQLITE_PATH': path}
+    subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(database.__file__) or '.',
+                   env=env, check=True, capture_output=True)
+    assert SQLiteStorage(path).get('gamification', 'ana')['points'] == 30
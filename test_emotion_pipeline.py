@@ -0,0 +1,76 @@
+# File: test_emotion_pipeline.py
+# The pipeline around FER, with a fake detector so neither fer nor cv2 is needed.
+
+import numpy as np
+
+import emotion_pipeline
+from emotion_pipeline import EmotionPipeline, EmotionSmoother
+
+
+def fake_detect(frames):
+    """Reads the 'emotion' painted into the first pixel: 1 happy, 2 sad, 0 no face."""
+    labels = {0: None, 1: 'happy', 2: 'sad'}
+    return [(labels[int(frame[0, 0])], 0.9, 0.001) for frame in frames]
+
+
+def frames(*codes):
+    return [np.full((4, 4), code, dtype=np.uint8) for code in codes]
+
+
+def test_smoother_ignores_flicker_and_missing_faces():
+    smoother = EmotionSmoother(window=5)
+    for label in ['happy', 'happy', None, 'sad', 'happy', None]:
+        smoother.add(label, 0.8)
+    assert smoother.label() == 'happy'
+    smoother.add('angry', 0.1)  # below the confidence floor
+    assert smoother.label() == 'happy'
+
+
+def test_only_every_nth_frame_is_analysed():
+    pipeline = EmotionPipeline(frame_skip=3, width=None, batch_size=2, workers=0, detect=fake_detect)
+    for frame in frames(*([2, 1, 1] * 6)):
+        pipeline.submit(frame)
+    assert pipeline.flush() == 'sad'
+    summary = pipeline.metrics.summary()
+    assert summary['frames_read'] == 18 and summary['frames_analyzed'] == 6
+    assert summary['stages']['inference']['mean_ms'] > 0
+
+
+def test_process_pool_keeps_order_and_drops_batches_when_busy():
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        pipeline = EmotionPipeline(frame_skip=1, width=None, batch_size=2, workers=2, window=4,
+                                   executor=executor, detect=fake_detect)
+        for frame in frames(*([2] * 10 + [1] * 10)):
+            pipeline.submit(frame)
+        assert pipeline.flush() == 'happy'
+
+        live = EmotionPipeline(frame_skip=1, width=None, batch_size=1, workers=1, executor=executor, detect=fake_detect)
+        for frame in frames(*([1] * 200)):
+            live.submit(frame, block=False)
+        live.flush()
+        assert live.metrics.frames_analyzed + live.metrics.batches_dropped == 200
+
+
+def test_failed_batch_is_counted_and_keeps_the_previous_label():
+    from concurrent.futures import ThreadPoolExecutor
+
+    def flaky_detect(batch):
+        if int(batch[0][0, 0]) == 3:
+            raise RuntimeError("worker died")
+        return fake_detect(batch)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pipeline = EmotionPipeline(frame_skip=1, width=None, batch_size=2, workers=1, executor=executor,
+                                   detect=flaky_detect)
+        for frame in frames(1, 1, 3, 3):
+            pipeline.submit(frame)
+        assert pipeline.flush() == 'happy' and pipeline.label == 'happy'
+    assert pipeline.metrics.summary()['batches_failed'] == 1
+
+
+def test_stage_latencies_keep_only_the_latest_samples(monkeypatch):
+    monkeypatch.setattr(emotion_pipeline, 'STAGE_SAMPLES', 5)
+    pipeline = EmotionPipeline(frame_skip=1, width=None, batch_size=1, workers=0, detect=fake_detect)
+    for frame in frames(*([1] * 20)):
+        pipeline.submit(frame)
+    assert all(len(values) == 5 for values in pipeline.metrics.stage_seconds.values())
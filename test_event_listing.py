@@ -0,0 +1,64 @@
+# File: test_event_listing.py
+# Paginated, projected event listing, and the streamed free-slot path built on it.
+
+import datetime as dt
+
+import pytest
+
+from autonomous_scheduler import INDIAN_TIMEZONE, find_free_slots
+from fake_calendar_service import FakeCalendarService
+from google_calendar_agent import EVENT_LIST_FIELDS, get_events_in_range, iter_events_in_range, list_event_pages
+from synthetic_calendars import SCENARIOS, generate
+
+WINDOW_START = INDIAN_TIMEZONE.localize(dt.datetime(2025, 1, 6))
+
+
+def _calendar(scenario='dense', seed=1):
+    events, window_end = generate(scenario, WINDOW_START, seed)
+    return FakeCalendarService(events), events, window_end
+
+
+def test_list_event_pages_follows_every_page_token():
+    service, events, window_end = _calendar()
+    pages = list(list_event_pages(service, 'primary', timeMin=WINDOW_START.isoformat(),
+                                  timeMax=window_end.isoformat(), maxResults=7))
+
+    assert len(pages) == service.calls['list'] == -(-len(events) // 7)
+    assert all('nextPageToken' in page for page in pages[:-1]) and 'nextPageToken' not in pages[-1]
+    assert sum(len(page['items']) for page in pages) == len(events)
+
+
+def test_iter_events_in_range_streams_all_pages_in_start_order():
+    service, events, window_end = _calendar()
+    streamed = list(iter_events_in_range(service, WINDOW_START, window_end, page_size=10))
+
+    assert len(streamed) == len(events)
+    assert service.calls['list'] == -(-len(events) // 10)
+    starts = [e['start']['dateTime'] for e in streamed]
+    assert starts == sorted(starts)
+
+
+def test_listing_requests_only_the_projected_fields():
+    service, _, window_end = _calendar('overlapping')
+    service.add_event({'summary': "Lecture", 'description': "Long notes", 'colorId': '5', 'location': "Hall 2",
+                       'start': {'dateTime': WINDOW_START.replace(hour=9).isoformat()},
+                       'end': {'dateTime': WINDOW_START.replace(hour=10).isoformat()}})
+
+    projected = list(iter_events_in_range(service, WINDOW_START, window_end))
+    full = get_events_in_range(service, WINDOW_START, window_end)
+
+    allowed = {'id', 'summary', 'start', 'end', 'transparency'}
+    assert EVENT_LIST_FIELDS.startswith('nextPageToken,items(')
+    assert all(set(event) <= allowed for event in projected)
+    assert any('transparency' in event for event in projected)  # "free" events stay recognisable
+    assert any('description' in event for event in full)
+    assert [e['id'] for e in projected] == [e['id'] for e in full]
+
+
+@pytest.mark.parametrize('scenario', list(SCENARIOS))
+def test_presorted_stream_gives_the_same_slots_as_sorting(scenario):
+    service, events, window_end = _calendar(scenario, seed=5)
+    streamed = iter_events_in_range(service, WINDOW_START, window_end, page_size=25)
+
+    assert find_free_slots(streamed, WINDOW_START, window_end, presorted=True) == \
+        find_free_slots(events[::-1], WINDOW_START, window_end)
@@ -0,0 +1,110 @@
+# File: test_event_store.py
+# Offline checks for the syncToken event store, run against fake_calendar_service.
+
+import datetime as dt
+from collections import OrderedDict
+
+import pytest
+
+import event_store
+from event_store import EventStore, get_event_store, get_synced_events_in_range
+from fake_calendar_service import FakeCalendarService
+
+
+def _event(summary, start, hours=1):
+    return {'summary': summary, 'start': {'dateTime': start.isoformat()},
+            'end': {'dateTime': (start + dt.timedelta(hours=hours)).isoformat()}}
+
+
+@pytest.fixture
+def now():
+    return dt.datetime.now(dt.timezone.utc).replace(microsecond=0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore('test_user', path=str(tmp_path / 'events.json'))
+
+
+def _summaries(store, now):
+    return sorted(e['summary'] for e in store.events_in_range(now - dt.timedelta(days=1), now + dt.timedelta(days=7)))
+
+
+def test_delta_sync_merges_inserts_patches_and_deletes(store, now):
+    service = FakeCalendarService([_event("Lecture", now + dt.timedelta(hours=2)),
+                                   _event("Lab", now + dt.timedelta(hours=5))])
+    assert store.sync(service) == 2
+    lecture, lab = sorted(store.events.values(), key=lambda e: e['summary'], reverse=True)
+
+    events = service.events()
+    events.insert(calendarId='primary', body=_event("Seminar", now + dt.timedelta(days=1))).execute()
+    events.patch(calendarId='primary', eventId=lecture['id'], body={'summary': "Lecture (moved)"}).execute()
+    events.delete(calendarId='primary', eventId=lab['id']).execute()
+
+    assert store.sync(service) == 3  # only the three changes are downloaded
+    assert _summaries(store, now) == ["Lecture (moved)", "Seminar"]
+    assert store.sync(service) == 0
+
+
+def test_expired_sync_token_falls_back_to_a_full_resync(store, now):
+    service = FakeCalendarService([_event("Lecture", now + dt.timedelta(hours=2))])
+    store.sync(service)
+    service.add_event(_event("Lab", now + dt.timedelta(hours=5)))
+    service.expire_sync_tokens()
+
+    assert store.sync(service) == 2  # a 410 on the delta, then everything again
+    assert _summaries(store, now) == ["Lab", "Lecture"]
+    assert service.calls['list'] == 3
+    assert store.sync(service) == 0  # the new token works
+
+
+def test_full_sync_is_bounded_and_resyncs_past_its_horizon(store, now):
+    far = now + dt.timedelta(days=event_store.FULL_SYNC_FUTURE_DAYS + 30)
+    service = FakeCalendarService([_event("Lecture", now + dt.timedelta(hours=2)), _event("Far away", far)])
+
+    store.sync(service)
+    assert [e['summary'] for e in store.events.values()] == ["Lecture"]
+
+    store.sync(service, until=far + dt.timedelta(days=1))
+    assert store.horizon >= far + dt.timedelta(days=1)
+    assert [e['summary'] for e in store.events_in_range(far, far + dt.timedelta(days=1))] == ["Far away"]
+
+
+def test_store_reloads_from_disk_and_continues_with_deltas(tmp_path, now):
+    service = FakeCalendarService([_event("Lecture", now + dt.timedelta(hours=2))])
+    path = str(tmp_path / 'events.json')
+    EventStore('test_user', path=path).sync(service)
+    service.add_event(_event("Lab", now + dt.timedelta(hours=5)))
+
+    reloaded = EventStore('test_user', path=path)
+    assert reloaded.sync(service) == 1
+    assert _summaries(reloaded, now) == ["Lab", "Lecture"]
+
+
+def test_synced_range_queries_are_kept_per_user(tmp_path, monkeypatch, now):
+    monkeypatch.setattr(event_store, 'EVENT_STORE_DIR', str(tmp_path))
+    monkeypatch.setattr(event_store, '_stores', OrderedDict())
+    alice = FakeCalendarService([_event("Alice's lecture", now + dt.timedelta(hours=2))])
+    bob = FakeCalendarService([_event("Bob's lab", now + dt.timedelta(hours=2))])
+    window = (now, now + dt.timedelta(days=1))
+
+    assert [e['summary'] for e in get_synced_events_in_range(alice, *window, user_id='alice')] == ["Alice's lecture"]
+    assert [e['summary'] for e in get_synced_events_in_range(bob, *window, user_id='bob')] == ["Bob's lab"]
+
+
+def test_store_cache_keeps_only_the_most_recently_used_users(tmp_path, monkeypatch, now):
+    monkeypatch.setattr(event_store, 'EVENT_STORE_DIR', str(tmp_path))
+    monkeypatch.setattr(event_store, '_stores', OrderedDict())
+    monkeypatch.setattr(event_store, 'EVENT_STORE_CACHE_SIZE', 2)
+    service = FakeCalendarService([_event("Lecture", now + dt.timedelta(hours=2))])
+    alice = get_event_store('alice')
+    alice.sync(service)
+    get_event_store('bob')
+    assert get_event_store('alice') is alice  # alice is now the most recently used
+    get_event_store('carol')
+
+    assert list(event_store._stores) == [('alice', 'primary'), ('carol', 'primary')]
+    bob = get_event_store('bob')
+    assert ('alice', 'primary') not in event_store._stores
+    assert get_event_store('alice') is not alice and bob.sync(service) == 1
+    assert get_event_store('alice').sync(service) == 0  # reloaded from disk, deltas only
@@ -0,0 +1,47 @@
+# File: test_focus_sessions.py
+import pytest
+
+import database
+import focus_sessions
+from storage import SQLiteStorage
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    storage = SQLiteStorage(str(tmp_path / 'focus.db'))
+    monkeypatch.setattr(database, 'storage', storage)
+    monkeypatch.setattr(focus_sessions, 'storage', storage)
+    monkeypatch.setattr(database, 'GAMIFICATION_FLUSH_SECONDS', 0)
+    database.init_gamification_stats('ana')
+    yield storage
+    storage.close()
+
+
+def test_session_is_credited_once_when_due(store):
+    session = focus_sessions.start_session('ana', 25, now=1000)
+    assert focus_sessions.start_session('ana', 5, now=1100)['session_id'] == session['session_id']
+    assert focus_sessions.get_session('ana', now=1000 + 600)['remaining_seconds'] == 900
+
+    done = focus_sessions.get_session('ana', now=1000 + 1500)
+    assert done['state'] == 'completed' and done['progress'] == 1.0
+    focus_sessions.get_session('ana', now=1000 + 1600)
+    assert focus_sessions.sweep_due_sessions(now=5000) == 0
+    assert database.get_gamification_stats('ana')['points'] == focus_sessions.FOCUS_SESSION_POINTS
+    assert database.get_gamification_stats('ana')['focus_sessions'] == 1
+
+
+def test_sweep_credits_sessions_nobody_is_watching(store):
+    for user_id in ('ben', 'cai'):
+        database.init_gamification_stats(user_id)
+        focus_sessions.start_session(user_id, 1, now=0)
+    focus_sessions.start_session('ana', 30, now=0)
+    assert focus_sessions.sweep_due_sessions(now=120) == 2
+    assert database.get_gamification_stats('ben')['points'] == focus_sessions.FOCUS_SESSION_POINTS
+    assert database.get_gamification_stats('ana')['points'] == 0
+
+
+def test_cancelled_session_earns_nothing(store):
+    focus_sessions.start_session('ana', 1, now=0)
+    assert focus_sessions.cancel_session('ana')
+    assert focus_sessions.get_session('ana', now=600)['state'] == 'cancelled'
+    assert database.get_gamification_stats('ana')['points'] == 0
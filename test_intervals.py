@@ -0,0 +1,91 @@
+# File: test_intervals.py
+# Correctness checks for the interval engine behind find_free_slots.
+
+import datetime as dt
+import random
+
+import pytest
+
+from autonomous_scheduler import INDIAN_TIMEZONE, find_free_slots
+from intervals import batch_free_slots, free_slots, intersection, merge_intervals, subtract, union
+
+
+def _at(hour, minute=0, day=5):
+    return INDIAN_TIMEZONE.localize(dt.datetime(2026, 1, day, hour, minute))
+
+
+def _event(start, end, **extra):
+    return {'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': end.isoformat()}, **extra}
+
+
+def test_merge_handles_overlapping_nested_and_touching_intervals():
+    assert merge_intervals([(5, 7), (1, 3), (2, 4), (8, 9), (9, 10), (1, 2)]) == [(1, 4), (5, 7), (8, 10)]
+
+
+def test_union_intersection_subtraction():
+    a = [(0, 10), (20, 30)]
+    b = [(5, 25)]
+    assert union(a, b) == [(0, 30)]
+    assert intersection(a, b) == [(5, 10), (20, 25)]
+    assert subtract(a, b) == [(0, 5), (25, 30)]
+    assert subtract(b, a) == [(10, 20)]
+    assert subtract(a, []) == a
+    assert intersection(a, []) == []
+
+
+def test_nested_event_does_not_create_phantom_free_slot():
+    # A short event inside a long one used to move the cursor backwards.
+    events = [_event(_at(9), _at(12)), _event(_at(10), _at(10, 30))]
+    slots = find_free_slots(events, _at(8), _at(14))
+    assert [(s['start'], s['end']) for s in slots] == [(_at(8), _at(9)), (_at(12), _at(14))]
+
+
+def test_all_day_events_block_the_local_day_and_free_events_are_ignored():
+    events = [
+        {'start': {'date': '2026-01-06'}, 'end': {'date': '2026-01-07'}},
+        _event(_at(10), _at(11), transparency='transparent'),
+    ]
+    slots = find_free_slots(events, _at(8), _at(8, day=7))
+    assert [(s['start'], s['end']) for s in slots] == [(_at(8), _at(0, day=6)), (_at(0, day=7), _at(8, day=7))]
+
+
+def test_presorted_stream_matches_sorted_input():
+    events = [_event(_at(h), _at(h, 45)) for h in range(8, 18, 2)]
+    assert find_free_slots(iter(events), _at(7), _at(20), presorted=True) == find_free_slots(events[::-1], _at(7), _at(20))
+
+
+def test_batch_free_slots_matches_scalar_engine():
+    np = pytest.importorskip('numpy')
+    rng = random.Random(7)
+    window_start, window_end = 0, 10_000
+    calendars = []
+    for _ in range(50):
+        busy = []
+        for _ in range(rng.randint(0, 20)):
+            start = rng.randint(-500, 10_400)
+            busy.append((start, start + rng.randint(1, 900)))
+        calendars.append(busy)
+
+    owners = [user for user, busy in enumerate(calendars) for _ in busy]
+    epoch = np.datetime64('2026-01-05T00:00', 'us')
+    to_time = lambda values: epoch + np.array(values, dtype='timedelta64[s]')
+    starts = to_time([start for busy in calendars for start, _ in busy])
+    ends = to_time([end for busy in calendars for _, end in busy])
+
+    free_owner, free_start, free_end = batch_free_slots(
+        owners, starts, ends, to_time(window_start), to_time(window_end), len(calendars))
+
+    for user, busy in enumerate(calendars):
+        expected = free_slots(busy, window_start, window_end)
+        mine = free_owner == user
+        got = list(zip(((free_start[mine] - epoch) // np.timedelta64(1, 's')).tolist(),
+                       ((free_end[mine] - epoch) // np.timedelta64(1, 's')).tolist()))
+        assert got == expected
+
+
+def test_all_day_dates_parse_to_local_midnight_everywhere():
+    from calendar_time import parse_event_time
+    from intervals import event_interval
+    holiday = {'start': {'date': '2026-01-05'}, 'end': {'date': '2026-01-06'}}
+    assert parse_event_time('2026-01-05') == _at(0)
+    assert event_interval(holiday, INDIAN_TIMEZONE) == (parse_event_time('2026-01-05'), parse_event_time('2026-01-06'))
@@ -0,0 +1,52 @@
+# File: test_leaderboard.py
+import leaderboard
+from leaderboard import Leaderboard
+
+def build():
+    board = Leaderboard()
+    board.rebuild(
+        [{'user_id': 'a', 'points': 100}, {'user_id': 'b', 'points': 300}, {'user_id': 'c', 'points': 200}],
+        [{'user_id': 'a', 'friend_group': 'g'}, {'user_id': 'c', 'friend_group': 'g'}])
+    return board
+
+def test_top_and_rank():
+    board = build()
+    assert [entry['user_id'] for entry in board.top(2)] == ['b', 'c']
+    assert board.rank('a') == 3
+    assert board.rank('a', group='g') == 2
+    assert board.rank('b', group='g') is None
+
+def test_incremental_update_moves_user():
+    board = build()
+    board.update('a', 600)
+    assert board.top(1)[0] == {'rank': 1, 'user_id': 'a', 'points': 600, 'level': 2}
+    assert [entry['user_id'] for entry in board.top(group='g')] == ['a', 'c']
+    board.update('d', 0)
+    assert board.size() == 4 and board.rank('d') == 4
+
+def test_ties_share_rank():
+    board = build()
+    board.update('a', 200)
+    assert board.rank('a') == board.rank('c') == 2
+
+def test_top_numbers_ties_like_rank():
+    board = build()
+    board.update('a', 300)
+    top = board.top(3)
+    assert [entry['rank'] for entry in top] == [1, 1, 3]
+    assert all(entry['rank'] == board.rank(entry['user_id']) for entry in top)
+
+def test_requests_never_rebuild_after_the_first(monkeypatch):
+    reads = []
+    class CountingStorage:
+        def all(self, table):
+            reads.append(table)
+            return []
+    monkeypatch.setattr(leaderboard, 'storage', CountingStorage())
+    monkeypatch.setattr(leaderboard, '_leaderboard', Leaderboard())
+    monkeypatch.setattr(leaderboard, 'LEADERBOARD_REFRESH_SECONDS', 3600)
+
+    board = leaderboard.get_leaderboard()
+    board.built_at = 1.0  # long past any refresh interval
+    assert leaderboard.get_leaderboard() is board
+    assert reads == ['gamification', 'users']
@@ -0,0 +1,52 @@
+# File: test_planner.py
+import datetime as dt
+
+import pytz
+
+from planner import build_plan, constraints_from_profile, format_plan
+
+TZ = pytz.timezone('Asia/Kolkata')
+MONDAY = TZ.localize(dt.datetime(2025, 1, 6))
+
+
+def at(day, hour, minute=0):
+    return MONDAY + dt.timedelta(days=day, hours=hour, minutes=minute)
+
+
+def test_blocks_avoid_institution_hours_and_sleep():
+    constraints = constraints_from_profile({'in_time': '08:00', 'out_time': '15:00'})
+    plan = build_plan([], MONDAY, at(7, 0), constraints, TZ)
+
+    for block in plan['blocks']:
+        start, end = block['start'].astimezone(TZ), block['end'].astimezone(TZ)
+        assert dt.time(7) <= start.time() and end.time() <= dt.time(23) and end.date() == start.date()
+        if start.weekday() < 5:
+            assert end.time() <= dt.time(8) or start.time() >= dt.time(15)
+    # Saturday has no classes, so its first block starts at wake-up time.
+    saturday = [b for b in plan['blocks'] if b['start'].weekday() == 5]
+    assert saturday[0]['start'] == at(5, 7)
+
+
+def test_daily_cap_and_busy_time():
+    constraints = constraints_from_profile({'daily_focus_minutes': 100})
+    plan = build_plan([(at(0, 7), at(0, 12))], MONDAY, at(1, 0), constraints, TZ)
+
+    assert plan['focus_minutes_by_day'] == {'2025-01-06': 100}
+    assert [b['start'] for b in plan['blocks']] == [at(0, 12), at(0, 12, 50)]
+    assert "12:00-12:50" in format_plan(plan)
+
+
+def test_plan_is_deterministic():
+    constraints = constraints_from_profile({'in_time': '09:00', 'out_time': '16:30'})
+    busy = [(at(1, 18), at(1, 19, 30))]
+    assert build_plan(busy, MONDAY, at(5, 0), constraints, TZ) == build_plan(busy, MONDAY, at(5, 0), constraints, TZ)
+
+
+def test_equal_in_and_out_times_block_nothing():
+    constraints = constraints_from_profile({'in_time': '10:15', 'out_time': '10:15'})
+    plan = build_plan([], MONDAY, at(1, 0), constraints, TZ)
+
+    assert constraints['institution_hours'] is None
+    assert plan['focus_minutes_by_day'] == {'2025-01-06': constraints['daily_focus_minutes']}
+    assert plan['blocks'][0]['start'] == at(0, 7)
+    assert constraints_from_profile({'sleep_time': '07:00', 'wake_time': '07:00'})['sleep'] is None
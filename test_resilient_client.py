@@ -0,0 +1,158 @@
+# File: test_resilient_client.py
+# ResilientClient against a local fault-injecting HTTP server.
+
+import datetime as dt
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fake_calendar_service import FakeCalendarService, make_http_error
+from google_calendar_agent import create_calendar_event, create_calendar_events_batch
+from resilient_client import AdaptiveConcurrencyLimit, ResilientClient, ResilientService
+
+
+class FaultServer(ThreadingHTTPServer):
+    """Answers each request with the next scripted (status, headers), then 200."""
+
+    def __init__(self, script):
+        super().__init__(('127.0.0.1', 0), FaultHandler)
+        self.script = list(script)
+        self.hits = []
+        self.lock = threading.Lock()
+
+    def next_fault(self):
+        with self.lock:
+            self.hits.append(time.monotonic())
+            return self.script.pop(0) if self.script else (200, {})
+
+
+class FaultHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status, headers = self.server.next_fault()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(b'ok' if status == 200 else b'error')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(script):
+        server = FaultServer(script)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f'http://127.0.0.1:{server.server_address[1]}/'
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read()
+
+
+def client(**options):
+    return ResilientClient('test', rate=1000, base_delay=0.01, max_delay=0.05, **options)
+
+
+def test_retries_throttling_and_server_errors_then_succeeds(serve):
+    server, url = serve([(429, {}), (503, {}), (500, {})])
+    test_client = client()
+    assert test_client.call(fetch, url) == b'ok'
+    assert len(server.hits) == 4
+    assert test_client.stats == {'calls': 4, 'retries': 3, 'throttled': 2, 'failures': 0}
+    # Two throttles halved the concurrency limit from 8.
+    assert test_client.concurrency.limit < 3
+
+
+def test_honors_retry_after(serve):
+    server, url = serve([(429, {'Retry-After': '1'})])
+    assert client().call(fetch, url) == b'ok'
+    assert server.hits[1] - server.hits[0] >= 0.95
+
+
+def test_client_errors_are_not_retried_and_attempts_are_capped(serve):
+    server, url = serve([(404, {})])
+    with pytest.raises(urllib.error.HTTPError):
+        client().call(fetch, url)
+    assert len(server.hits) == 1
+
+    server, url = serve([(503, {})] * 10)
+    with pytest.raises(urllib.error.HTTPError):
+        client(max_attempts=3).call(fetch, url)
+    assert len(server.hits) == 3
+
+
+def test_aimd_limit_caps_calls_in_flight(serve):
+    limit = AdaptiveConcurrencyLimit(initial=2, maximum=2)
+    peak, in_flight, lock = [0], [0], threading.Lock()
+
+    def work():
+        limit.acquire()
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        limit.release()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+def test_calendar_insert_survives_a_rate_limit():
+    fake = FakeCalendarService()
+    fake.fail_next('insert', 429, times=2)
+    service = ResilientService(fake, client())
+    start = dt.datetime(2025, 1, 6, 10, tzinfo=dt.timezone.utc)
+    event = create_calendar_event(service, "Focus", start, start + dt.timedelta(minutes=50), '9')
+    assert event is not None and len(fake.all_events()) == 1
+
+
+class LostResponses(FakeCalendarService):
+    """Applies the next `lose` inserts but answers them with a 503, as a dropped response would."""
+
+    def __init__(self, lose):
+        super().__init__()
+        self.lose = lose
+
+    def _insert(self, calendar_id, body):
+        event = super()._insert(calendar_id, body)
+        if self.lose:
+            self.lose -= 1
+            raise make_http_error(503)
+        return event
+
+
+def test_retried_insert_whose_first_attempt_landed_is_not_duplicated():
+    fake = LostResponses(lose=1)
+    start = dt.datetime(2025, 1, 6, 10, tzinfo=dt.timezone.utc)
+    event = create_calendar_event(ResilientService(fake, client()), "Focus", start, start + dt.timedelta(minutes=50), '9')
+    assert event is not None and len(fake.all_events()) == 1
+
+
+def test_retried_batch_inserts_are_not_duplicated():
+    fake = LostResponses(lose=3)
+    start = dt.datetime(2025, 1, 6, 10, tzinfo=dt.timezone.utc)
+    planned = [{'summary': "Focus", 'start': start + dt.timedelta(hours=i), 'end': start + dt.timedelta(hours=i, minutes=50),
+                'color_id': '9'} for i in range(5)]
+    report = create_calendar_events_batch(ResilientService(fake, client()), planned, backoff_seconds=0)
+    assert all(r['error'] is None for r in report)
+    assert len(fake.all_events()) == 5
+    assert fake.round_trips == 2  # the batch was sent once by the wrapper and retried once by execute_batch
@@ -0,0 +1,73 @@
+# File: test_response_cache.py
+import io
+
+import agentic_ai
+from response_cache import ResponseCache, content_hash
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_disk_entries_survive_a_new_cache(tmp_path):
+    ResponseCache(disk_dir=str(tmp_path)).put(content_hash(b'audio'), "hello")
+    assert ResponseCache(disk_dir=str(tmp_path)).get(content_hash(b'audio')) == "hello"
+
+
+class FakeUpload(io.BytesIO):
+    type = 'audio/wav'
+
+
+def test_same_audio_is_transcribed_once(monkeypatch):
+    calls = []
+
+    def fake_transcribe(uploaded_file):
+        calls.append(uploaded_file.getvalue())
+        return f"transcript {len(calls)}"
+
+    monkeypatch.setattr(agentic_ai, '_transcript_cache', ResponseCache())
+    monkeypatch.setattr(agentic_ai, '_transcribe_uncached', fake_transcribe)
+
+    first = agentic_ai.transcribe_audio(FakeUpload(b'memo'))
+    assert agentic_ai.transcribe_audio(FakeUpload(b'memo')) == first
+    assert agentic_ai.transcribe_audio(FakeUpload(b'other memo'))[1] == "transcript 2"
+    assert calls == [b'memo', b'other memo']
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    import response_cache
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    cache = ResponseCache(disk_dir=str(tmp_path), ttl_seconds=60)
+    cache.put('advice', "Take a walk.")
+    now[0] += 30
+    assert cache.get('advice') == "Take a walk."
+    now[0] += 60
+    assert cache.get('advice') is None
+    assert ResponseCache(disk_dir=str(tmp_path), ttl_seconds=60).get('advice') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_coach_advice_is_generated_once_per_fingerprint(monkeypatch):
+    import ai_coach
+    prompts = []
+
+    class StubModel:
+        def generate_content(self, prompt):
+            prompts.append(prompt)
+            return type('Response', (), {'text': f"advice {len(prompts)}"})()
+
+    monkeypatch.setattr(ai_coach, '_advice_cache', ResponseCache())
+    monkeypatch.setattr(ai_coach, '_model', StubModel())
+
+    first = ai_coach.get_coach_advice("Focus Block at 10:00\nMindful Break at 10:50", "Happy")
+    assert ai_coach.get_coach_advice("  Focus Block at 10:00 Mindful Break at 10:50 ", "happy ") == first
+    assert ai_coach.get_coach_advice("Focus Block at 10:00", "sad") == "advice 2"
+    assert len(prompts) == 2
+    assert ai_coach.coach_cache_stats() == {'entries': 2, 'hits': 1, 'misses': 2}
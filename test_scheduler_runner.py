@@ -0,0 +1,27 @@
+# File: test_scheduler_runner.py
+# The multi-user runner, driven entirely by fake Calendar backends.
+
+import event_store
+from fake_calendar_service import FakeCalendarService
+from scheduler_runner import run_for_users
+
+
+def test_runs_every_user_and_isolates_failures(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_store, 'EVENT_STORE_DIR', str(tmp_path))
+    services = {f'student{i}': FakeCalendarService(latency=0.001) for i in range(12)}
+
+    def service_factory(user_id):
+        if user_id == 'student3':
+            raise LookupError("No Google credentials stored for user student3")
+        return services[user_id]
+
+    summary = run_for_users(list(services), workers=4, api_calls_per_second=1000, service_factory=service_factory)
+
+    assert summary['users'] == 12
+    assert summary['succeeded'] == 11
+    assert [f['user_id'] for f in summary['failures']] == ['student3']
+    assert summary['p50_seconds'] <= summary['p95_seconds']
+    for user_id, service in services.items():
+        assert bool(service.all_events()) == (user_id != 'student3')
+    # Each batch item counts against the quota, so the bucket saw every write.
+    assert summary['api_calls'] >= sum(service.write_calls() for service in services.values())
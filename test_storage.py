@@ -0,0 +1,107 @@
+# File: test_storage.py
+# The storage contract, run against both backends.
+import json
+import threading
+
+import pytest
+
+from storage import LazyStorage, SQLiteStorage, TinyDBStorage, migrate_tinydb_to_sqlite
+
+
+@pytest.fixture(params=['sqlite', 'tinydb'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        storage = SQLiteStorage(str(tmp_path / 'contract.db'))
+    else:
+        storage = TinyDBStorage(str(tmp_path / 'contract.json'))
+    yield storage
+    storage.close()
+
+
+def test_documents_are_upserted_merged_and_updated(backend):
+    assert backend.get('users', 'ana') is None
+    backend.upsert('users', 'ana', {'name': 'Ana', 'in_time': '09:00'})
+    backend.upsert('users', 'ana', {'in_time': '08:00'})
+    assert backend.get('users', 'ana') == {'user_id': 'ana', 'name': 'Ana', 'in_time': '08:00'}
+    assert backend.update('users', 'ana', {'friend_group': 'g1'})
+    assert not backend.update('users', 'ben', {'friend_group': 'g1'})
+    assert backend.insert_if_absent('users', 'ben', {'name': 'Ben'})
+    assert not backend.insert_if_absent('users', 'ben', {'name': 'Other'})
+    assert sorted(doc['name'] for doc in backend.all('users')) == ['Ana', 'Ben']
+
+
+def test_compare_and_set_only_applies_when_expected_matches(backend):
+    backend.upsert('sessions', 'ana', {'session_id': 's1', 'state': 'running'})
+    assert not backend.compare_and_set('sessions', 'ana', {'state': 'completed'}, {'state': 'cancelled'})
+    assert backend.compare_and_set('sessions', 'ana', {'session_id': 's1', 'state': 'running'}, {'state': 'completed'})
+    assert not backend.compare_and_set('sessions', 'ana', {'session_id': 's1', 'state': 'running'}, {'state': 'completed'})
+    assert not backend.compare_and_set('sessions', 'nobody', {}, {'state': 'completed'})
+    assert backend.get('sessions', 'ana')['state'] == 'completed'
+
+
+def test_increment_adds_deltas_and_derives_fields(backend):
+    assert backend.increment('gamification', 'ana', {'points': 10}) is None
+    backend.insert_if_absent('gamification', 'ana', {'points': 490, 'level': 1})
+    doc = backend.increment('gamification', 'ana', {'points': 20, 'focus_sessions': 1},
+                            derive=lambda stats: {'level': stats['points'] // 500 + 1})
+    assert (doc['points'], doc['focus_sessions'], doc['level']) == (510, 1, 2)
+    assert backend.get('gamification', 'ana') == doc
+
+
+def test_concurrent_writers_never_lose_an_increment(tmp_path):
+    path = str(tmp_path / 'concurrent.db')
+    SQLiteStorage(path).insert_if_absent('gamification', 'ana', {'points': 0})
+    # Separate instances stand in for separate processes sharing the WAL database.
+    writers = [SQLiteStorage(path) for _ in range(4)]
+
+    def write(storage):
+        for _ in range(50):
+            storage.increment('gamification', 'ana', {'points': 1})
+            storage.compare_and_set('gamification', 'ana', {'user_id': 'ana'}, {'touched': True})
+    threads = [threading.Thread(target=write, args=(storage,)) for storage in writers for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert SQLiteStorage(path).get('gamification', 'ana')['points'] == 400
+
+
+def test_migration_copies_every_table_exactly(tmp_path):
+    source = TinyDBStorage(str(tmp_path / 'old.json'))
+    source.upsert('users', 'ana', {'name': 'Ana', 'in_time': '09:00'})
+    source.upsert('users', 'ben', {'name': 'Bén', 'friend_group': None})
+    source.insert_if_absent('gamification', 'ana', {'points': 120, 'level': 1, 'focus_sessions': 2})
+    source.upsert('credentials', 'ana', {'token': json.dumps({'refresh_token': 'r'})})
+    source.close()
+
+    counts = migrate_tinydb_to_sqlite(str(tmp_path / 'old.json'), str(tmp_path / 'new.db'))
+    assert counts == {'users': 2, 'gamification': 1, 'credentials': 1}
+    source, target = TinyDBStorage(str(tmp_path / 'old.json')), SQLiteStorage(str(tmp_path / 'new.db'))
+    for table in counts:
+        key = lambda doc: doc['user_id']
+        assert sorted(target.all(table), key=key) == sorted(source.all(table), key=key)
+
+
+def test_migration_picks_segment_tables_by_name(tmp_path):
+    source = TinyDBStorage(str(tmp_path / 'old.json'))
+    source.append_segment('conversation_segments', 'ana', 'j{}')
+    source.append_segment('conversation_segments', 'ana', 'j[]')
+    source.upsert('streaks', 'ana', {'seq': 3, 'days': 5})  # a document that happens to have 'seq'
+    source.close()
+
+    counts = migrate_tinydb_to_sqlite(str(tmp_path / 'old.json'), str(tmp_path / 'new.db'))
+    target = SQLiteStorage(str(tmp_path / 'new.db'))
+    assert counts == {'conversation_segments': 2, 'streaks': 1}
+    assert target.get_segments('conversation_segments', 'ana') == [(0, 'j{}'), (1, 'j[]')]
+    assert target.get('streaks', 'ana') == {'user_id': 'ana', 'seq': 3, 'days': 5}
+
+
+def test_lazy_storage_opens_nothing_until_used(tmp_path, monkeypatch):
+    import storage
+    path = tmp_path / 'lazy.db'
+    monkeypatch.setattr(storage, 'SQLITE_PATH', str(path))
+    monkeypatch.setattr(storage, 'TINYDB_PATH', str(tmp_path / 'missing.json'))
+    lazy = LazyStorage('sqlite')
+    assert not path.exists()
+    lazy.upsert('users', 'ana', {'name': 'Ana'})
+    assert path.exists() and lazy.get('users', 'ana')['name'] == 'Ana'
@@ -0,0 +1,85 @@
+# File: test_tracing.py
+
+import json
+
+import pytest
+
+import tracing
+
+@pytest.fixture(autouse=True)
+def empty_buffer():
+    tracing.clear_spans()
+    yield
+    tracing.clear_spans()
+
+@tracing.traced('test.outer')
+def outer():
+    inner()
+    return 'done'
+
+@tracing.traced('test.inner')
+def inner():
+    pass
+
+@tracing.traced('test.chunks')
+def chunks():
+    inner()
+    yield 'a'
+    yield 'b'
+
+def test_nested_calls_share_a_trace_and_form_a_waterfall():
+    root = tracing.begin_trace('test.rerun')
+    assert outer() == 'done'
+    assert list(chunks()) == ['a', 'b']
+    tracing.end_trace(root)
+    rows = tracing.waterfall(root.trace_id)
+    assert [(row['name'], row['depth']) for row in rows] == [
+        ('test.rerun', 0), ('test.outer', 1), ('test.inner', 2), ('test.chunks', 1), ('test.inner', 2)]
+    assert rows[0]['offset_ms'] == 0
+    assert tracing.current_trace_id() is None
+
+def test_errors_are_recorded_and_stats_are_per_operation():
+    @tracing.traced('test.fails')
+    def fails():
+        raise ValueError("boom")
+    for _ in range(3):
+        inner()
+        with pytest.raises(ValueError):
+            fails()
+    stats = tracing.operation_stats()
+    assert stats['test.inner']['count'] == 3 and stats['test.inner']['errors'] == 0
+    assert stats['test.fails']['errors'] == 3
+    assert stats['test.fails']['p50_ms'] <= stats['test.fails']['p95_ms'] <= stats['test.fails']['max_ms']
+
+def test_tool_calls_in_worker_threads_join_the_callers_trace(monkeypatch):
+    import agentic_ai
+
+    class Call:
+        def __init__(self, name):
+            self.name = name
+            self.args = {}
+    monkeypatch.setitem(agentic_ai.AVAILABLE_FUNCTIONS, 'list_today_events', lambda: 'nothing today')
+    with tracing.span('test.request') as request:
+        agentic_ai.run_function_calls([Call('list_today_events'), Call('list_today_events')])
+    tools = [s for s in tracing.recent_spans(request.trace_id) if s['name'] == 'tool.list_today_events']
+    assert len(tools) == 2 and all(s['parent_id'] for s in tools)
+
+def test_jsonl_export_uses_the_otlp_span_shape(tmp_path):
+    exporter = tracing.JsonlExporter(str(tmp_path / 'spans.jsonl'))
+    tracing.add_exporter(exporter)
+    try:
+        with tracing.span('test.parent', user='u1'):
+            inner()
+    finally:
+        tracing._exporters.remove(exporter)
+    child, parent = [json.loads(line) for line in (tmp_path / 'spans.jsonl').read_text().splitlines()]
+    assert child['parentSpanId'] == parent['spanId'] and child['traceId'] == parent['traceId']
+    assert 'parentSpanId' not in parent
+    assert int(parent['endTimeUnixNano']) >= int(parent['startTimeUnixNano'])
+    assert {'key': 'user', 'value': {'stringValue': 'u1'}} in parent['attributes']
+    assert parent['status'] == {'code': 'STATUS_CODE_OK'}
+
+def test_percentiles_use_the_nearest_rank():
+    assert tracing._percentile([1, 2], 0.95) == 2
+    assert tracing._percentile(list(range(1, 21)), 0.95) == 19
+    assert tracing._percentile(list(range(1, 21)), 0.5) == 10
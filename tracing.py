@@ -0,0 +1,237 @@
+# File: tracing.py
+# Lightweight timing spans for the hot paths.
+#
+# A span is one timed call: its name, its trace (one Streamlit rerun, one scheduler
+# run...), its parent span and its duration. Finished spans go to an in-memory ring
+# buffer (read by the debug panel in app.py) and to any exporters added with
+# add_exporter(). Setting FOCUSFLOW_TRACE_FILE appends every span to that file as
+# one JSON object per line, in the OpenTelemetry (OTLP JSON) span shape, so the
+# file can be loaded into an OpenTelemetry collector or read with jq.
+#
+# Modules call instrument(globals()) at their end to wrap every public function in a
+# span named "<module>.<function>". FOCUSFLOW_TRACING=0 turns all of it off.
+
+import contextvars
+import functools
+import inspect
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+
+TRACING_ENABLED = os.environ.get('FOCUSFLOW_TRACING', '1') != '0'
+SPAN_BUFFER_SIZE = 5000
+TRACE_FILE = os.environ.get('FOCUSFLOW_TRACE_FILE')  # None: no JSONL export
+
+_current_span = contextvars.ContextVar('focusflow_current_span', default=None)
+_spans = deque(maxlen=SPAN_BUFFER_SIZE)
+_spans_lock = threading.Lock()
+_exporters = []
+
+class Span:
+    """One timed operation. Finished spans are stored as plain dicts (see to_dict)."""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes', 'start', '_started', 'error')
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.error = None
+
+    def end(self, error=None):
+        """Records the span; error (an exception) marks it as failed."""
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        record = self.to_dict(time.perf_counter() - self._started)
+        with _spans_lock:
+            _spans.append(record)
+        for exporter in _exporters:
+            try:
+                exporter(record)
+            except Exception as e:
+                print(f"Span exporter {exporter!r} failed: {e}")
+
+    def to_dict(self, seconds):
+        return {'name': self.name, 'trace_id': self.trace_id, 'span_id': self.span_id,
+                'parent_id': self.parent_id, 'start': self.start, 'duration_ms': 1000 * seconds,
+                'attributes': self.attributes, 'error': self.error, 'thread': threading.current_thread().name}
+
+class span:
+    """Context manager timing a block as a child of the current span: `with span('name'): ...`."""
+
+    def __init__(self, name, **attributes):
+        self._span = Span(name, _current_span.get(), attributes)
+
+    def __enter__(self):
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, error_type, error, traceback):
+        _current_span.reset(self._token)
+        # st.rerun()/st.stop() raise BaseExceptions; those are control flow, not failures.
+        self._span.end(error if isinstance(error, Exception) else None)
+        return False
+
+def begin_trace(name, **attributes):
+    """
+    Starts a new trace whose root span stays current until end_trace(), for code that
+    cannot sit inside a `with` block (a whole Streamlit script run).
+    """
+    root = Span(name, None, attributes)
+    _current_span.set(root)
+    return root
+
+def end_trace(root, error=None):
+    _current_span.set(None)
+    root.end(error)
+
+def current_trace_id():
+    current = _current_span.get()
+    return current.trace_id if current else None
+
+def traced(name):
+    """Decorator: each call (or, for a generator, each full iteration) becomes a span."""
+    def decorate(function):
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                generator = function(*args, **kwargs)
+                current = Span(name, _current_span.get())
+                error = None
+                try:
+                    while True:
+                        # Current only while the generator runs, not while the caller holds a chunk.
+                        token = _current_span.set(current)
+                        try:
+                            value = next(generator)
+                        except StopIteration as stop:
+                            return stop.value
+                        finally:
+                            _current_span.reset(token)
+                        yield value
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    generator.close()
+                    current.end(error)
+            return generator_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def instrument(namespace, skip=()):
+    """
+    Wraps every public function defined in a module (pass its globals()) in a span
+    named "<module>.<function>". Calls between functions of the module are traced too,
+    since they look their callee up in the same globals. Tiny helpers called once per
+    event or per row belong in skip: they would flood the buffer and cost more than they measure.
+    """
+    if not TRACING_ENABLED:
+        return
+    module = namespace['__name__']
+    for attribute, value in list(namespace.items()):
+        if (not attribute.startswith('_') and inspect.isfunction(value)
+                and attribute not in skip and value.__module__ == module and not hasattr(value, '__wrapped__')):
+            namespace[attribute] = traced(f"{module}.{attribute}")(value)
+
+def add_exporter(exporter):
+    """Registers exporter(span_dict), called for every finished span."""
+    _exporters.append(exporter)
+
+def recent_spans(trace_id=None):
+    """Spans in the ring buffer, oldest first, optionally only those of one trace."""
+    with _spans_lock:
+        spans = list(_spans)
+    return [s for s in spans if s['trace_id'] == trace_id] if trace_id else spans
+
+def clear_spans():
+    with _spans_lock:
+        _spans.clear()
+
+def _percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    return ordered[max(1, math.ceil(fraction * len(ordered))) - 1]
+
+def operation_stats(spans=None):
+    """{name: {'count', 'p50_ms', 'p95_ms', 'max_ms', 'errors'}} over the ring buffer, slowest p95 first."""
+    durations = {}
+    errors = {}
+    for record in recent_spans() if spans is None else spans:
+        durations.setdefault(record['name'], []).append(record['duration_ms'])
+        errors[record['name']] = errors.get(record['name'], 0) + (record['error'] is not None)
+    stats = {}
+    for name, values in durations.items():
+        values.sort()
+        stats[name] = {'count': len(values), 'p50_ms': _percentile(values, 0.5),
+                       'p95_ms': _percentile(values, 0.95), 'max_ms': values[-1], 'errors': errors[name]}
+    return dict(sorted(stats.items(), key=lambda item: -item[1]['p95_ms']))
+
+def waterfall(trace_id):
+    """
+    The spans of one trace in start order, each with 'offset_ms' (from the trace's first
+    span) and 'depth' (0 for the root), ready to draw as a waterfall.
+    """
+    spans = sorted(recent_spans(trace_id), key=lambda s: s['start'])
+    if not spans:
+        return []
+    parents = {s['span_id']: s['parent_id'] for s in spans}
+    origin = spans[0]['start']
+    rows = []
+    for record in spans:
+        depth = 0
+        parent = record['parent_id']
+        while parent in parents:
+            depth += 1
+            parent = parents[parent]
+        rows.append({**record, 'offset_ms': 1000 * (record['start'] - origin), 'depth': depth})
+    return rows
+
+def to_otlp(record):
+    """A span dict in the OTLP JSON span shape (ids in hex, times in Unix nanoseconds)."""
+    start_ns = int(record['start'] * 1e9)
+    otlp = {
+        'traceId': record['trace_id'],
+        'spanId': record['span_id'],
+        'name': record['name'],
+        'kind': 'SPAN_KIND_INTERNAL',
+        'startTimeUnixNano': str(start_ns),
+        'endTimeUnixNano': str(start_ns + int(record['duration_ms'] * 1e6)),
+        'attributes': [{'key': key, 'value': {'stringValue': str(value)}}
+                       for key, value in {**record['attributes'], 'thread.name': record['thread']}.items()],
+        'status': {'code': 'STATUS_CODE_ERROR', 'message': record['error']} if record['error'] else {'code': 'STATUS_CODE_OK'},
+    }
+    if record['parent_id']:
+        otlp['parentSpanId'] = record['parent_id']
+    return otlp
+
+class JsonlExporter:
+    """Appends each span to a file as one OTLP-shaped JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', buffering=1, encoding='utf-8')  # line buffered
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(to_otlp(record))
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def __repr__(self):
+        return f"JsonlExporter({self.path!r})"
+
+if TRACING_ENABLED and TRACE_FILE:
+    add_exporter(JsonlExporter(TRACE_FILE))